@@ -0,0 +1,320 @@
+"""
+DSTech Dashboard - Análises Avançadas de Produção
+Insights, tendências e comparativos por cliente a partir de Rel_Carga.
+
+Os dados do período são carregados uma única vez (produção por dia e cliente)
+e todas as análises são calculadas sobre esse mesmo frame com pandas/NumPy.
+Frame e resultados ficam em cache por período e por (cliente, período), de
+modo que as cinco saídas da aba Produção compartilham uma única consulta.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from dash import html
+import dash_bootstrap_components as dbc
+
+from dstech_charts import execute_query
+from dstech_db import query_class_at_least
+from dstech_dimensions import dimensions
+from dstech_reports import REPORT_CACHE, OPEN_PERIOD_TTL, CLOSED_PERIOD_TTL, day_range
+
+# Produção por dia e cliente (uma linha por dia × cliente com cargas). Agrupa
+# pelo id bruto; os nomes vêm do cache de dimensões (dstech_dimensions)
+PRODUCTION_FRAME_QUERY = """
+SELECT
+    DATE("Time_Stamp") AS dia,
+    "C1" AS client_id,
+    SUM("C2") AS kg,
+    COUNT(*) AS cargas
+FROM "Rel_Carga"
+WHERE "Time_Stamp" >= %(start)s AND "Time_Stamp" < %(end)s
+  AND "C2" > 0
+GROUP BY DATE("Time_Stamp"), "C1"
+"""
+
+FRAME_COLUMNS = ['dia', 'client_id', 'kg', 'cargas']
+
+# Janela da média móvel do gráfico de tendência (dias)
+MOVING_AVERAGE_DAYS = 7
+
+def _cache_expire(end_day):
+    """Períodos fechados ficam em cache por mais tempo que os que incluem hoje"""
+    return CLOSED_PERIOD_TTL if end_day < datetime.now().date() else OPEN_PERIOD_TTL
+
+def _client_key(client_id):
+    """Normaliza o filtro de cliente ('all', None, '5', 5) para None ou int"""
+    if client_id in (None, 'all', ''):
+        return None
+    return int(client_id)
+
+def get_production_frame(start_date, end_date):
+    """Produção por dia e cliente do período, consultada uma vez por período"""
+    start_day, end_day = day_range(start_date, end_date)
+    cache_key = f"analytics-frame|{start_day}|{end_day}"
+    frame = REPORT_CACHE.get(cache_key)
+    if frame is not None:
+        return frame
+
+    # 'analytics', ou a classe de quem chamou se for mais longa ('export')
+    with query_class_at_least('analytics'):
+        frame = execute_query(PRODUCTION_FRAME_QUERY, {
+            'start': datetime.combine(start_day, datetime.min.time()),
+            'end': datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+        })
+    if frame.empty:
+        return pd.DataFrame(columns=FRAME_COLUMNS)
+
+    frame['dia'] = pd.to_datetime(frame['dia'])
+    # Cargas sem cliente válido (NULL ou texto em "C1") ficam fora das análises
+    frame['client_id'] = pd.to_numeric(frame['client_id'], errors='coerce')
+    frame = frame.dropna(subset=['client_id'])
+    frame['client_id'] = frame['client_id'].astype(int)
+    frame['kg'] = frame['kg'].astype(float)
+    frame['cargas'] = frame['cargas'].astype(int)
+    REPORT_CACHE.set(cache_key, frame, expire=_cache_expire(end_day))
+    return frame
+
+def _growth(matrix):
+    """Variação percentual entre a segunda e a primeira metade do período (por coluna)"""
+    half = matrix.shape[0] // 2
+    first = matrix[:half].sum(axis=0)
+    second = matrix[matrix.shape[0] - half:].sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(first > 0, (second - first) / first * 100, np.nan)
+
+def get_client_analytics(start_date, end_date, client_id=None):
+    """Calcula todas as análises da aba Produção para (cliente, período)
+
+    Retorna dict com:
+      - 'dias': eixo de dias contínuo (datetime64[D])
+      - 'kg_diario': produção diária do cliente (ou de todos) por dia
+      - 'clientes': DataFrame por cliente (total, cargas, média por carga,
+        participação, crescimento e variabilidade diária), ordenado por kg
+    """
+    start_day, end_day = day_range(start_date, end_date)
+    client_id = _client_key(client_id)
+    cache_key = f"analytics|{client_id}|{start_day}|{end_day}"
+    analytics = REPORT_CACHE.get(cache_key)
+    if analytics is not None:
+        return _with_client_names(analytics)
+
+    frame = get_production_frame(start_day, end_day)
+    days = np.arange(np.datetime64(start_day, 'D'), np.datetime64(end_day, 'D') + 1)
+
+    # Matriz dia × cliente; dias sem cargas ficam com zero
+    kg = frame.pivot_table(index='dia', columns='client_id', values='kg', aggfunc='sum', fill_value=0)
+    kg = kg.reindex(pd.DatetimeIndex(days), fill_value=0)
+    matrix = kg.to_numpy(dtype=float)
+
+    totals = matrix.sum(axis=0)
+    loads = frame.groupby('client_id')['cargas'].sum().reindex(kg.columns, fill_value=0).to_numpy()
+    daily_mean = matrix.mean(axis=0) if len(days) else totals
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variability = np.where(daily_mean > 0, matrix.std(axis=0) / daily_mean * 100, np.nan)
+        avg_load = np.where(loads > 0, totals / loads, 0)
+
+    clients = pd.DataFrame({
+        'client_id': kg.columns.astype(int),
+        'total_kg': totals,
+        'total_cargas': loads,
+        'media_kg_carga': avg_load,
+        'participacao_pct': totals / totals.sum() * 100 if totals.sum() > 0 else np.zeros_like(totals),
+        'crescimento_pct': _growth(matrix),
+        'variabilidade_pct': variability
+    }).sort_values('total_kg', ascending=False, ignore_index=True)
+
+    if client_id is None:
+        daily_kg = matrix.sum(axis=1)
+    elif client_id in kg.columns:
+        daily_kg = kg[client_id].to_numpy(dtype=float)
+    else:
+        daily_kg = np.zeros(len(days))
+
+    analytics = {'dias': days, 'kg_diario': daily_kg, 'clientes': clients}
+    if not frame.empty:
+        REPORT_CACHE.set(cache_key, analytics, expire=_cache_expire(end_day))
+    return _with_client_names(analytics)
+
+def _with_client_names(analytics):
+    """Aplica os nomes atuais dos clientes (fora do cache, que guarda só ids)"""
+    clients = analytics['clientes'].copy()
+    clients.insert(1, 'cliente_nome', dimensions.client_labels(clients['client_id']))
+    return {**analytics, 'clientes': clients}
+
+def get_client_performance_comparison(start_date, end_date):
+    """Desempenho por cliente no período (maior produção primeiro)"""
+    return get_client_analytics(start_date, end_date)['clientes']
+
+def get_operational_insights(start_date, end_date, client_id=None):
+    """Insights do período no formato {type, title, message, detail}"""
+    analytics = get_client_analytics(start_date, end_date, client_id)
+    clients = analytics['clientes']
+    daily_kg = analytics['kg_diario']
+    days = analytics['dias']
+
+    if clients.empty or daily_kg.sum() == 0:
+        return []
+
+    insights = []
+
+    # Tendência geral: variação entre as metades do período
+    growth = _growth(daily_kg[:, None])[0]
+    if not np.isnan(growth):
+        insights.append({
+            'type': 'success' if growth >= 0 else 'warning',
+            'title': "📈 Produção em alta" if growth >= 0 else "📉 Produção em queda",
+            'message': f"Variação de {growth:+.1f}% entre a primeira e a segunda metade do período",
+            'detail': f"Média diária de {daily_kg.mean():,.0f} kg em {len(days)} dias"
+        })
+
+    # Concentração: participação do maior cliente
+    top = clients.iloc[0]
+    insights.append({
+        'type': 'warning' if top['participacao_pct'] > 50 else 'info',
+        'title': "🏆 Maior cliente",
+        'message': f"{top['cliente_nome']} responde por {top['participacao_pct']:.1f}% da produção",
+        'detail': f"{top['total_kg']:,.0f} kg em {int(top['total_cargas'])} cargas"
+    })
+
+    # Dias parados (sem cargas)
+    idle_days = int((daily_kg == 0).sum())
+    if idle_days:
+        insights.append({
+            'type': 'danger' if idle_days > len(days) / 4 else 'warning',
+            'title': "⏸️ Dias sem produção",
+            'message': f"{idle_days} de {len(days)} dias sem cargas registradas",
+            'detail': "Verifique paradas programadas ou falhas de coleta de dados"
+        })
+
+    # Pico de produção
+    peak = int(np.argmax(daily_kg))
+    insights.append({
+        'type': 'info',
+        'title': "📅 Dia de maior produção",
+        'message': f"{pd.Timestamp(days[peak]).strftime('%d/%m/%Y')} com {daily_kg[peak]:,.0f} kg",
+        'detail': f"{daily_kg[peak] / daily_kg.mean():.1f}x a média diária do período"
+    })
+
+    # Clientes com maior queda
+    falling = clients[clients['crescimento_pct'] < -20]
+    if client_id is None and not falling.empty:
+        insights.append({
+            'type': 'danger',
+            'title': "⚠️ Clientes em queda",
+            'message': ", ".join(falling['cliente_nome'].head(3)),
+            'detail': f"{len(falling)} cliente(s) com queda superior a 20% no período"
+        })
+
+    return insights
+
+def create_trend_analysis_chart(client_id=None, days=30):
+    """Produção diária, média móvel e tendência linear dos últimos `days` dias"""
+    end_day = datetime.now().date()
+    start_day = end_day - timedelta(days=int(days))
+    analytics = get_client_analytics(start_day, end_day, client_id)
+    dates = analytics['dias']
+    daily_kg = analytics['kg_diario']
+
+    if daily_kg.sum() == 0:
+        return go.Figure().add_annotation(text="Sem dados de produção no período",
+                                          xref="paper", yref="paper",
+                                          x=0.5, y=0.5, showarrow=False)
+
+    window = min(MOVING_AVERAGE_DAYS, len(daily_kg))
+    moving_average = np.convolve(daily_kg, np.ones(window) / window, mode='valid')
+    x = np.arange(len(daily_kg))
+    slope, intercept = np.polyfit(x, daily_kg, 1)
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=dates, y=daily_kg, name='Produção diária (kg)',
+                         marker_color='rgba(52, 152, 219, 0.6)'))
+    fig.add_trace(go.Scatter(x=dates[window - 1:], y=moving_average,
+                             name=f'Média móvel {window} dias',
+                             line=dict(color='#2C3E50', width=3)))
+    fig.add_trace(go.Scatter(x=dates, y=slope * x + intercept,
+                             name=f'Tendência ({slope:+,.0f} kg/dia)',
+                             line=dict(color='#E74C3C', width=2, dash='dash')))
+
+    fig.update_layout(
+        template='plotly_white',
+        hovermode='x unified',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='center', x=0.5),
+        margin=dict(t=40, b=40, l=50, r=20),
+        yaxis_title='kg'
+    )
+    return fig
+
+def create_client_comparison_dashboard(start_date, end_date):
+    """Produção e participação dos principais clientes do período"""
+    clients = get_client_performance_comparison(start_date, end_date).head(10)
+
+    if clients.empty:
+        return go.Figure().add_annotation(text="Sem dados de clientes no período",
+                                          xref="paper", yref="paper",
+                                          x=0.5, y=0.5, showarrow=False)
+
+    clients = clients.iloc[::-1]
+    fig = go.Figure(go.Bar(
+        x=clients['total_kg'],
+        y=clients['cliente_nome'],
+        orientation='h',
+        marker=dict(color=clients['crescimento_pct'].fillna(0), colorscale='RdYlGn', cmid=0,
+                    colorbar=dict(title='Cresc. %', thickness=10)),
+        text=[f"{share:.0f}%" for share in clients['participacao_pct']],
+        textposition='auto',
+        customdata=np.stack([clients['total_cargas'], clients['crescimento_pct'].fillna(0)], axis=-1),
+        hovertemplate="<b>%{y}</b><br>%{x:,.0f} kg<br>%{customdata[0]} cargas"
+                      "<br>Crescimento: %{customdata[1]:+.1f}%<extra></extra>"
+    ))
+    fig.update_layout(
+        template='plotly_white',
+        margin=dict(t=20, b=40, l=10, r=10),
+        xaxis_title='kg',
+        showlegend=False
+    )
+    return fig
+
+def _performance_badge(growth):
+    """Badge de crescimento de um cliente"""
+    if np.isnan(growth):
+        return dbc.Badge("novo", color="secondary")
+    color = 'success' if growth >= 5 else 'danger' if growth <= -5 else 'warning'
+    return dbc.Badge(f"{growth:+.1f}%", color=color)
+
+def create_smart_client_analysis(start_date, end_date, client_filter='all'):
+    """Cartões de desempenho por cliente (crescimento, regularidade e carga média)"""
+    client_id = _client_key(client_filter)
+    clients = get_client_analytics(start_date, end_date, client_id)['clientes']
+
+    if client_id is not None:
+        clients = clients[clients['client_id'] == client_id]
+    else:
+        clients = clients.head(6)
+
+    if clients.empty:
+        return dbc.Alert("Sem dados de produção para o cliente no período", color="info")
+
+    cards = [
+        dbc.Col([
+            dbc.Card([
+                dbc.CardBody([
+                    html.H6([row['cliente_nome'], " ", _performance_badge(row['crescimento_pct'])],
+                            className="mb-2"),
+                    html.P(f"📦 {row['total_kg']:,.0f} kg ({row['participacao_pct']:.1f}% do total)",
+                           className="mb-1"),
+                    html.P(f"🔄 {int(row['total_cargas'])} cargas · {row['media_kg_carga']:.1f} kg/carga",
+                           className="mb-1"),
+                    html.Small(
+                        "Produção regular" if row['variabilidade_pct'] < 50 else
+                        f"Produção irregular (variação diária de {row['variabilidade_pct']:.0f}%)",
+                        className="text-muted"
+                    )
+                ])
+            ], className="h-100")
+        ], xs=12, sm=6, md=4, lg=4, xl=4, className="mb-3")
+        for row in clients.to_dict('records')
+    ]
+    return dbc.Row(cards)
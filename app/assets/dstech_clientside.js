@@ -0,0 +1,43 @@
+/* Callbacks executados no navegador - DSTech Dashboard
+ * Interações puramente visuais que não precisam de ida ao servidor.
+ */
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dstech: Object.assign({}, (window.dash_clientside || {}).dstech, {
+        /* Alterna o tema escuro no page-content */
+        toggleDarkMode: function (n_clicks, current_class) {
+            current_class = current_class || '';
+            if (!n_clicks) {
+                return [current_class, '🌙 Modo Escuro'];
+            }
+            if (current_class.indexOf('dark-theme') !== -1) {
+                // Mudar para modo claro
+                return [current_class.replace('dark-theme', '').trim(), '🌙 Modo Escuro'];
+            }
+            // Mudar para modo escuro
+            return [(current_class + ' dark-theme').trim(), '☀️ Modo Claro'];
+        },
+
+        /* URL do endpoint de exportação de dados brutos */
+        rawExportHref: function (tables, format, start_date, end_date) {
+            if (!tables || !tables.length) {
+                return '#';
+            }
+            var params = new URLSearchParams({
+                tables: tables.join(','),
+                format: format,
+                start: (start_date || '').slice(0, 10),
+                end: (end_date || '').slice(0, 10)
+            });
+            return '/export/raw?' + params.toString();
+        },
+
+        /* Horário da última atualização no formato dd/mm/aaaa hh:mm:ss */
+        updateTimestamp: function () {
+            var now = new Date();
+            var pad = function (value) { return String(value).padStart(2, '0'); };
+            return 'Última atualização: ' +
+                pad(now.getDate()) + '/' + pad(now.getMonth() + 1) + '/' + now.getFullYear() + ' ' +
+                pad(now.getHours()) + ':' + pad(now.getMinutes()) + ':' + pad(now.getSeconds());
+        }
+    })
+});
@@ -0,0 +1,44 @@
+/* Canal de atualização em tempo real - DSTech Dashboard
+ * Recebe notificações de novos dados (Server-Sent Events) e repassa ao Dash
+ * clicando no botão oculto "push-trigger".
+ */
+(function () {
+    if (!window.EventSource) {
+        return;
+    }
+
+    /* Servidor com todas as vagas de stream ocupadas responde 503 e o
+     * EventSource desiste; reconectar depois de um intervalo com variação
+     * para os navegadores não voltarem todos ao mesmo tempo. */
+    var BUSY_RETRY_MS = 30000;
+
+    function connect() {
+        var source = new EventSource('/stream/updates');
+        source.onmessage = function (event) {
+            window.dstechPush = JSON.parse(event.data);
+            var trigger = document.getElementById('push-trigger');
+            if (trigger) {
+                trigger.click();
+            }
+        };
+        source.onerror = function () {
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(connect, BUSY_RETRY_MS * (1 + Math.random()));
+            }
+        };
+    }
+
+    connect();
+})();
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dstech: Object.assign({}, (window.dash_clientside || {}).dstech, {
+        /* Copia a última notificação recebida para o data-push-store */
+        readPush: function (n_clicks) {
+            if (!n_clicks || !window.dstechPush) {
+                return window.dash_clientside.no_update;
+            }
+            return window.dstechPush;
+        }
+    })
+});
@@ -5,27 +5,53 @@ Sistema completo de monitoramento industrial com dados reais
 """
 
 import dash
-from dash import dcc, html, Input, Output, State, callback_context, dash_table
+from dash import (dcc, html, Input, Output, State, callback, callback_context, clientside_callback,
+                  ClientsideFunction, no_update)
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
 import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
+# pandas continua na importação: dstech_db e os módulos de gráficos já o usam
+# (execute_query devolve DataFrames) e no gunicorn ele carrega uma vez no mestre
 import pandas as pd
-import psycopg2
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
+from flask import session
+import functools
 import hashlib
 import json
+import secrets
+import threading
+from collections import OrderedDict
+import diskcache
 
-# Importar módulos personalizados
-from dstech_charts import *
+# Importar módulos personalizados (plotly.express, SQLAlchemy, psycopg2,
+# reportlab e openpyxl são carregados sob demanda pelos módulos que os usam)
+from dstech_charts import (
+    TREND_PREVIEW_POINTS, TREND_PREVIEW_SAMPLE_PERCENT, build_trend_extend_data, create_active_alarms_table,
+    create_alarm_analysis_chart, create_chemical_consumption_chart,
+    create_client_program_heatmap, create_efficiency_chart, create_efficiency_preview_chart,
+    create_production_by_client_chart, create_production_by_program_chart, create_sensors_trend_chart,
+    create_temperature_trend_chart, create_top_alarms_chart, create_water_client_percentiles_chart,
+    create_water_consumption_chart, diff_table_rows,
+    drop_open_bucket, get_active_alarms_rows, get_active_alarms_title, get_operational_kpis, get_trend_history,
+    get_trend_points_since
+)
 from advanced_analytics import (
     create_client_comparison_dashboard, get_operational_insights, 
     create_trend_analysis_chart, get_client_performance_comparison,
     create_smart_client_analysis
 )
+from dstech_db import TAB_ID_STORE, after_fresh_result, cancel_superseded, current_tab_id, new_tab_id, query_class, register_db_routes
+from dstech_push import notifier, register_push_routes
+from dstech_cube import production_cube
+from dstech_dimensions import dimensions
+from dstech_reports import (
+    CACHE_DIR, REPORT_CACHE, OPEN_PERIOD_TTL, CLOSED_PERIOD_TTL, build_report_export,
+    day_range, generate_executive_report, get_daily_series
+)
+from dstech_raw_export import LOGIN_SESSION_KEY, RAW_EXPORT_TABLES, register_raw_export_routes
+from dstech_warmup import register_warmup_routes, warmup, warmup_periods
 
 # Carregar variáveis de ambiente
 load_dotenv('.env_dstech')
@@ -33,13 +59,8 @@ load_dotenv('.env_dstech')
 # Detectar ambiente (produção ou desenvolvimento)
 IS_PRODUCTION = os.getenv('DEBUG', 'True').lower() == 'false'
 
-# Configuração do banco PostgreSQL
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'database': os.getenv('DB_NAME', 'dstech_dashboard'),
-    'user': os.getenv('POSTGRES_USERNAME', 'postgres'),
-    'password': os.getenv('POSTGRES_PASSWORD', 'postgres123')
-}
+# Atualização por notificação do servidor (SSE) em vez de polling a cada 60s
+PUSH_ENABLED = os.getenv('DSTECH_PUSH', 'True').lower() != 'false'
 
 # Sistema de usuários simples com arquivo JSON
 USERS_FILE = 'users.json'
@@ -109,139 +130,47 @@ def validate_login(username, password):
     """Valida credenciais de login"""
     return validate_user(username, password)
 
-# Carregar usuários na inicialização
-USERS = load_users()
-
-def generate_executive_report(start_date=None, end_date=None):
-    """Gera relatório executivo dinâmico baseado no período selecionado"""
-    if start_date is None:
-        start_date = datetime.now() - timedelta(days=7)
-    if end_date is None:
-        end_date = datetime.now()
-    
-    # Converter strings para datetime se necessário
-    if isinstance(start_date, str):
-        start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-    if isinstance(end_date, str):
-        end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-    
-    # Calcular diferença de dias
-    days_diff = (end_date - start_date).days + 1
-    
-    # Simular dados baseados no período
-    period_production = 1250 * days_diff  # 1250 kg por dia
-    period_cycles = 45 * days_diff  # 45 ciclos por dia
-    daily_avg = period_production / days_diff
-    
-    water_period = 8500 * days_diff  # 8500L por dia
-    chemicals_period = 125 * days_diff  # 125 unidades por dia
-    
-    period_alarms = max(1, days_diff // 3)  # Pelo menos 1 alarme a cada 3 dias
-    
-    return {
-        'timestamp': datetime.now().strftime('%d/%m/%Y %H:%M'),
-        'period_days': days_diff,
-        'production_summary': {
-            'period_production': f"{period_production:,.0f}",
-            'period_cycles': period_cycles,
-            'daily_avg': f"{daily_avg:,.0f}",
-            'efficiency': "94.2%"
-        },
-        'consumption_summary': {
-            'water_period': f"{water_period:,.0f}",
-            'water_per_kg': "6.8L/kg",
-            'chemicals_period': f"{chemicals_period:,.0f}",
-            'chemicals_per_kg': "0.1 un/kg"
-        },
-        'alarms_summary': {
-            'period_alarms': period_alarms,
-            'active_alarms': 2,
-            'critical_high': f"{max(1, period_alarms // 4)}/{max(1, period_alarms // 3)}",
-            'avg_resolution': "12 min"
-        },
-        'recommendations': [
-            "Otimizar consumo de água nos horários de pico",
-            "Revisar dosagem de químicos na linha 2",
-            "Implementar manutenção preventiva semanal",
-            "Monitorar temperatura dos equipamentos"
-        ]
-    }
-
-class DatabaseManager:
-    """Gerenciador de conexão com PostgreSQL"""
-    
-    def __init__(self):
-        self.config = DB_CONFIG
-    
-    def get_connection(self):
-        try:
-            return psycopg2.connect(**self.config)
-        except Exception as e:
-            print(f"Erro ao conectar com banco: {e}")
-            return None
-    
-    def execute_query(self, query, params=None):
-        conn = self.get_connection()
-        if conn:
-            try:
-                df = pd.read_sql_query(query, conn, params=params)
-                conn.close()
-                return df
-            except Exception as e:
-                print(f"Erro ao executar query: {e}")
-                conn.close()
-                return pd.DataFrame()
-        return pd.DataFrame()
-
-# Instância do gerenciador de banco
-db = DatabaseManager()
-
-# Inicializar app Dash
-app = dash.Dash(__name__, 
-                external_stylesheets=[dbc.themes.BOOTSTRAP, dbc.icons.FONT_AWESOME],
-                suppress_callback_exceptions=True,
-                title="DSTech Dashboard")
-
 # Layout de login compacto
-login_layout = dbc.Container([
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.Div([
-                        # Logo e título mais compactos
+def create_login_layout():
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
                         html.Div([
-                            html.Img(src="/assets/logodstech.png", 
-                                    style={'height': '60px', 'width': 'auto', 'margin-bottom': '15px'})
-                        ], className="text-center mb-3"),
-                        html.H5("Sistema de Monitoramento Industrial", 
-                               className="text-center mb-3", 
-                               style={'color': '#2c3e50', 'font-weight': '500'}),
+                            # Logo e título mais compactos
+                            html.Div([
+                                html.Img(src="/assets/logodstech.png", 
+                                        style={'height': '60px', 'width': 'auto', 'margin-bottom': '15px'})
+                            ], className="text-center mb-3"),
+                            html.H5("Sistema de Monitoramento Industrial", 
+                                   className="text-center mb-3", 
+                                   style={'color': '#2c3e50', 'font-weight': '500'}),
                         
-                        # Formulário mais compacto
-                        dbc.Form([
-                            dbc.Row([
-                                dbc.Label("Usuário", html_for="username", className="fw-bold mb-1"),
-                                dbc.Input(id="username", type="text", placeholder="Digite seu usuário",
-                                         className="mb-2")
-                            ]),
-                            dbc.Row([
-                                dbc.Label("Senha", html_for="password", className="fw-bold mb-1"),
-                                dbc.Input(id="password", type="password", placeholder="Digite sua senha",
-                                         className="mb-3")
+                            # Formulário mais compacto
+                            dbc.Form([
+                                dbc.Row([
+                                    dbc.Label("Usuário", html_for="username", className="fw-bold mb-1"),
+                                    dbc.Input(id="username", type="text", placeholder="Digite seu usuário",
+                                             className="mb-2")
+                                ]),
+                                dbc.Row([
+                                    dbc.Label("Senha", html_for="password", className="fw-bold mb-1"),
+                                    dbc.Input(id="password", type="password", placeholder="Digite sua senha",
+                                             className="mb-3")
+                                ]),
+                                dbc.Button("Entrar", id="login-button", color="primary", 
+                                         className="w-100",
+                                         style={'padding': '8px', 'font-weight': '500'})
                             ]),
-                            dbc.Button("Entrar", id="login-button", color="primary", 
-                                     className="w-100",
-                                     style={'padding': '8px', 'font-weight': '500'})
-                        ]),
                         
-                        html.Div(id="login-alert", className="mt-2")
-                    ], style={'padding': '20px'})
-                ])
-            ], style={'box-shadow': '0 4px 8px rgba(0, 0, 0, 0.1)', 'border': 'none', 'border-radius': '8px'})
-        ], width=3, lg=3, md=4, sm=6, xs=10)  # Responsivo e mais estreito
-    ], justify="center", className="min-vh-100 align-items-center")
-], fluid=True, style={'background': 'linear-gradient(135deg, #667eea 0%, #764ba2 100%)'})
+                            html.Div(id="login-alert", className="mt-2")
+                        ], style={'padding': '20px'})
+                    ])
+                ], style={'box-shadow': '0 4px 8px rgba(0, 0, 0, 0.1)', 'border': 'none', 'border-radius': '8px'})
+            ], width=3, lg=3, md=4, sm=6, xs=10)  # Responsivo e mais estreito
+        ], justify="center", className="min-vh-100 align-items-center")
+    ], fluid=True, style={'background': 'linear-gradient(135deg, #667eea 0%, #764ba2 100%)'})
 
 # Layout principal do dashboard
 def create_main_layout():
@@ -314,32 +243,35 @@ def create_main_layout():
         ], id="main-tabs", active_tab="resumo", className="mb-3"),
         
         # Conteúdo das tabs
-        html.Div(id="tab-content"),
+        # Um painel por aba: abas já abertas ficam montadas (ocultas) e só são
+        # remontadas quando marcadas como desatualizadas
+        html.Div([html.Div(id=f"tab-pane-{tab}") for tab in TAB_COMPONENTS], id="tab-content"),
         
         # Componentes auxiliares
-        dcc.Interval(id='interval-component', interval=60*1000, n_intervals=0)
+        dcc.Interval(id='interval-component', interval=60*1000, n_intervals=0,
+                     disabled=PUSH_ENABLED),
+        dcc.Store(id='stale-tabs', data=[]),
+        dcc.Store(id='loaded-tabs', data=[]),
+        dcc.Store(id='data-push-store'),
+        # Últimos valores enviados aos cards de KPI (fica fora da aba Resumo)
+        dcc.Store(id='kpi-store'),
+        # Id desta aba do navegador (escopo do cancelamento de consultas antigas)
+        dcc.Store(id=TAB_ID_STORE, data=new_tab_id()),
+        html.Button(id='push-trigger', n_clicks=0, style={'display': 'none'})
         
     ], fluid=True)
 
-# Layout da aplicação
-app.layout = html.Div([
-    dcc.Location(id='url', refresh=False),
-    dcc.Store(id='session-store'),
-    dcc.Store(id='data-store'),
-    html.Div(id='page-content')
-])
-
 # Callbacks principais
-@app.callback(Output('page-content', 'children'),
+@callback(Output('page-content', 'children'),
               Input('url', 'pathname'),
               State('session-store', 'data'))
 def display_page(pathname, session_data):
     if session_data and session_data.get('authenticated'):
         return create_main_layout()
     else:
-        return login_layout
+        return create_login_layout()
 
-@app.callback([Output('session-store', 'data'),
+@callback([Output('session-store', 'data'),
                Output('login-alert', 'children'),
                Output('url', 'pathname')],
               Input('login-button', 'n_clicks'),
@@ -347,39 +279,146 @@ def display_page(pathname, session_data):
                State('password', 'value')])
 def login_user(n_clicks, username, password):
     if n_clicks and username and password:
-        password_hash = hashlib.md5(password.encode()).hexdigest()
-        if username in USERS and USERS[username]['password'] == password_hash:
+        if validate_login(username, password):
+            # Sessão Flask (cookie assinado) exigida pelos endpoints fora do Dash (/export/raw)
+            session[LOGIN_SESSION_KEY] = username
             return {'authenticated': True, 'username': username}, '', '/dashboard'
         else:
             alert = dbc.Alert("❌ Usuário ou senha incorretos!", color="danger")
             return {}, alert, '/'
     return {}, '', '/'
 
-@app.callback([Output('session-store', 'data', allow_duplicate=True),
+@callback([Output('session-store', 'data', allow_duplicate=True),
                Output('url', 'pathname', allow_duplicate=True)],
               Input('logout-button', 'n_clicks'),
               prevent_initial_call=True)
 def logout_user(n_clicks):
     if n_clicks:
+        session.pop(LOGIN_SESSION_KEY, None)
         return {}, '/'
     return {}, '/dashboard'
 
-@app.callback(Output('last-update', 'children'),
-              Input('interval-component', 'n_intervals'))
-def update_timestamp(n):
-    return f"Última atualização: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"
+# Callbacks puramente visuais rodam no navegador (app/assets/dstech_clientside.js)
+clientside_callback(
+    ClientsideFunction(namespace='dstech', function_name='updateTimestamp'),
+    Output('last-update', 'children'),
+    [Input('interval-component', 'n_intervals'),
+     Input('data-push-store', 'data')]
+)
 
-# Callback principal para conteúdo das tabs
-@app.callback(Output('tab-content', 'children'),
-              [Input('main-tabs', 'active_tab'),
+# Componentes atualizados periodicamente em cada aba. O tick do interval (ou a
+# notificação de novos dados) só dispara consultas para a aba ativa; as demais
+# ficam marcadas como desatualizadas e são recarregadas ao serem abertas.
+TAB_COMPONENTS = {
+    'resumo': ['efficiency-chart', 'water-chart', 'chemical-chart', 'executive-dashboard-chart'],
+    'tendencias': ['temp-trend-chart', 'sensors-trend-chart'],
+    'alarmes': ['top-alarms-chart', 'alarm-analysis-chart', 'active-alarms-table'],
+    'producao': ['production-client-chart', 'production-program-chart', 'production-heatmap-chart',
+                 'water-client-percentiles-chart'],
+    'relatorios': ['report-efficiency-chart', 'report-water-chart'],
+    'config': []
+}
+
+# Tabela de origem de cada componente - notificações de outras tabelas são ignoradas
+COMPONENT_DATASETS = {
+    'efficiency-chart': 'Rel_Diario',
+    'water-chart': 'Rel_Diario',
+    'chemical-chart': 'Rel_Quimico',
+    'executive-dashboard-chart': 'Rel_Diario',
+    'temp-trend-chart': 'TREND001',
+    'sensors-trend-chart': 'TREND001',
+    'top-alarms-chart': 'ALARMHISTORY',
+    'alarm-analysis-chart': 'ALARMHISTORY',
+    'active-alarms-table': 'ALARMHISTORY',
+    'production-client-chart': 'Rel_Carga',
+    'production-program-chart': 'Rel_Carga',
+    'production-heatmap-chart': 'Rel_Carga',
+    'water-client-percentiles-chart': 'Rel_Diario',
+    'report-efficiency-chart': 'Rel_Diario',
+    'report-water-chart': 'Rel_Diario'
+}
+
+# Versão do dataset (segundo o monitor de novos dados) na última atualização
+# de cada componente por aba: ticks do intervalo sem dados novos não consultam.
+# LRU limitado (abas fechadas saem sozinhas); cada worker tem o seu, e uma aba
+# atendida por outro worker apenas consulta de novo no primeiro tick.
+RENDERED_VERSIONS_MAX_ENTRIES = int(os.getenv('DSTECH_RENDERED_VERSIONS_MAX', '4096'))
+RENDERED_VERSIONS = OrderedDict()
+_rendered_versions_lock = threading.Lock()
+
+def skip_refresh(component_id, active_tab, push_data=None):
+    """Interrompe o callback quando o componente está oculto ou seus dados não mudaram"""
+    if component_id not in TAB_COMPONENTS.get(active_tab, []):
+        raise PreventUpdate
+    trigger = callback_context.triggered_id
+    dataset = COMPONENT_DATASETS.get(component_id)
+    if trigger == 'data-push-store':
+        if dataset not in (push_data or {}).get('datasets', []):
+            raise PreventUpdate
+
+    # O monitor verifica cada tabela na cadência do seu ritmo de chegada de dados
+    notifier.start()
+    if dataset not in notifier.watermarks:
+        return
+    tab_id = current_tab_id()
+    if tab_id is None:
+        return
+    key = (tab_id, component_id)
+    version = notifier.dataset_versions.get(dataset, 0)
+    with _rendered_versions_lock:
+        unchanged = trigger == 'interval-component' and RENDERED_VERSIONS.get(key) == version
+    if unchanged:
+        raise PreventUpdate
+    # Versão registrada só com a figura montada a partir do banco: falha,
+    # cancelamento ou último resultado bom deixam o próximo tick consultar de novo
+    after_fresh_result(functools.partial(record_rendered_version, key, version))
+
+def record_rendered_version(key, version):
+    """Registra a versão do dataset exibida por (aba, componente)"""
+    with _rendered_versions_lock:
+        RENDERED_VERSIONS[key] = version
+        RENDERED_VERSIONS.move_to_end(key)
+        while len(RENDERED_VERSIONS) > RENDERED_VERSIONS_MAX_ENTRIES:
+            RENDERED_VERSIONS.popitem(last=False)
+
+# Repassa a notificação SSE recebida pelo navegador para o data-push-store
+clientside_callback(
+    ClientsideFunction(namespace='dstech', function_name='readPush'),
+    Output('data-push-store', 'data'),
+    Input('push-trigger', 'n_clicks'),
+    prevent_initial_call=True
+)
+
+@callback(Output('stale-tabs', 'data'),
+              [Input('interval-component', 'n_intervals'),
+               Input('data-push-store', 'data'),
                Input('date-picker', 'start_date'),
                Input('date-picker', 'end_date'),
                Input('refresh-button', 'n_clicks'),
-               Input('interval-component', 'n_intervals')])
-def render_tab_content(active_tab, start_date, end_date, refresh_clicks, n_intervals):
+               Input('main-tabs', 'active_tab')],
+              State('stale-tabs', 'data'))
+def mark_stale_tabs(n_intervals, push_data, start_date, end_date, n_clicks, active_tab, stale_tabs):
+    """Marca as abas ocultas como desatualizadas (sem consultar o banco)
+
+    Novos dados marcam as abas com componentes das tabelas alteradas; mudança
+    de período ou atualização manual marca todas as ocultas.
+    """
+    stale = set(stale_tabs or [])
+    trigger = callback_context.triggered_id
+    if trigger in ('interval-component', 'data-push-store'):
+        changed = (push_data or {}).get('datasets', []) if trigger == 'data-push-store' else None
+        stale.update(tab for tab, components in TAB_COMPONENTS.items()
+                     if tab != active_tab and any(
+                         changed is None or COMPONENT_DATASETS[component] in changed
+                         for component in components))
+    elif trigger in ('date-picker', 'refresh-button'):
+        stale.update(TAB_COMPONENTS)
+    stale.discard(active_tab)
+    return sorted(stale)
+
+def create_tab_content(active_tab, start_date, end_date):
+    """Conteúdo de uma aba (os gráficos são preenchidos pelos próprios callbacks)"""
     try:
-        print(f"🔄 CALLBACK TAB EXECUTADO! active_tab={active_tab}, start_date={start_date}, end_date={end_date}")
-        
         # Valores padrão se None
         if start_date is None:
             start_date = (datetime.now() - timedelta(days=7)).isoformat()
@@ -408,239 +447,289 @@ def render_tab_content(active_tab, start_date, end_date, refresh_clicks, n_inter
         
     if active_tab == "config":
         return create_config_tab()
+
+# Callback principal para conteúdo das tabs
+# Cada aba é montada no seu painel na primeira abertura e remontada só se
+# estiver em stale-tabs; nos demais casos apenas troca o painel visível.
+# Mudanças de período e o botão Atualizar são atendidos pelos callbacks de
+# cada gráfico da aba ativa (e marcam as ocultas como desatualizadas).
+@callback(
+    [Output(f'tab-pane-{tab}', 'children') for tab in TAB_COMPONENTS] +
+    [Output(f'tab-pane-{tab}', 'style') for tab in TAB_COMPONENTS] +
+    [Output('loaded-tabs', 'data')],
+    Input('main-tabs', 'active_tab'),
+    [State('date-picker', 'start_date'),
+     State('date-picker', 'end_date'),
+     State('stale-tabs', 'data'),
+     State('loaded-tabs', 'data')]
+)
+def render_tab_content(active_tab, start_date, end_date, stale_tabs, loaded_tabs):
+    if active_tab not in TAB_COMPONENTS:
+        # Aba sem painel: mantém o que está na tela
+        raise PreventUpdate
+    loaded = set(loaded_tabs or [])
+    styles = [{} if tab == active_tab else {'display': 'none'} for tab in TAB_COMPONENTS]
+    if active_tab in loaded and active_tab not in (stale_tabs or []):
+        return [no_update] * len(TAB_COMPONENTS) + styles + [no_update]
     
-    return html.Div("Selecione uma aba")
+    content = create_tab_content(active_tab, start_date, end_date)
+    children = [content if tab == active_tab else no_update for tab in TAB_COMPONENTS]
+    return children + styles + [sorted(loaded | {active_tab})]
+
+# Carregamento progressivo: em períodos longos escolhidos pelo usuário o
+# callback devolve primeiro uma prévia barata e grava o período no store de
+# refinamento; um segundo callback troca a prévia pelo gráfico exato.
+PROGRESSIVE_MIN_DAYS = {'trend': 2, 'efficiency': 14}
+
+def wants_preview(kind, start_date, end_date):
+    """True quando vale mostrar prévia antes do gráfico exato
+
+    Ticks do intervalo e notificações de dados novos atualizam gráficos já
+    exibidos e vão direto ao resultado exato.
+    """
+    if callback_context.triggered_id in ('interval-component', 'data-push-store'):
+        return False
+    start = pd.to_datetime(start_date) if start_date else None
+    end = pd.to_datetime(end_date) if end_date else pd.Timestamp.now()
+    return start is not None and (end - start).days >= PROGRESSIVE_MIN_DAYS[kind]
+
+def is_current_period(refine, start_date, end_date):
+    """O pedido de refinamento ainda corresponde ao período selecionado?"""
+    return bool(refine) and refine.get('start') == start_date and refine.get('end') == end_date
 
 # Callbacks para gráficos de tendências
-@app.callback(Output('temp-trend-chart', 'figure'),
+# O histórico (reduzido) é enviado uma única vez por período; depois disso os
+# ticks/notificações só acrescentam os pontos novos via extendData.
+@callback([Output('temp-trend-chart', 'figure'),
+               Output('sensors-trend-chart', 'figure'),
+               Output('trend-stream-store', 'data'),
+               Output('trend-refine-store', 'data')],
               [Input('date-picker', 'start_date'),
                Input('date-picker', 'end_date'),
-               Input('refresh-button', 'n_clicks'),
-               Input('interval-component', 'n_intervals')])
-def update_temp_trend_chart(start_date, end_date, n_clicks, n_intervals):
-    return create_temperature_trend_chart(start_date, end_date)
+               Input('refresh-button', 'n_clicks')],
+              State('main-tabs', 'active_tab'),
+              State(TAB_ID_STORE, 'data'))
+@cancel_superseded
+def update_trend_charts(start_date, end_date, n_clicks, active_tab):
+    skip_refresh('temp-trend-chart', active_tab)
+    if wants_preview('trend', start_date, end_date):
+        preview = get_trend_history(start_date, end_date, max_points=TREND_PREVIEW_POINTS,
+                                    sample_percent=TREND_PREVIEW_SAMPLE_PERCENT)
+        if not preview.empty:
+            figures = [create_temperature_trend_chart(start_date, end_date, data=preview),
+                       create_sensors_trend_chart(start_date, end_date, data=preview)]
+            for fig in figures:
+                fig.layout.title.text += " ⏳ prévia por amostragem"
+            # Sem streaming sobre a prévia: o refinamento define a marca d'água real
+            return (*figures, {'live': False}, {'start': start_date, 'end': end_date})
+    return update_trend_history(start_date, end_date) + (no_update,)
 
-@app.callback(Output('sensors-trend-chart', 'figure'),
-              [Input('date-picker', 'start_date'),
-               Input('date-picker', 'end_date'),
-               Input('refresh-button', 'n_clicks'),
-               Input('interval-component', 'n_intervals')])
-def update_sensors_trend_chart(start_date, end_date, n_clicks, n_intervals):
-    return create_sensors_trend_chart(start_date, end_date)
+@callback([Output('temp-trend-chart', 'figure', allow_duplicate=True),
+               Output('sensors-trend-chart', 'figure', allow_duplicate=True),
+               Output('trend-stream-store', 'data', allow_duplicate=True)],
+              Input('trend-refine-store', 'data'),
+              [State('date-picker', 'start_date'),
+               State('date-picker', 'end_date')],
+              State(TAB_ID_STORE, 'data'),
+              prevent_initial_call=True)
+@cancel_superseded
+def refine_trend_charts(refine, start_date, end_date):
+    """Substitui a prévia das tendências pelo histórico completo do período"""
+    if not is_current_period(refine, start_date, end_date):
+        raise PreventUpdate
+    return update_trend_history(start_date, end_date)
+
+def update_trend_history(start_date, end_date):
+    """Figuras exatas das tendências e estado inicial do streaming"""
+    history = get_trend_history(start_date, end_date)
+    
+    # Streaming apenas quando o período inclui o dia de hoje; o último intervalo
+    # ainda está recebendo pontos e chega completo pelo streaming
+    live = not end_date or datetime.fromisoformat(end_date[:10]).date() >= datetime.now().date()
+    live = live and len(history) > 1
+    if live:
+        history = drop_open_bucket(history)
+    stream_state = {'last_ts': history.attrs.get('last_ts'), 'bucket': history.attrs.get('bucket_seconds'),
+                    'live': live}
+    
+    return (create_temperature_trend_chart(start_date, end_date, data=history),
+            create_sensors_trend_chart(start_date, end_date, data=history),
+            stream_state)
+
+@callback([Output('temp-trend-chart', 'extendData'),
+               Output('sensors-trend-chart', 'extendData'),
+               Output('trend-stream-store', 'data', allow_duplicate=True)],
+              [Input('interval-component', 'n_intervals'),
+               Input('data-push-store', 'data')],
+              [State('trend-stream-store', 'data'),
+               State('main-tabs', 'active_tab')],
+              State(TAB_ID_STORE, 'data'),
+              prevent_initial_call=True)
+@cancel_superseded(query_class_name='live')
+def stream_trend_charts(n_intervals, push_data, stream_state, active_tab):
+    skip_refresh('temp-trend-chart', active_tab, push_data)
+    if not stream_state or not stream_state.get('live') or not stream_state.get('last_ts') \
+            or not stream_state.get('bucket'):
+        raise PreventUpdate
+    
+    new_points = get_trend_points_since(stream_state['last_ts'], stream_state['bucket'])
+    if new_points.empty:
+        raise PreventUpdate
+    
+    extend = build_trend_extend_data(new_points)
+    stream_state = dict(stream_state, last_ts=new_points.attrs['last_ts'])
+    return extend, extend, stream_state
 
 # Callbacks para gráficos com filtros de data
-@app.callback(Output('efficiency-chart', 'figure'),
+@callback([Output('efficiency-chart', 'figure'),
+               Output('efficiency-refine-store', 'data')],
               [Input('date-picker', 'start_date'),
                Input('date-picker', 'end_date'),
                Input('refresh-button', 'n_clicks'),
-               Input('interval-component', 'n_intervals')])
-def update_efficiency_chart(start_date, end_date, n_clicks, n_intervals):
+               Input('interval-component', 'n_intervals'),
+               Input('data-push-store', 'data')],
+              State('main-tabs', 'active_tab'),
+              State(TAB_ID_STORE, 'data'))
+@cancel_superseded
+def update_efficiency_chart(start_date, end_date, n_clicks, n_intervals, push_data, active_tab):
+    skip_refresh('efficiency-chart', active_tab, push_data)
+    if wants_preview('efficiency', start_date, end_date):
+        return create_efficiency_preview_chart(start_date, end_date), {'start': start_date, 'end': end_date}
+    return create_efficiency_chart(start_date, end_date), no_update
+
+@callback(Output('efficiency-chart', 'figure', allow_duplicate=True),
+              Input('efficiency-refine-store', 'data'),
+              [State('date-picker', 'start_date'),
+               State('date-picker', 'end_date')],
+              State(TAB_ID_STORE, 'data'),
+              prevent_initial_call=True)
+@cancel_superseded
+def refine_efficiency_chart(refine, start_date, end_date):
+    """Substitui a prévia diária da eficiência pelo gráfico por ciclo"""
+    if not is_current_period(refine, start_date, end_date):
+        raise PreventUpdate
     return create_efficiency_chart(start_date, end_date)
 
-@app.callback(Output('water-chart', 'figure'),
+@callback(Output('water-chart', 'figure'),
               [Input('date-picker', 'start_date'),
                Input('date-picker', 'end_date'),
                Input('refresh-button', 'n_clicks'),
-               Input('interval-component', 'n_intervals')])
-def update_water_chart(start_date, end_date, n_clicks, n_intervals):
+               Input('interval-component', 'n_intervals'),
+               Input('data-push-store', 'data')],
+              State('main-tabs', 'active_tab'),
+              State(TAB_ID_STORE, 'data'))
+@cancel_superseded
+def update_water_chart(start_date, end_date, n_clicks, n_intervals, push_data, active_tab):
+    skip_refresh('water-chart', active_tab, push_data)
     return create_water_consumption_chart(start_date, end_date)
 
-@app.callback(Output('chemical-chart', 'figure'),
+@callback(Output('chemical-chart', 'figure'),
               [Input('date-picker', 'start_date'),
                Input('date-picker', 'end_date'),
                Input('refresh-button', 'n_clicks'),
-               Input('interval-component', 'n_intervals')])
-def update_chemical_chart(start_date, end_date, n_clicks, n_intervals):
+               Input('interval-component', 'n_intervals'),
+               Input('data-push-store', 'data')],
+              State('main-tabs', 'active_tab'),
+              State(TAB_ID_STORE, 'data'))
+@cancel_superseded
+def update_chemical_chart(start_date, end_date, n_clicks, n_intervals, push_data, active_tab):
+    skip_refresh('chemical-chart', active_tab, push_data)
     return create_chemical_consumption_chart(start_date, end_date)
 
-@app.callback(Output('top-alarms-chart', 'figure'),
+@callback(Output('top-alarms-chart', 'figure'),
               [Input('date-picker', 'start_date'),
                Input('date-picker', 'end_date'),
                Input('refresh-button', 'n_clicks'),
-               Input('interval-component', 'n_intervals')])
-def update_top_alarms_chart(start_date, end_date, n_clicks, n_intervals):
+               Input('interval-component', 'n_intervals'),
+               Input('data-push-store', 'data')],
+              State('main-tabs', 'active_tab'),
+              State(TAB_ID_STORE, 'data'))
+@cancel_superseded
+def update_top_alarms_chart(start_date, end_date, n_clicks, n_intervals, push_data, active_tab):
+    skip_refresh('top-alarms-chart', active_tab, push_data)
     return create_top_alarms_chart(start_date, end_date)
 
-@app.callback(Output('alarm-analysis-chart', 'figure'),
+@callback(Output('alarm-analysis-chart', 'figure'),
               [Input('date-picker', 'start_date'),
                Input('date-picker', 'end_date'),
                Input('refresh-button', 'n_clicks'),
-               Input('interval-component', 'n_intervals')])
-def update_alarm_analysis_chart(start_date, end_date, n_clicks, n_intervals):
+               Input('interval-component', 'n_intervals'),
+               Input('data-push-store', 'data')],
+              State('main-tabs', 'active_tab'),
+              State(TAB_ID_STORE, 'data'))
+@cancel_superseded
+def update_alarm_analysis_chart(start_date, end_date, n_clicks, n_intervals, push_data, active_tab):
+    skip_refresh('alarm-analysis-chart', active_tab, push_data)
     return create_alarm_analysis_chart(start_date, end_date)
 
-@app.callback(Output('production-client-chart', 'figure'),
+def refresh_production_cube():
+    """Atualiza o cubo de Rel_Carga só quando há dados novos ou pedido do usuário
+
+    Mudanças de datas e filtros são atendidas pelo cubo em memória.
+    """
+    if callback_context.triggered_id in ('interval-component', 'data-push-store', 'refresh-button'):
+        production_cube.refresh()
+
+@callback([Output('production-client-chart', 'figure'),
+               Output('production-program-chart', 'figure'),
+               Output('production-heatmap-chart', 'figure')],
               [Input('date-picker', 'start_date'),
                Input('date-picker', 'end_date'),
+               Input('production-client-filter', 'value'),
                Input('refresh-button', 'n_clicks'),
-               Input('interval-component', 'n_intervals')])
-def update_production_client_chart(start_date, end_date, n_clicks, n_intervals):
-    return create_production_by_client_chart(start_date, end_date)
+               Input('interval-component', 'n_intervals'),
+               Input('data-push-store', 'data')],
+              State('main-tabs', 'active_tab'),
+              State(TAB_ID_STORE, 'data'))
+@cancel_superseded(query_class_name='analytics')
+def update_production_summary_charts(start_date, end_date, client_filter, n_clicks, n_intervals, push_data, active_tab):
+    """Produção por cliente, por programa e cliente × programa a partir de um único recorte do cubo"""
+    skip_refresh('production-client-chart', active_tab, push_data)
+    refresh_production_cube()
+    summary = production_cube.summary(start_date, end_date, client_filter)
+    return (create_production_by_client_chart(summary=summary),
+            create_production_by_program_chart(summary=summary),
+            create_client_program_heatmap(summary=summary))
 
-@app.callback(Output('production-program-chart', 'figure'),
+@callback(Output('water-client-percentiles-chart', 'figure'),
               [Input('date-picker', 'start_date'),
                Input('date-picker', 'end_date'),
                Input('refresh-button', 'n_clicks'),
-               Input('interval-component', 'n_intervals')])
-def update_production_program_chart(start_date, end_date, n_clicks, n_intervals):
-    return create_production_by_program_chart(start_date, end_date)
-
-# Callbacks para filtros de produção
-# Callback para mostrar/ocultar date-picker personalizado
-@app.callback(Output('custom-date-container', 'style'),
-              Input('period-filter-dropdown', 'value'))
-def toggle_custom_date_picker(period_value):
-    if period_value == 'custom':
-        return {'display': 'block'}
-    return {'display': 'none'}
-
-@app.callback([Output('client-analysis-chart', 'figure'),
-               Output('production-client-chart', 'figure', allow_duplicate=True),
-               Output('production-program-chart', 'figure', allow_duplicate=True)],
-              [Input('client-filter-dropdown', 'value'),
-               Input('period-filter-dropdown', 'value'),
-               Input('refresh-production-btn', 'n_clicks'),
-               Input('production-date-picker', 'start_date'),
-               Input('production-date-picker', 'end_date')],
-              prevent_initial_call=True)
-def update_production_charts(client_filter, period_filter, n_clicks, custom_start, custom_end):
-    print(f"DEBUG: Filtros recebidos - Cliente: {client_filter}, Período: {period_filter}")
-    
-    # Calcular datas baseado no período
-    if period_filter and period_filter != 'custom':
-        from datetime import datetime, timedelta
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=int(period_filter))
-        start_date = start_date.strftime('%Y-%m-%d')
-        end_date = end_date.strftime('%Y-%m-%d')
-        print(f"DEBUG: Datas calculadas - Início: {start_date}, Fim: {end_date}")
-    elif period_filter == 'custom' and custom_start and custom_end:
-        # Usar datas personalizadas
-        start_date = custom_start
-        end_date = custom_end
-        print(f"DEBUG: Datas personalizadas - Início: {start_date}, Fim: {end_date}")
-    else:
-        # Padrão: últimos 30 dias
-        from datetime import datetime, timedelta
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=30)
-        start_date = start_date.strftime('%Y-%m-%d')
-        end_date = end_date.strftime('%Y-%m-%d')
-        print(f"DEBUG: Datas padrão - Início: {start_date}, Fim: {end_date}")
-    
-    # Atualizar gráficos com filtros
-    try:
-        client_analysis = create_client_analysis_chart(client_filter if client_filter != 'all' else None)
-        production_client = create_production_by_client_chart(start_date, end_date, client_filter if client_filter != 'all' else None)
-        production_program = create_production_by_program_chart(start_date, end_date, client_filter if client_filter != 'all' else None)
-        print("DEBUG: Gráficos atualizados com sucesso")
-        return client_analysis, production_client, production_program
-    except Exception as e:
-        print(f"ERRO: {str(e)}")
-        # Retornar gráficos padrão em caso de erro
-        return create_client_analysis_chart(), create_production_by_client_chart(), create_production_by_program_chart()
-
-
-
-# Função para obter detalhes dos químicos
-def get_chemical_details():
-    """Obtém detalhes dos químicos utilizados da tabela Rel_Quimico"""
-    query = """
-    SELECT 
-        'Químico Q1 (Detergente Principal)' as tipo_quimico,
-        SUM("Q1") as quantidade_total,
-        COUNT(*) as registros,
-        AVG("Q1") as media_por_registro
-    FROM "Rel_Quimico" 
-    WHERE "Time_Stamp" >= CURRENT_DATE - INTERVAL '7 days'
-      AND "Q1" > 0
-    
-    UNION ALL
-    
-    SELECT 
-        'Químico Q2 (Detergente Secundário)' as tipo_quimico,
-        SUM("Q2") as quantidade_total,
-        COUNT(*) as registros,
-        AVG("Q2") as media_por_registro
-    FROM "Rel_Quimico" 
-    WHERE "Time_Stamp" >= CURRENT_DATE - INTERVAL '7 days'
-      AND "Q2" > 0
-    
-    UNION ALL
-    
-    SELECT 
-        'Químico Q3 (Alvejante)' as tipo_quimico,
-        SUM("Q3") as quantidade_total,
-        COUNT(*) as registros,
-        AVG("Q3") as media_por_registro
-    FROM "Rel_Quimico" 
-    WHERE "Time_Stamp" >= CURRENT_DATE - INTERVAL '7 days'
-      AND "Q3" > 0
-    
-    UNION ALL
-    
-    SELECT 
-        'Químico Q4 (Amaciante)' as tipo_quimico,
-        SUM("Q4") as quantidade_total,
-        COUNT(*) as registros,
-        AVG("Q4") as media_por_registro
-    FROM "Rel_Quimico" 
-    WHERE "Time_Stamp" >= CURRENT_DATE - INTERVAL '7 days'
-      AND "Q4" > 0
-    
-    UNION ALL
-    
-    SELECT 
-        'Químico Q5 (Neutralizante)' as tipo_quimico,
-        SUM("Q5") as quantidade_total,
-        COUNT(*) as registros,
-        AVG("Q5") as media_por_registro
-    FROM "Rel_Quimico" 
-    WHERE "Time_Stamp" >= CURRENT_DATE - INTERVAL '7 days'
-      AND "Q5" > 0
-    
-    ORDER BY quantidade_total DESC
-    """
-    
-    try:
-        df = execute_query(query)
-        if df.empty:
-            return []
-        
-        # Converter para formato esperado pelos relatórios
-        result = []
-        for _, row in df.iterrows():
-            result.append({
-                'tipo_quimico': row['tipo_quimico'],
-                'quantidade_kg': row['quantidade_total'] / 1000,  # Converter para kg se necessário
-                'ciclos_utilizados': row['registros'],
-                'media_por_ciclo': row['media_por_registro'] / 1000 if row['media_por_registro'] else 0
-            })
-        
-        return result
-    except Exception as e:
-        print(f"Erro ao obter detalhes dos químicos: {e}")
-        return []
+               Input('interval-component', 'n_intervals'),
+               Input('data-push-store', 'data')],
+              State('main-tabs', 'active_tab'),
+              State(TAB_ID_STORE, 'data'))
+@cancel_superseded(query_class_name='analytics')
+def update_water_client_percentiles_chart(start_date, end_date, n_clicks, n_intervals, push_data, active_tab):
+    skip_refresh('water-client-percentiles-chart', active_tab, push_data)
+    return create_water_client_percentiles_chart(start_date, end_date)
 
 # Callback para atualizar KPIs dinamicamente
-@app.callback(
-    [Output('kg-hoje-value', 'children'),
-     Output('ciclos-hoje-value', 'children'),
-     Output('agua-hoje-value', 'children'),
-     Output('agua-ratio-value', 'children'),
-     Output('quimicos-hoje-value', 'children'),
-     Output('quimicos-ratio-value', 'children'),
-     Output('alarmes-ativos-value', 'children'),
-     Output('producao-semanal-value', 'children'),
-     Output('ciclos-semana-value', 'children'),
-     Output('eficiencia-media-value', 'children'),
-     Output('media-ciclo-value', 'children')],
+# Apenas os cards cujo valor mudou são enviados; os demais retornam no_update.
+# Cards recém-montados (ainda com o texto de carregamento) recebem todos os valores.
+KPI_PLACEHOLDER = "🔄 Carregando..."
+KPI_OUTPUTS = ['kg-hoje-value', 'ciclos-hoje-value', 'agua-hoje-value', 'agua-ratio-value',
+               'quimicos-hoje-value', 'quimicos-ratio-value', 'alarmes-ativos-value',
+               'producao-semanal-value', 'ciclos-semana-value', 'eficiencia-media-value',
+               'media-ciclo-value']
+
+@callback(
+    [Output(component_id, 'children') for component_id in KPI_OUTPUTS] +
+    [Output('kpi-store', 'data')],
     [Input('date-picker', 'start_date'),
      Input('date-picker', 'end_date')],
+    [State('kpi-store', 'data'),
+     State('kg-hoje-value', 'children'),
+     State('main-tabs', 'active_tab')],
+    State(TAB_ID_STORE, 'data'),
     prevent_initial_call=False
 )
-def update_kpis(start_date, end_date):
+@cancel_superseded(query_class_name='live')
+def update_kpis(start_date, end_date, previous_values, rendered_value, active_tab):
     """Atualiza os KPIs baseado nos filtros selecionados"""
+    # Com a aba Resumo oculta ela fica desatualizada e é remontada ao abrir
+    if active_tab != 'resumo':
+        raise PreventUpdate
     
     print(f"🔄 CALLBACK KPIs EXECUTADO! start_date={start_date}, end_date={end_date}")
     
@@ -661,8 +750,8 @@ def update_kpis(start_date, end_date):
     kpis = get_operational_kpis(filter_start, filter_end, None)
     print(f"📊 KPIs obtidos: {kpis['quilos_lavados_hoje']} kg")
     
-    # Retornar valores formatados
-    return (
+    # Valores formatados
+    values = [
         f"{kpis['quilos_lavados_hoje']} kg",
         f"Ciclos: {kpis['ciclos_hoje']}",
         f"{kpis['litros_agua_hoje']} L",
@@ -674,288 +763,60 @@ def update_kpis(start_date, end_date):
         f"Ciclos: {kpis['ciclos_semana']}",
         f"{kpis['eficiencia_media']:.1f}%",
         f"{(kpis['quilos_lavados_hoje_raw']/kpis['ciclos_hoje'] if kpis['ciclos_hoje'] > 0 else 0):.1f} kg"
-    )
-
-def get_client_performance_comparison(start_date, end_date):
-    """Busca dados de performance por cliente com dados reais e simulados"""
-    try:
-        db_manager = DatabaseManager()
-        
-        query = """
-        SELECT 
-            COALESCE(client_name, 'Cliente ' || LPAD(client_id::text, 3, '0')) as cliente_nome,
-            client_id,
-            SUM(production_kg) as total_kg,
-            SUM(water_liters) as total_water_liters,
-            AVG(water_liters::float / NULLIF(production_kg, 0)) as water_efficiency_l_per_kg
-        FROM client_production 
-        WHERE date_recorded BETWEEN %s AND %s
-        GROUP BY client_id, client_name
-        ORDER BY total_kg DESC
-        LIMIT 10
-        """
-        
-        df = db_manager.execute_query(query, (start_date, end_date))
-        
-        if df.empty:
-            # Dados simulados se não houver dados reais
-            import pandas as pd
-            df = pd.DataFrame({
-                'cliente_nome': ['Hospital São Lucas', 'Hotel Presidente', 'Lavanderia Central', 'Clínica Médica', 'Hotel Plaza'],
-                'client_id': [1, 2, 3, 4, 5],
-                'total_kg': [15650, 18200, 12800, 16750, 14300],
-                'total_water_liters': [48673, 56584, 39808, 52093, 44473],
-                'water_efficiency_l_per_kg': [3.11, 3.11, 3.11, 3.11, 3.11]
-            })
-            
-        return df
-        
-    except Exception as e:
-        print(f"Erro ao buscar dados de clientes: {e}")
-        # Retornar dados simulados em caso de erro
-        import pandas as pd
-        return pd.DataFrame({
-            'cliente_nome': ['Hospital São Lucas', 'Hotel Presidente', 'Lavanderia Central', 'Clínica Médica', 'Hotel Plaza'],
-            'client_id': [1, 2, 3, 4, 5],
-            'total_kg': [15650, 18200, 12800, 16750, 14300],
-            'total_water_liters': [48673, 56584, 39808, 52093, 44473],
-            'water_efficiency_l_per_kg': [3.11, 3.11, 3.11, 3.11, 3.11]
-        })
+    ]
+    
+    if not previous_values or rendered_value == KPI_PLACEHOLDER:
+        previous_values = [None] * len(values)
+    if values == previous_values:
+        raise PreventUpdate
+    
+    return [no_update if value == previous else value
+            for value, previous in zip(values, previous_values)] + [values]
 
+# Callback para atualizar a tabela de alarmes ativos com patches parciais
+@callback(
+    [Output('active-alarms-table', 'data'),
+     Output('active-alarms-title', 'children')],
+    [Input('interval-component', 'n_intervals'),
+     Input('data-push-store', 'data'),
+     Input('refresh-button', 'n_clicks')],
+    [State('active-alarms-table', 'data'),
+     State('active-alarms-title', 'children'),
+     State('main-tabs', 'active_tab')],
+    State(TAB_ID_STORE, 'data'),
+    prevent_initial_call=True
+)
+@cancel_superseded(query_class_name='live')
+def update_active_alarms_table(n_intervals, push_data, n_clicks, current_rows, current_title, active_tab):
+    """Envia apenas as linhas/células alteradas da tabela de alarmes ativos"""
+    skip_refresh('active-alarms-table', active_tab, push_data)
+    
+    rows = get_active_alarms_rows()
+    title = get_active_alarms_title(rows)
+    return diff_table_rows(current_rows, rows), (no_update if title == current_title else title)
 
 # Callback para exportação de relatório
-@app.callback(Output('download-report', 'data'),
+# Executado em segundo plano (processo separado gerenciado pelo DiskcacheManager)
+# para que exportações longas não ocupem os workers dos callbacks interativos.
+@callback(Output('download-report', 'data'),
               [Input('export-report-btn', 'n_clicks')],
               [State('export-format-dropdown', 'value'),
                State('report-period-dropdown', 'value'),
                State('date-picker', 'start_date'),
                State('date-picker', 'end_date')],
+              background=True,
+              progress=[Output('export-progress', 'value'),
+                        Output('export-progress', 'label')],
+              running=[(Output('export-report-btn', 'disabled'), True, False),
+                       (Output('cancel-export-btn', 'disabled'), False, True),
+                       (Output('export-progress', 'style'), {'display': 'flex'}, {'display': 'none'})],
+              cancel=[Input('cancel-export-btn', 'n_clicks')],
               prevent_initial_call=True)
-def export_report(n_clicks, export_format, period_days, start_date, end_date):
+def export_report(set_progress, n_clicks, export_format, period_days, start_date, end_date):
     if n_clicks:
-        import json
-        import pandas as pd
-        from datetime import datetime, timedelta
-        import io
-        import base64
-        
-        # Determinar período baseado na seleção
-        if period_days == 'custom':
-            # Usar datas do date-picker
-            start_dt = datetime.fromisoformat(start_date) if start_date else datetime.now() - timedelta(days=7)
-            end_dt = datetime.fromisoformat(end_date) if end_date else datetime.now()
-        else:
-            # Usar período selecionado
-            end_dt = datetime.now()
-            start_dt = end_dt - timedelta(days=period_days)
-        report = generate_executive_report(start_dt, end_dt)
-        chemical_details = get_chemical_details()
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        if export_format == 'txt':
-            # Criar conteúdo do relatório em texto
-            report_content = f"""# RELATÓRIO EXECUTIVO - DSTECH LAVANDERIA
-Gerado em: {report['timestamp']}
-Período: Últimos {period_days} dias
-
-## RESUMO DE PRODUÇÃO
-- Produção Hoje: {report['production_summary']['daily_production']} kg ({report['production_summary']['daily_cycles']} ciclos)
-- Produção Semanal: {report['production_summary']['weekly_production']} kg ({report['production_summary']['weekly_cycles']} ciclos)
-- Eficiência Média: {report['production_summary']['efficiency']}
-
-## RESUMO DE CONSUMOS
-- Água Hoje: {report['consumption_summary']['water_today']} L ({report['consumption_summary']['water_per_kg']})
-- Químicos Hoje: {report['consumption_summary']['chemicals_today']} ({report['consumption_summary']['chemicals_per_kg']})
-
-## DETALHAMENTO DE QUÍMICOS (Últimos 7 dias)
-"""
-            for chem in chemical_details:
-                report_content += f"- {chem['tipo_quimico']}: {chem['quantidade_kg']:.1f} kg ({chem['ciclos_utilizados']} ciclos)\n"
-            
-            report_content += f"""
-
-## RESUMO DE ALARMES
-- Alarmes Ativos: {report['alarms_summary']['active_alarms']}
-- Total do Mês: {report['alarms_summary']['total_month']}
-- Críticos/Altos: {report['alarms_summary']['critical_high']}
-- Tempo Médio de Resolução: {report['alarms_summary']['avg_resolution']}
-
-## RECOMENDAÇÕES
-"""
-            for i, rec in enumerate(report['recommendations'], 1):
-                report_content += f"{i}. {rec}\n"
-            
-            filename = f"relatorio_executivo_{timestamp}.txt"
-            return dict(content=report_content, filename=filename)
-            
-        elif export_format == 'excel':
-            # Criar Excel com múltiplas abas
-            output = io.BytesIO()
-            
-            # Dados de produção
-            prod_data = {
-                'Métrica': ['Produção Hoje (kg)', 'Ciclos Hoje', 'Produção Semanal (kg)', 'Ciclos Semana', 'Eficiência Média'],
-                'Valor': [report['production_summary']['daily_production'], 
-                         report['production_summary']['daily_cycles'],
-                         report['production_summary']['weekly_production'],
-                         report['production_summary']['weekly_cycles'],
-                         report['production_summary']['efficiency']]
-            }
-            
-            # Dados de consumo
-            cons_data = {
-                'Métrica': ['Água Hoje (L)', 'Água por Kg', 'Químicos Hoje', 'Químicos por Kg'],
-                'Valor': [report['consumption_summary']['water_today'],
-                         report['consumption_summary']['water_per_kg'],
-                         report['consumption_summary']['chemicals_today'],
-                         report['consumption_summary']['chemicals_per_kg']]
-            }
-            
-            # Dados de químicos detalhados
-            if chemical_details:
-                chem_data = {
-                    'Tipo de Químico': [chem['tipo_quimico'] for chem in chemical_details],
-                    'Quantidade (kg)': [round(chem['quantidade_kg'], 2) for chem in chemical_details],
-                    'Ciclos Utilizados': [chem['ciclos_utilizados'] for chem in chemical_details],
-                    'Média por Ciclo (kg)': [round(chem['media_por_ciclo'], 3) for chem in chemical_details]
-                }
-            else:
-                chem_data = {'Tipo de Químico': ['Sem dados'], 'Quantidade (kg)': [0], 'Ciclos Utilizados': [0], 'Média por Ciclo (kg)': [0]}
-            
-            # Dados de alarmes
-            alarm_data = {
-                'Métrica': ['Alarmes Ativos', 'Total do Mês', 'Críticos/Altos', 'Tempo Médio Resolução'],
-                'Valor': [report['alarms_summary']['active_alarms'],
-                         report['alarms_summary']['total_month'],
-                         report['alarms_summary']['critical_high'],
-                         report['alarms_summary']['avg_resolution']]
-            }
-            
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                pd.DataFrame(prod_data).to_excel(writer, sheet_name='Produção', index=False)
-                pd.DataFrame(cons_data).to_excel(writer, sheet_name='Consumos', index=False)
-                pd.DataFrame(chem_data).to_excel(writer, sheet_name='Químicos', index=False)
-                pd.DataFrame(alarm_data).to_excel(writer, sheet_name='Alarmes', index=False)
-                pd.DataFrame({'Recomendações': report['recommendations']}).to_excel(writer, sheet_name='Recomendações', index=False)
-            
-            filename = f"relatorio_executivo_{timestamp}.xlsx"
-            return dict(content=base64.b64encode(output.getvalue()).decode(), filename=filename, base64=True)
-            
-        elif export_format == 'pdf':
-            # Criar HTML com layout profissional para PDF
-            chemicals_html = ""
-            if chemical_details:
-                chemicals_html = "<h2 style='color: #2c3e50; border-bottom: 2px solid #3498db;'>DETALHAMENTO DE QUÍMICOS (Últimos 7 dias)</h2><table style='width: 100%; border-collapse: collapse; margin: 20px 0;'><tr style='background-color: #3498db; color: white;'><th style='padding: 10px; border: 1px solid #ddd;'>Tipo</th><th style='padding: 10px; border: 1px solid #ddd;'>Quantidade (kg)</th><th style='padding: 10px; border: 1px solid #ddd;'>Ciclos</th><th style='padding: 10px; border: 1px solid #ddd;'>Média/Ciclo</th></tr>"
-                for chem in chemical_details:
-                    chemicals_html += f"<tr><td style='padding: 8px; border: 1px solid #ddd;'>{chem['tipo_quimico']}</td><td style='padding: 8px; border: 1px solid #ddd; text-align: right;'>{chem['quantidade_kg']:.1f}</td><td style='padding: 8px; border: 1px solid #ddd; text-align: center;'>{chem['ciclos_utilizados']}</td><td style='padding: 8px; border: 1px solid #ddd; text-align: right;'>{chem['media_por_ciclo']:.3f}</td></tr>"
-                chemicals_html += "</table>"
-            
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset='UTF-8'>
-                <title>Relatório Executivo - DSTech</title>
-                <style>
-                    body {{ font-family: 'Segoe UI', Arial, sans-serif; margin: 40px; color: #2c3e50; line-height: 1.6; }}
-                    .header {{ text-align: center; margin-bottom: 40px; padding: 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; border-radius: 10px; }}
-                    .header h1 {{ margin: 0; font-size: 28px; font-weight: bold; }}
-                    .header p {{ margin: 5px 0; font-size: 14px; opacity: 0.9; }}
-                    .section {{ margin: 30px 0; padding: 20px; background: #f8f9fa; border-radius: 8px; border-left: 4px solid #3498db; }}
-                    .section h2 {{ color: #2c3e50; margin-top: 0; border-bottom: 2px solid #3498db; padding-bottom: 10px; }}
-                    .metrics {{ display: flex; flex-wrap: wrap; gap: 15px; margin: 20px 0; }}
-                    .metric {{ background: white; padding: 15px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); flex: 1; min-width: 200px; }}
-                    .metric-value {{ font-size: 24px; font-weight: bold; color: #3498db; }}
-                    .metric-label {{ font-size: 12px; color: #7f8c8d; text-transform: uppercase; }}
-                    ul {{ list-style-type: none; padding: 0; }}
-                    li {{ background: white; margin: 8px 0; padding: 12px; border-radius: 5px; border-left: 3px solid #3498db; }}
-                    .recommendations {{ background: #e8f5e8; border-left-color: #27ae60; }}
-                    .recommendations li {{ border-left-color: #27ae60; }}
-                    table {{ width: 100%; border-collapse: collapse; margin: 20px 0; background: white; }}
-                    th {{ background: #3498db; color: white; padding: 12px; text-align: left; }}
-                    td {{ padding: 10px; border-bottom: 1px solid #ecf0f1; }}
-                    tr:nth-child(even) {{ background: #f8f9fa; }}
-                    .footer {{ text-align: center; margin-top: 40px; padding: 20px; background: #34495e; color: white; border-radius: 8px; }}
-                </style>
-            </head>
-            <body>
-                <div class='header'>
-                    <h1>🏢 RELATÓRIO EXECUTIVO - DSTECH LAVANDERIA</h1>
-                    <p><strong>Gerado em:</strong> {report['timestamp']}</p>
-                    <p><strong>Período de Análise:</strong> {start_dt.strftime('%d/%m/%Y')} a {end_dt.strftime('%d/%m/%Y')}</p>
-                </div>
-                
-                <div class='section'>
-                    <h2>🏢 RESUMO DE PRODUÇÃO</h2>
-                    <div class='metrics'>
-                        <div class='metric'>
-                            <div class='metric-value'>{report['production_summary']['period_production']}</div>
-                            <div class='metric-label'>kg Produzidos no Período</div>
-                        </div>
-                        <div class='metric'>
-                            <div class='metric-value'>{report['production_summary']['period_cycles']}</div>
-                            <div class='metric-label'>Ciclos no Período</div>
-                        </div>
-                        <div class='metric'>
-                            <div class='metric-value'>{report['production_summary']['daily_avg']}</div>
-                            <div class='metric-label'>Média Diária (kg)</div>
-                        </div>
-                        <div class='metric'>
-                            <div class='metric-value'>{report['production_summary']['efficiency']}</div>
-                            <div class='metric-label'>Eficiência Média</div>
-                        </div>
-                    </div>
-                </div>
-                
-                <div class='section'>
-                    <h2>💧 RESUMO DE CONSUMOS</h2>
-                    <ul>
-                        <li><strong>Água no Período:</strong> {report['consumption_summary']['water_period']} L ({report['consumption_summary']['water_per_kg']})</li>
-                        <li><strong>Químicos no Período:</strong> {report['consumption_summary']['chemicals_period']} ({report['consumption_summary']['chemicals_per_kg']})</li>
-                    </ul>
-                </div>
-                
-                {chemicals_html}
-                
-                <div class='section'>
-                    <h2>🚨 RESUMO DE ALARMES</h2>
-                    <div class='metrics'>
-                        <div class='metric'>
-                            <div class='metric-value' style='color: #e74c3c;'>{report['alarms_summary']['active_alarms']}</div>
-                            <div class='metric-label'>Alarmes Ativos</div>
-                        </div>
-                        <div class='metric'>
-                            <div class='metric-value'>{report['alarms_summary']['period_alarms']}</div>
-                            <div class='metric-label'>Alarmes no Período</div>
-                        </div>
-                        <div class='metric'>
-                            <div class='metric-value'>{report['alarms_summary']['critical_high']}</div>
-                            <div class='metric-label'>Críticos/Altos</div>
-                        </div>
-                        <div class='metric'>
-                            <div class='metric-value'>{report['alarms_summary']['avg_resolution']}</div>
-                            <div class='metric-label'>Tempo Médio Resolução</div>
-                        </div>
-                    </div>
-                </div>
-                
-                <div class='section recommendations'>
-                    <h2>💡 RECOMENDAÇÕES</h2>
-                    <ul>
-                        """ + '\n'.join([f"<li><strong>{i+1}.</strong> {rec}</li>" for i, rec in enumerate(report['recommendations'])]) + f"""
-                    </ul>
-                </div>
-                
-                <div class='footer'>
-                    <p>🔧 DSTech Industrial Dashboard | Relatório gerado automaticamente</p>
-                    <p>Para mais informações, acesse o dashboard em tempo real</p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            filename = f"relatorio_executivo_{timestamp}.html"
-            return dict(content=html_content, filename=filename)
+        with query_class('export'):
+            return build_report_export(export_format, period_days, start_date, end_date,
+                                       set_progress=set_progress)
     
     return None
 
@@ -994,7 +855,7 @@ def create_resumo_tab(start_date, end_date, client_filter='all'):
                 dbc.Card([
                     dbc.CardBody([
                         html.Div([
-                            html.H3("🔄 Carregando...", className="text-primary mb-0", id="kg-hoje-value"),
+                            html.H3(KPI_PLACEHOLDER, className="text-primary mb-0", id="kg-hoje-value"),
                             html.P("📦 Quilos Lavados Hoje", className="mb-0 text-muted"),
                             html.Small("Aguarde...", className="text-primary", id="ciclos-hoje-value")
                         ])
@@ -1082,7 +943,7 @@ def create_resumo_tab(start_date, end_date, client_filter='all'):
                     html.H5("⚡ Eficiência Operacional", className="mb-0")
                 ]),
                 dbc.CardBody([
-                    dcc.Graph(id='efficiency-chart', figure=create_efficiency_chart(), className='responsive-graph')
+                    dcc.Graph(id='efficiency-chart', className='responsive-graph')
                 ])
             ])
         ], xs=12, sm=12, md=12, lg=6, xl=6),  # Responsivo: mobile=1col, desktop=2col
@@ -1092,7 +953,7 @@ def create_resumo_tab(start_date, end_date, client_filter='all'):
                     html.H5("💧 Consumo de Água por Kg", className="mb-0")
                 ]),
                 dbc.CardBody([
-                    dcc.Graph(id='water-chart', figure=create_water_consumption_chart(), className='responsive-graph')
+                    dcc.Graph(id='water-chart', className='responsive-graph')
                 ])
             ])
         ], xs=12, sm=12, md=12, lg=6, xl=6)  # Responsivo: mobile=1col, desktop=2col
@@ -1106,7 +967,7 @@ def create_resumo_tab(start_date, end_date, client_filter='all'):
                     html.H5("🧪 Consumo de Químicos por Kg", className="mb-0")
                 ]),
                 dbc.CardBody([
-                    dcc.Graph(id='chemical-chart', figure=create_chemical_consumption_chart(), className='responsive-graph')
+                    dcc.Graph(id='chemical-chart', className='responsive-graph')
                 ])
             ])
         ], width=12)
@@ -1119,7 +980,6 @@ def create_resumo_tab(start_date, end_date, client_filter='all'):
                 dbc.CardBody([
                     dcc.Graph(
                         id='executive-dashboard-chart',
-                        figure=create_executive_dashboard_chart(start_date, end_date),
                         className='responsive-graph'
                     )
                 ])
@@ -1127,7 +987,8 @@ def create_resumo_tab(start_date, end_date, client_filter='all'):
         ], width=12)
     ], className="mb-4")
     
-    return html.Div([header_section, kpi_cards, charts_row, charts_row2, executive_dashboard_row])
+    return html.Div([dcc.Store(id='efficiency-refine-store'), header_section, kpi_cards, charts_row, charts_row2,
+                     executive_dashboard_row])
 
 def create_alarmes_tab(start_date, end_date):
     """Aba de monitoramento de alarmes - RESPONSIVA"""
@@ -1139,7 +1000,7 @@ def create_alarmes_tab(start_date, end_date):
                         html.H5("🔝 Top 10 Alarmes", className="mb-0")
                     ]),
                     dbc.CardBody([
-                        dcc.Graph(id='top-alarms-chart', figure=create_top_alarms_chart(), className='responsive-graph')
+                        dcc.Graph(id='top-alarms-chart', className='responsive-graph')
                     ])
                 ])
             ], xs=12, sm=12, md=12, lg=6, xl=6, className="mb-3 mb-lg-0"),
@@ -1161,7 +1022,7 @@ def create_alarmes_tab(start_date, end_date):
                         html.H5("📊 Análise por Área", className="mb-0")
                     ]),
                     dbc.CardBody([
-                        dcc.Graph(id='alarm-analysis-chart', figure=create_alarm_analysis_chart(), className='responsive-graph')
+                        dcc.Graph(id='alarm-analysis-chart', className='responsive-graph')
                     ])
                 ])
             ], xs=12, sm=12, md=12, lg=12, xl=12)
@@ -1171,6 +1032,8 @@ def create_alarmes_tab(start_date, end_date):
 def create_tendencias_tab(start_date, end_date):
     """Aba de análise de tendências dos sensores - RESPONSIVA"""
     return html.Div([
+        dcc.Store(id='trend-stream-store'),
+        dcc.Store(id='trend-refine-store'),
         dbc.Row([
             dbc.Col([
                 dbc.Card([
@@ -1178,7 +1041,7 @@ def create_tendencias_tab(start_date, end_date):
                         html.H5("🌡️ Temperatura", className="mb-0")
                     ]),
                     dbc.CardBody([
-                        dcc.Graph(figure=create_temperature_trend_chart(start_date, end_date), className='responsive-graph')
+                        dcc.Graph(id='temp-trend-chart', className='responsive-graph')
                     ])
                 ])
             ], xs=12, sm=12, md=12, lg=12, xl=12)
@@ -1190,7 +1053,7 @@ def create_tendencias_tab(start_date, end_date):
                         html.H5("📊 Sensores Completo", className="mb-0")
                     ]),
                     dbc.CardBody([
-                        dcc.Graph(figure=create_sensors_trend_chart(start_date, end_date), className='responsive-graph')
+                        dcc.Graph(id='sensors-trend-chart', className='responsive-graph')
                     ])
                 ])
             ], xs=12, sm=12, md=12, lg=12, xl=12)
@@ -1199,12 +1062,7 @@ def create_tendencias_tab(start_date, end_date):
 
 def create_producao_tab(start_date, end_date):
     """Aba de análise de produção com comparativos avançados - RESPONSIVA"""
-    
-    # Obter insights operacionais
-    try:
-        insights = get_operational_insights(start_date, end_date)
-    except:
-        insights = []
+    # Insights, gráficos e métricas são preenchidos por update_production_analysis
     
     return html.Div([
         # Instruções e controles de filtro - RESPONSIVAS
@@ -1238,14 +1096,7 @@ def create_producao_tab(start_date, end_date):
                                 html.Label("👥 Cliente:", className="form-label fw-bold mb-2"),
                                 dcc.Dropdown(
                                     id='production-client-filter',
-                                    options=[
-                                        {'label': '🏢 Todos', 'value': 'all'},
-                                        {'label': '🏠 Interno', 'value': '0'},
-                                        {'label': '🏪 Cliente A', 'value': '2'},
-                                        {'label': '🏬 Cliente B', 'value': '5'},
-                                        {'label': '🏭 Cliente C', 'value': '13'},
-                                        {'label': '🏢 Cliente D', 'value': '41'}
-                                    ],
+                                    options=dimensions.client_options(production_cube.client_ids()),
                                     value='all',
                                     clearable=False
                                 )
@@ -1343,6 +1194,54 @@ def create_producao_tab(start_date, end_date):
             ], width=12)
         ], className="mb-4"),
         
+        # Produção por Cliente e Programa (mesmo recorte do cubo de Rel_Carga)
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader([
+                        html.H5("👥 Produção por Cliente", className="mb-0")
+                    ]),
+                    dbc.CardBody([
+                        dcc.Graph(id='production-client-chart', className='responsive-graph')
+                    ])
+                ])
+            ], xs=12, sm=12, md=6, lg=6, xl=6, className="mb-3 mb-md-0"),
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader([
+                        html.H5("🧺 Produção por Programa", className="mb-0")
+                    ]),
+                    dbc.CardBody([
+                        dcc.Graph(id='production-program-chart', className='responsive-graph')
+                    ])
+                ])
+            ], xs=12, sm=12, md=6, lg=6, xl=6)
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader([
+                        html.H5("🗺️ Cliente × Programa", className="mb-0")
+                    ]),
+                    dbc.CardBody([
+                        dcc.Graph(id='production-heatmap-chart', className='responsive-graph')
+                    ])
+                ])
+            ], width=12)
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader([
+                        html.H5("💧 Água por Quilo por Cliente", className="mb-0")
+                    ]),
+                    dbc.CardBody([
+                        dcc.Graph(id='water-client-percentiles-chart', className='responsive-graph')
+                    ])
+                ])
+            ], width=12)
+        ], className="mb-4"),
+        
         # Métricas Detalhadas
         dbc.Row([
             dbc.Col([
@@ -1360,29 +1259,30 @@ def create_producao_tab(start_date, end_date):
         ])
     ])
 
-def create_executive_dashboard_chart(start_date, end_date):
-    """Cria gráfico executivo completo cruzando todos os KPIs principais"""
-    from plotly.subplots import make_subplots
-    import plotly.graph_objects as go
-    
-    # Converter strings para datetime se necessário
-    if isinstance(start_date, str):
-        start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-    if isinstance(end_date, str):
-        end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-    
-    # Gerar dados simulados para o período
-    days = (end_date - start_date).days + 1
-    dates = [start_date + timedelta(days=i) for i in range(days)]
-    
-    # Dados simulados realistas
-    kg_roupas = [1200 + (i * 50) + (i % 3 * 100) for i in range(days)]
-    agua_litros = [kg * 3.2 + (i % 2 * 200) for i, kg in enumerate(kg_roupas)]
-    quimicos_kg = [kg * 0.004 + (i % 4 * 0.1) for i, kg in enumerate(kg_roupas)]
-    eficiencia = [92 + (i % 5 * 2) - (i % 7 * 1) for i in range(days)]
-    alarmes = [max(0, 5 - (i % 6)) for i in range(days)]
+def create_executive_dashboard_chart(start_date, end_date, refresh=False):
+    """Cria gráfico executivo completo cruzando todos os KPIs principais
+
+    Os dados vêm de uma única consulta de agregados diários e o gráfico fica
+    em cache por período (alinhado a dias inteiros); `refresh=True` ignora o
+    cache, usado quando chegam dados novos ou o usuário pede atualização.
+    """
+    start_day, end_day = day_range(start_date, end_date)
+    cache_key = f"executive-chart|{start_day}|{end_day}"
+    if not refresh:
+        cached = REPORT_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
+    series = get_daily_series(start_day, end_day)
+    dates = series['dias']
+    kg_roupas = series['kg']
+    agua_litros = series['agua_litros']
+    quimicos_kg = series['quimicos_kg']
+    eficiencia = series['eficiencia']
+    alarmes = series['alarmes']
     
     # Criar subplots com eixos secundários
+    from plotly.subplots import make_subplots
     fig = make_subplots(
         rows=2, cols=2,
         specs=[
@@ -1447,7 +1347,7 @@ def create_executive_dashboard_chart(start_date, end_date):
     )
     fig.add_trace(
         go.Scatter(
-            x=dates, y=[kg/50 for kg in kg_roupas],  # Escalar para visualização
+            x=dates, y=kg_roupas / 50,  # Escalar para visualização
             name='Produção (x50)',
             line=dict(color='#27AE60', width=2, dash='dash'),
             yaxis='y6'
@@ -1456,11 +1356,12 @@ def create_executive_dashboard_chart(start_date, end_date):
     )
     
     # Gráfico 4: Indicadores Consolidados
-    total_kg = sum(kg_roupas)
-    total_agua = sum(agua_litros)
-    total_quimicos = sum(quimicos_kg)
-    media_eficiencia = sum(eficiencia) / len(eficiencia)
-    total_alarmes = sum(alarmes)
+    total_kg = kg_roupas.sum()
+    total_agua = agua_litros.sum()
+    total_quimicos = quimicos_kg.sum()
+    total_tempo = series['tempo_producao'].sum() + series['tempo_parado'].sum()
+    media_eficiencia = series['tempo_producao'].sum() / total_tempo * 100 if total_tempo > 0 else 0
+    total_alarmes = int(alarmes.sum())
     
     fig.add_trace(
         go.Indicator(
@@ -1555,10 +1456,15 @@ def create_executive_dashboard_chart(start_date, end_date):
         font=dict(size=12, color="#2C3E50")
     )
     
-    return fig
+    # Guardar o dict já validado: no cache e na resposta evita revalidar a figura
+    figure = fig.to_dict()
+    closed = end_day < datetime.now().date()
+    if total_kg > 0 or total_alarmes > 0:
+        REPORT_CACHE.set(cache_key, figure, expire=CLOSED_PERIOD_TTL if closed else OPEN_PERIOD_TTL)
+    return figure
 
-def create_relatorios_tab(start_date, end_date):
-    """Aba de relatórios executivos - RESPONSIVA e DINÂMICA"""
+def create_executive_report_summary(start_date, end_date):
+    """Resumo do relatório executivo do período (produção, consumos, alarmes e recomendações)"""
     
     # Converter strings para datetime se necessário
     if isinstance(start_date, str):
@@ -1569,6 +1475,45 @@ def create_relatorios_tab(start_date, end_date):
     # Gerar relatório executivo com período dinâmico
     report = generate_executive_report(start_date, end_date)
     
+    return html.Div([
+        html.H6(f"📅 Período: {start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')}", className="text-muted mb-3"),
+        html.H6(f"🕰️ Gerado em: {report['timestamp']}", className="text-muted mb-3"),
+    
+        # Resumo de Produção
+        html.H5("🏭 Resumo de Produção", className="text-primary mb-2"),
+        html.Ul([
+            html.Li(f"Produção no Período: {report['production_summary']['period_production']} kg ({report['production_summary']['period_cycles']} ciclos)"),
+            html.Li(f"Média Diária: {report['production_summary']['daily_avg']} kg/dia"),
+            html.Li(f"Eficiência Média: {report['production_summary']['efficiency']}")
+        ], className="mb-3"),
+    
+        # Resumo de Consumos
+        html.H5("💧 Resumo de Consumos", className="text-info mb-2"),
+        html.Ul([
+            html.Li(f"Água no Período: {report['consumption_summary']['water_period']} L ({report['consumption_summary']['water_per_kg']})"),
+            html.Li(f"Químicos no Período: {report['consumption_summary']['chemicals_period']} ({report['consumption_summary']['chemicals_per_kg']})")
+        ], className="mb-3"),
+    
+        # Resumo de Alarmes
+        html.H5("🚨 Resumo de Alarmes", className="text-warning mb-2"),
+        html.Ul([
+            html.Li(f"Alarmes no Período: {report['alarms_summary']['period_alarms']}"),
+            html.Li(f"Alarmes Ativos: {report['alarms_summary']['active_alarms']}"),
+            html.Li(f"Críticos/Altos: {report['alarms_summary']['critical_high']}"),
+            html.Li(f"Tempo Médio de Resolução: {report['alarms_summary']['avg_resolution']}")
+        ], className="mb-3"),
+    
+        # Recomendações
+        html.H5("💡 Recomendações", className="text-success mb-2"),
+        html.Ul([
+            html.Li(rec) for rec in report['recommendations']
+        ], className="mb-3")
+    ])
+
+def create_relatorios_tab(start_date, end_date):
+    """Aba de relatórios executivos - RESPONSIVA e DINÂMICA"""
+    # O resumo do período é preenchido por update_executive_report_summary
+    
     return html.Div([
         dbc.Row([
             dbc.Col([
@@ -1578,38 +1523,7 @@ def create_relatorios_tab(start_date, end_date):
                     ]),
                     dbc.CardBody([
                         html.Div([
-                            html.H6(f"📅 Período: {start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')}", className="text-muted mb-3"),
-                            html.H6(f"🕰️ Gerado em: {report['timestamp']}", className="text-muted mb-3"),
-                            
-                            # Resumo de Produção
-                            html.H5("🏭 Resumo de Produção", className="text-primary mb-2"),
-                            html.Ul([
-                                html.Li(f"Produção no Período: {report['production_summary']['period_production']} kg ({report['production_summary']['period_cycles']} ciclos)"),
-                                html.Li(f"Média Diária: {report['production_summary']['daily_avg']} kg/dia"),
-                                html.Li(f"Eficiência Média: {report['production_summary']['efficiency']}")
-                            ], className="mb-3"),
-                            
-                            # Resumo de Consumos
-                            html.H5("💧 Resumo de Consumos", className="text-info mb-2"),
-                            html.Ul([
-                                html.Li(f"Água no Período: {report['consumption_summary']['water_period']} L ({report['consumption_summary']['water_per_kg']})"),
-                                html.Li(f"Químicos no Período: {report['consumption_summary']['chemicals_period']} ({report['consumption_summary']['chemicals_per_kg']})")
-                            ], className="mb-3"),
-                            
-                            # Resumo de Alarmes
-                            html.H5("🚨 Resumo de Alarmes", className="text-warning mb-2"),
-                            html.Ul([
-                                html.Li(f"Alarmes no Período: {report['alarms_summary']['period_alarms']}"),
-                                html.Li(f"Alarmes Ativos: {report['alarms_summary']['active_alarms']}"),
-                                html.Li(f"Críticos/Altos: {report['alarms_summary']['critical_high']}"),
-                                html.Li(f"Tempo Médio de Resolução: {report['alarms_summary']['avg_resolution']}")
-                            ], className="mb-3"),
-                            
-                            # Recomendações
-                            html.H5("💡 Recomendações", className="text-success mb-2"),
-                            html.Ul([
-                                html.Li(rec) for rec in report['recommendations']
-                            ], className="mb-3"),
+                            html.Div(id='executive-report-summary'),
                             
                             html.Div([
                                 dbc.Row([
@@ -1636,6 +1550,7 @@ def create_relatorios_tab(start_date, end_date):
                                             id='export-format-dropdown',
                                             options=[
                                                 {'label': '📄 PDF', 'value': 'pdf'},
+                                                {'label': '🌐 HTML', 'value': 'html'},
                                                 {'label': '📊 Excel', 'value': 'excel'},
                                                 {'label': '📝 Texto', 'value': 'txt'}
                                             ],
@@ -1661,8 +1576,12 @@ def create_relatorios_tab(start_date, end_date):
                                 ]),
                                 dbc.ButtonGroup([
                                     dbc.Button("💾 Exportar", id="export-report-btn", color="primary", size="sm"),
+                                    dbc.Button("✖ Cancelar", id="cancel-export-btn", color="danger", outline=True,
+                                             size="sm", disabled=True),
                                     dbc.Button("🔄 Atualizar", id="refresh-report-btn", color="secondary", outline=True, size="sm")
                                 ], className="mb-3 d-flex flex-wrap"),
+                                dbc.Progress(id="export-progress", value=0, striped=True, animated=True,
+                                             className="mb-3", style={'display': 'none'}),
                                 dcc.Download(id="download-report")
                             ])
                         ])
@@ -1675,13 +1594,60 @@ def create_relatorios_tab(start_date, end_date):
                         html.H5("📊 Gráficos Resumo", className="mb-0")
                     ]),
                     dbc.CardBody([
-                        dcc.Graph(figure=create_efficiency_chart(), className='responsive-graph-small'),
+                        dcc.Graph(id='report-efficiency-chart', className='responsive-graph-small'),
                         html.Hr(),
-                        dcc.Graph(figure=create_water_consumption_chart(), className='responsive-graph-small')
+                        dcc.Graph(id='report-water-chart', className='responsive-graph-small')
                     ])
                 ])
             ], xs=12, sm=12, md=12, lg=4, xl=4)
-        ])
+        ]),
+        
+        # Exportação de dados brutos (auditoria) - streaming via /export/raw
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader([
+                        html.H5("🗄️ Exportação de Dados Brutos", className="mb-0")
+                    ]),
+                    dbc.CardBody([
+                        html.P("Linhas completas do período selecionado no filtro de datas. "
+                               "Excel aceita várias tabelas (uma aba cada); CSV e Parquet, uma por vez.",
+                               className="text-muted small"),
+                        dbc.Row([
+                            dbc.Col([
+                                html.Label("Tabelas:", className="form-label mb-2"),
+                                dcc.Dropdown(
+                                    id='raw-export-tables',
+                                    options=[{'label': table, 'value': table} for table in RAW_EXPORT_TABLES],
+                                    value=['Rel_Diario'],
+                                    multi=True,
+                                    className="mb-3"
+                                )
+                            ], xs=12, sm=6, md=6, lg=6, xl=6),
+                            dbc.Col([
+                                html.Label("Formato:", className="form-label mb-2"),
+                                dcc.Dropdown(
+                                    id='raw-export-format',
+                                    options=[
+                                        {'label': '📄 CSV', 'value': 'csv'},
+                                        {'label': '📊 Excel', 'value': 'xlsx'},
+                                        {'label': '🗃️ Parquet', 'value': 'parquet'}
+                                    ],
+                                    value='csv',
+                                    clearable=False,
+                                    className="mb-3"
+                                )
+                            ], xs=12, sm=3, md=3, lg=3, xl=3),
+                            dbc.Col([
+                                html.Label("\u00a0", className="form-label mb-2 d-block"),
+                                dbc.Button("⬇️ Baixar", id="raw-export-link", color="primary", size="sm",
+                                           href="#", external_link=True, target="_blank")
+                            ], xs=12, sm=3, md=3, lg=3, xl=3)
+                        ])
+                    ])
+                ])
+            ], width=12)
+        ], className="mt-3")
     ])
 
 def create_config_tab():
@@ -1709,7 +1675,7 @@ def create_config_tab():
     ])
 
 # Callbacks para Análise de Produção Dinâmica
-@app.callback(
+@callback(
     [Output('operational-insights', 'children'),
      Output('trend-analysis-chart', 'figure'),
      Output('client-comparison-chart', 'figure'),
@@ -1717,8 +1683,10 @@ def create_config_tab():
      Output('detailed-metrics', 'children')],
     [Input('production-client-filter', 'value'),
      Input('production-period-filter', 'value'),
-     Input('analysis-type-filter', 'value')]
+     Input('analysis-type-filter', 'value')],
+     State(TAB_ID_STORE, 'data')
 )
+@cancel_superseded(query_class_name='analytics')
 def update_production_analysis(client_filter, period_days, analysis_type):
     """Atualiza toda a análise de produção dinamicamente"""
     try:
@@ -1728,8 +1696,11 @@ def update_production_analysis(client_filter, period_days, analysis_type):
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=int(period_days))
         
+        # As cinco saídas usam a mesma análise em cache por (cliente, período)
+        client_id = None if client_filter == 'all' else int(client_filter)
+        
         # 1. Insights Operacionais
-        insights = get_operational_insights(start_date, end_date)
+        insights = get_operational_insights(start_date, end_date, client_id)
         insights_components = [
             dbc.Alert([
                 html.H6(insight['title'], className="alert-heading mb-2"),
@@ -1745,7 +1716,6 @@ def update_production_analysis(client_filter, period_days, analysis_type):
         ] if insights else [dbc.Alert("Nenhum insight disponível para o período selecionado", color="info")]
         
         # 2. Gráfico de Tendência
-        client_id = None if client_filter == 'all' else int(client_filter)
         trend_chart = create_trend_analysis_chart(client_id=client_id, days=int(period_days))
         
         # 3. Gráfico de Comparação de Clientes
@@ -1794,31 +1764,18 @@ def update_production_analysis(client_filter, period_days, analysis_type):
         empty_fig = go.Figure().add_annotation(text="Erro ao carregar dados", xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
         return [error_alert], empty_fig, empty_fig, error_alert, [error_alert]
 
-# Callback para modo escuro - usando page-content ao invés de app-container
-@app.callback(
+# Callback para modo escuro - usando page-content ao invés de app-container (executado no navegador)
+clientside_callback(
+    ClientsideFunction(namespace='dstech', function_name='toggleDarkMode'),
     [Output('page-content', 'className'),
      Output('dark-mode-toggle', 'children')],
     [Input('dark-mode-toggle', 'n_clicks')],
     [State('page-content', 'className')],
     prevent_initial_call=True
 )
-def toggle_dark_mode(n_clicks, current_class):
-    if n_clicks:
-        if current_class and 'dark-theme' in current_class:
-            # Mudar para modo claro
-            new_class = current_class.replace('dark-theme', '').strip()
-            button_text = '🌙 Modo Escuro'
-        else:
-            # Mudar para modo escuro
-            new_class = f"{current_class or ''} dark-theme".strip()
-            button_text = '☀️ Modo Claro'
-        
-        return new_class, button_text
-    
-    return current_class or '', '🌙 Modo Escuro'
 
 # Callbacks para gerenciamento de usuários
-@app.callback(
+@callback(
     [Output('user-management-feedback', 'children'),
      Output('users-list', 'children'),
      Output('new-username', 'value'),
@@ -1837,9 +1794,6 @@ def manage_users(n_clicks, username, password, role):
         success, message = add_user(username, password, role)
         if success:
             feedback = [dbc.Alert(f"✅ {message}", color="success", dismissable=True)]
-            # Recarregar usuários globais
-            global USERS
-            USERS = load_users()
         else:
             feedback = [dbc.Alert(f"❌ {message}", color="danger", dismissable=True)]
     elif n_clicks:
@@ -1873,56 +1827,37 @@ def manage_users(n_clicks, username, password, role):
     
     return feedback, users_component, clear_username, clear_password
 
-# Callback para atualizar relatórios quando período for alterado
-@app.callback(
-    Output('tab-content', 'children', allow_duplicate=True),
-    [Input('report-period-dropdown', 'value'),
-     Input('refresh-report-btn', 'n_clicks')],
-    [State('main-tabs', 'active_tab'),
-     State('date-picker', 'start_date'),
-     State('date-picker', 'end_date')],
-    prevent_initial_call=True
+# Link de exportação de dados brutos (montado no navegador)
+clientside_callback(
+    ClientsideFunction(namespace='dstech', function_name='rawExportHref'),
+    Output('raw-export-link', 'href'),
+    [Input('raw-export-tables', 'value'),
+     Input('raw-export-format', 'value'),
+     Input('date-picker', 'start_date'),
+     Input('date-picker', 'end_date')]
 )
-def update_reports_on_period_change(period_days, refresh_clicks, active_tab, start_date, end_date):
-    """Atualiza a aba de relatórios quando o período é alterado"""
-    if active_tab == 'relatorios':
-        from datetime import datetime, timedelta
-        
-        # Determinar período baseado na seleção
-        if period_days == 'custom':
-            # Usar datas do date-picker
-            start_dt = datetime.fromisoformat(start_date) if start_date else datetime.now() - timedelta(days=7)
-            end_dt = datetime.fromisoformat(end_date) if end_date else datetime.now()
-        else:
-            # Usar período selecionado
-            end_dt = datetime.now()
-            start_dt = end_dt - timedelta(days=period_days)
-        
-        return create_relatorios_tab(start_dt.isoformat(), end_dt.isoformat())
-    
-    # Se não for a aba de relatórios, não fazer nada
-    return PreventUpdate
 
 # Callback para atualizar gráfico executivo quando datas mudarem
-@app.callback(
+@callback(
     Output('executive-dashboard-chart', 'figure'),
     [Input('date-picker', 'start_date'),
      Input('date-picker', 'end_date'),
      Input('refresh-button', 'n_clicks'),
-     Input('interval-component', 'n_intervals')]
+     Input('interval-component', 'n_intervals'),
+     Input('data-push-store', 'data')],
+    State('main-tabs', 'active_tab'),
+    State(TAB_ID_STORE, 'data')
 )
-def update_executive_dashboard_chart(start_date, end_date, n_clicks, n_intervals):
+@cancel_superseded
+def update_executive_dashboard_chart(start_date, end_date, n_clicks, n_intervals, push_data, active_tab):
     """Atualiza o gráfico executivo quando as datas mudarem"""
+    skip_refresh('executive-dashboard-chart', active_tab, push_data)
     try:
         print(f"📈 ATUALIZANDO GRÁFICO EXECUTIVO! start_date={start_date}, end_date={end_date}")
         
-        # Converter strings para datetime se necessário
-        if isinstance(start_date, str):
-            start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-        if isinstance(end_date, str):
-            end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-        
-        return create_executive_dashboard_chart(start_date, end_date)
+        # Dados novos ou atualização manual ignoram o cache do período
+        refresh = callback_context.triggered_id in ('data-push-store', 'refresh-button')
+        return create_executive_dashboard_chart(start_date, end_date, refresh=refresh)
     except Exception as e:
         print(f"❌ ERRO NO GRÁFICO EXECUTIVO: {str(e)}")
         # Retornar gráfico vazio em caso de erro
@@ -1933,6 +1868,105 @@ def update_executive_dashboard_chart(start_date, end_date, n_clicks, n_intervals
             x=0.5, y=0.5, showarrow=False
         )
 
+# Resumo do relatório executivo: acompanha as datas sem remontar a aba Relatórios.
+# O seletor de período do relatório (e o botão Atualizar do relatório) usam os
+# últimos N dias, ou as datas do filtro em "Personalizado".
+@callback(
+    Output('executive-report-summary', 'children'),
+    [Input('date-picker', 'start_date'),
+     Input('date-picker', 'end_date'),
+     Input('refresh-button', 'n_clicks'),
+     Input('report-period-dropdown', 'value'),
+     Input('refresh-report-btn', 'n_clicks')],
+    State('main-tabs', 'active_tab'),
+    State(TAB_ID_STORE, 'data')
+)
+@cancel_superseded(query_class_name='analytics')
+def update_executive_report_summary(start_date, end_date, n_clicks, period_days, refresh_clicks, active_tab):
+    if active_tab != 'relatorios':
+        raise PreventUpdate
+    if callback_context.triggered_id in ('report-period-dropdown', 'refresh-report-btn') and period_days != 'custom':
+        end_date = datetime.now().isoformat()
+        start_date = (datetime.now() - timedelta(days=period_days)).isoformat()
+    if start_date is None:
+        start_date = (datetime.now() - timedelta(days=7)).isoformat()
+    if end_date is None:
+        end_date = datetime.now().isoformat()
+    return create_executive_report_summary(start_date, end_date)
+
+# Gráficos resumo da aba Relatórios (mesmas figuras padrão do Resumo, sem filtro de datas)
+@callback(
+    [Output('report-efficiency-chart', 'figure'),
+     Output('report-water-chart', 'figure')],
+    [Input('refresh-button', 'n_clicks'),
+     Input('interval-component', 'n_intervals'),
+     Input('data-push-store', 'data')],
+    State('main-tabs', 'active_tab'),
+    State(TAB_ID_STORE, 'data')
+)
+@cancel_superseded
+def update_report_charts(n_clicks, n_intervals, push_data, active_tab):
+    skip_refresh('report-efficiency-chart', active_tab, push_data)
+    return create_efficiency_chart(), create_water_consumption_chart()
+
+def _warm_executive_charts():
+    """Pré-monta o gráfico executivo das janelas padrão"""
+    for _, start, end in warmup_periods():
+        create_executive_dashboard_chart(start, end)
+
+def create_app(warm=True):
+    """Cria o app Dash: layout raiz, endpoints do servidor e aquecimento
+
+    Nada disso roda ao importar o módulo. Os callbacks são registrados com
+    dash.callback na importação e ligados ao app no primeiro pedido (um app
+    por processo). As etapas de aquecimento são sempre registradas; `warm=False`
+    apenas não inicia a thread que as executa.
+    """
+    # Gerenciador dos callbacks em segundo plano (exportações e relatórios)
+    background_callback_manager = dash.DiskcacheManager(diskcache.Cache(os.path.join(CACHE_DIR, 'jobs')))
+
+    app = dash.Dash(__name__,
+                    external_stylesheets=[dbc.themes.BOOTSTRAP, dbc.icons.FONT_AWESOME],
+                    background_callback_manager=background_callback_manager,
+                    assets_folder=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app', 'assets'),
+                    suppress_callback_exceptions=True,
+                    title="DSTech Dashboard")
+
+    # Layout raiz: login ou dashboard são montados por display_page e cada
+    # aba só quando aberta (render_tab_content)
+    app.layout = html.Div([
+        dcc.Location(id='url', refresh=False),
+        dcc.Store(id='session-store'),
+        dcc.Store(id='data-store'),
+        html.Div(id='page-content')
+    ])
+
+    # Chave que assina o cookie de sessão do login. Sem DSTECH_SECRET_KEY é
+    # gerada ao criar o app: vale para os workers do gunicorn em preload, mas
+    # as sessões caem a cada reinício
+    app.server.secret_key = os.getenv('DSTECH_SECRET_KEY') or secrets.token_hex(32)
+
+    # Endpoint SSE com notificações de novos dados
+    register_push_routes(app.server)
+
+    # Endpoint de exportação de dados brutos em streaming
+    register_raw_export_routes(app.server)
+
+    # Endpoint com filas do agendador de consultas e estado do disjuntor do banco
+    register_db_routes(app.server)
+
+    # Sondas de vida e prontidão (/health/live, /health/ready)
+    register_warmup_routes(app.server)
+
+    # Etapas de aquecimento: pool, dimensões, KPIs, cubo, agregados e figuras.
+    # Sem `warm` quem as executa é o chamador (ex.: o mestre do gunicorn).
+    if 'figuras' not in warmup.status:
+        warmup.add_step('figuras', _warm_executive_charts)
+    if warm:
+        warmup.start()
+
+    return app
+
 if __name__ == '__main__':
     port = int(os.getenv('DASH_PORT', 8051))
     print("🚀 Iniciando DSTech Dashboard...")
@@ -1941,6 +1975,7 @@ if __name__ == '__main__':
     print(f"👤 Login: admin / admin123")
     print(f"🔍 Debug: {'Desabilitado' if IS_PRODUCTION else 'Habilitado'}")
     
+    app = create_app()
     app.run(
         debug=not IS_PRODUCTION,
         host='0.0.0.0',
@@ -4,48 +4,36 @@ Gráficos com dados reais do PostgreSQL baseados no README e reunião
 """
 
 import plotly.graph_objects as go
-import plotly.express as px
 from plotly.subplots import make_subplots
 import pandas as pd
 from datetime import datetime, timedelta
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from sqlalchemy import create_engine
 import os
 from dotenv import load_dotenv
 import numpy as np
-from dash import html, dash_table
-import dash_bootstrap_components as dbc
+from dash import html, dash_table, Patch, no_update
+
+# Conexão, pool e execução de consultas (reexportados para os demais módulos)
+from dstech_db import PG_CONFIG, get_db_connection, execute_query
+
+__all__ = [
+    # Reexportados de dstech_db
+    'PG_CONFIG', 'get_db_connection', 'execute_query',
+    # Gráficos e consultas
+    'create_efficiency_chart', 'WATER_DETAIL_MAX_DAYS', 'create_water_distribution_chart',
+    'create_water_client_percentiles_chart',
+    'create_efficiency_preview_chart', 'create_water_consumption_chart', 'create_chemical_consumption_chart',
+    'create_top_alarms_chart', 'create_alarm_analysis_chart', 'create_production_by_client_chart',
+    'create_production_by_program_chart', 'create_client_program_heatmap', 'format_number_abbreviated',
+    'get_kpi_tooltip', 'get_operational_kpis', 'get_active_alarms_rows', 'get_active_alarms_title',
+    'diff_table_rows', 'create_active_alarms_table', 'get_dashboard_summary', 'generate_executive_report',
+    'TREND_COLUMNS', 'TREND_HISTORY_POINTS', 'TREND_STREAM_MAX_POINTS', 'TREND_PREVIEW_POINTS',
+    'TREND_PREVIEW_SAMPLE_PERCENT', 'get_trend_history', 'drop_open_bucket', 'get_trend_points_since', 'build_trend_extend_data',
+    'create_temperature_trend_chart', 'create_sensors_trend_chart', 'create_client_analysis_chart'
+]
 
 # Carregar variáveis de ambiente
 load_dotenv('.env_dstech')
 
-# Configurações do banco
-PG_CONFIG = {
-    'host': os.getenv('POSTGRES_HOST', 'localhost'),
-    'port': os.getenv('POSTGRES_PORT', '5432'),
-    'user': os.getenv('POSTGRES_USER', 'postgres'),
-    'password': os.getenv('POSTGRES_PASSWORD', 'postgres123'),
-    'database': os.getenv('POSTGRES_DB', 'dstech_dashboard')
-}
-
-def get_db_connection():
-    """Cria conexão com PostgreSQL"""
-    return psycopg2.connect(**PG_CONFIG, cursor_factory=RealDictCursor)
-
-def execute_query(query, params=None):
-    """Executa query e retorna DataFrame usando SQLAlchemy"""
-    try:
-        # Criar string de conexão SQLAlchemy
-        connection_string = f"postgresql://{PG_CONFIG['user']}:{PG_CONFIG['password']}@{PG_CONFIG['host']}:{PG_CONFIG['port']}/{PG_CONFIG['database']}"
-        engine = create_engine(connection_string)
-        
-        df = pd.read_sql_query(query, engine, params=params)
-        return df
-    except Exception as e:
-        print(f"Erro na query: {e}")
-        return pd.DataFrame()
-
 # ===== GRÁFICOS PRINCIPAIS BASEADOS NO README E REUNIÃO =====
 
 def create_efficiency_chart(start_date=None, end_date=None):
@@ -116,9 +104,147 @@ def create_efficiency_chart(start_date=None, end_date=None):
     
     return fig
 
+# Acima deste número de dias o gráfico de água mostra a distribuição diária (sketches)
+WATER_DETAIL_MAX_DAYS = 31
+
+def create_water_distribution_chart(start_date, end_date):
+    """Distribuição diária de L/kg (P50/P90/P99) a partir dos sketches por dia"""
+    from dstech_sketches import sketch_store
+
+    daily = sketch_store.daily_quantiles('agua_por_kg', start_date, end_date).dropna()
+    if daily.empty:
+        return go.Figure().add_annotation(text="Sem dados de consumo de água",
+                                        xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
+    period = sketch_store.quantiles('agua_por_kg', start_date, end_date)
+
+    fig = go.Figure()
+
+    # Faixa P50-P90 e mediana diária
+    fig.add_trace(go.Scatter(
+        x=daily.index, y=daily['P90'],
+        mode='lines', name='P90',
+        line=dict(color='#3498db', width=1),
+        hovertemplate='<b>%{x|%d/%m/%Y}</b><br>P90: %{y:.2f} L/kg<extra></extra>'
+    ))
+    fig.add_trace(go.Scatter(
+        x=daily.index, y=daily['P50'],
+        mode='lines+markers', name='Mediana (P50)',
+        line=dict(color='#3498db', width=2), marker=dict(size=4),
+        fill='tonexty', fillcolor='rgba(52, 152, 219, 0.2)',
+        hovertemplate='<b>%{x|%d/%m/%Y}</b><br>P50: %{y:.2f} L/kg<extra></extra>'
+    ))
+    fig.add_trace(go.Scatter(
+        x=daily.index, y=daily['P99'],
+        mode='lines', name='P99',
+        line=dict(color='#e74c3c', width=1, dash='dot'),
+        hovertemplate='<b>%{x|%d/%m/%Y}</b><br>P99: %{y:.2f} L/kg<extra></extra>'
+    ))
+
+    fig.add_hrect(y0=12, y1=18, fillcolor="green", opacity=0.1,
+                  annotation_text="Zona Ideal: 12-18 L/kg", annotation_position="top left")
+    fig.add_hline(y=20, line_dash="dash", line_color="red",
+                  annotation_text="Alerta: 20 L/kg", annotation_position="right")
+
+    fig.update_layout(
+        title=f"Consumo de Água por Quilo<br><sub>P50: {period[0.5]:.2f} L/kg | P90: {period[0.9]:.2f} | P99: {period[0.99]:.2f}</sub>",
+        xaxis_title="Data",
+        yaxis_title="Litros por Kg",
+        hovermode='x unified',
+        template='plotly_white',
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+
+    return fig
+
+def create_water_client_percentiles_chart(start_date, end_date):
+    """L/kg por cliente no período (P50/P90/P99) a partir dos sketches por dia e cliente"""
+    from dstech_dimensions import dimensions
+    from dstech_sketches import sketch_store
+
+    df = sketch_store.client_quantiles('agua_por_kg', start_date, end_date).dropna()
+    if df.empty:
+        return go.Figure().add_annotation(text="Sem dados de consumo de água por cliente",
+                                        xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
+    df = df.sort_values('P50', ascending=False).head(15)
+    clients = dimensions.client_labels(df.index)
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=clients, y=df['P50'],
+        name='Mediana (P50)',
+        marker_color='#3498db',
+        hovertemplate='<b>%{x}</b><br>P50: %{y:.2f} L/kg<extra></extra>'
+    ))
+    fig.add_trace(go.Scatter(
+        x=clients, y=df['P90'],
+        mode='markers', name='P90',
+        marker=dict(color='#e67e22', size=9, symbol='line-ew-open', line=dict(width=3)),
+        hovertemplate='<b>%{x}</b><br>P90: %{y:.2f} L/kg<extra></extra>'
+    ))
+    fig.add_trace(go.Scatter(
+        x=clients, y=df['P99'],
+        mode='markers', name='P99',
+        marker=dict(color='#e74c3c', size=9, symbol='line-ew-open', line=dict(width=3)),
+        hovertemplate='<b>%{x}</b><br>P99: %{y:.2f} L/kg<extra></extra>'
+    ))
+
+    fig.add_hline(y=20, line_dash="dash", line_color="red",
+                  annotation_text="Alerta: 20 L/kg", annotation_position="right")
+
+    fig.update_layout(
+        title="Consumo de Água por Quilo por Cliente (P50/P90/P99)",
+        xaxis_title="Cliente",
+        yaxis_title="Litros por Kg",
+        template='plotly_white',
+        xaxis_tickangle=-45,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+
+    return fig
+
+def create_efficiency_preview_chart(start_date, end_date):
+    """Prévia do gráfico de eficiência a partir dos agregados diários (carregamento progressivo)"""
+    from dstech_reports import get_daily_series
+
+    series = get_daily_series(*pd.to_datetime([start_date, end_date]).date)
+    has_time = series['tempo_producao'] + series['tempo_parado'] > 0
+    if not has_time.any():
+        return go.Figure().add_annotation(text="Sem dados de eficiência",
+                                        xref="paper", yref="paper",
+                                        x=0.5, y=0.5, showarrow=False)
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=series['dias'][has_time],
+        y=np.round(series['eficiencia'][has_time], 2),
+        mode='lines+markers',
+        name='Eficiência diária (%)',
+        line=dict(color='#2ecc71', width=3),
+        marker=dict(size=6)
+    ))
+    fig.add_hline(y=85, line_dash="dash", line_color="red",
+                  annotation_text="Meta: 85%")
+    fig.update_layout(
+        title="Eficiência Operacional - (Tempo Produção / Tempo Total) x 100<br><sub>⏳ Prévia diária - carregando ciclos...</sub>",
+        xaxis_title="Data",
+        yaxis_title="Eficiência (%)",
+        hovermode='x unified',
+        template='plotly_white',
+        yaxis=dict(range=[0, 100])
+    )
+    return fig
+
 def create_water_consumption_chart(start_date=None, end_date=None):
     """Gráfico de Consumo de Água por Quilo - Fórmula: (water_consumption * 1000) / production_weight"""
     
+    # Períodos longos: distribuição diária pelos sketches, sem carregar todos os ciclos
+    if start_date and end_date and (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days > WATER_DETAIL_MAX_DAYS:
+        try:
+            return create_water_distribution_chart(start_date, end_date)
+        except Exception as e:
+            print(f"Erro nos sketches de água: {e}")
+    
     # Construir filtro de data
     date_filter = "WHERE \"Time_Stamp\" >= CURRENT_DATE - INTERVAL '30 days' AND \"C4\" > 0"
     if start_date and end_date:
@@ -191,9 +317,10 @@ def create_water_consumption_chart(start_date=None, end_date=None):
     avg_consumption = df['water_per_kg'].mean()
     max_consumption = df['water_per_kg'].max()
     min_consumption = df['water_per_kg'].min()
+    p90_consumption = df['water_per_kg'].quantile(0.9)
     
     fig.update_layout(
-        title=f"Consumo de Água por Quilo<br><sub>Média: {avg_consumption:.2f} L/kg | Máx: {max_consumption:.2f} | Mín: {min_consumption:.2f}</sub>",
+        title=f"Consumo de Água por Quilo<br><sub>Média: {avg_consumption:.2f} L/kg | P90: {p90_consumption:.2f} | Máx: {max_consumption:.2f} | Mín: {min_consumption:.2f}</sub>",
         xaxis_title="Data/Hora",
         yaxis_title="Litros por Kg",
         hovermode='x unified',
@@ -370,6 +497,8 @@ def create_alarm_analysis_chart(start_date=None, end_date=None):
     priority_map = {1: 'Crítico', 2: 'Alto', 3: 'Médio', 4: 'Baixo', 5: 'Info'}
     df['priority_label'] = df['priority'].map(priority_map)
     
+    # plotly.express é pesado e só este gráfico o usa: importar sob demanda
+    import plotly.express as px
     fig = px.scatter(
         df, 
         x='alarm_count', 
@@ -396,41 +525,17 @@ def create_alarm_analysis_chart(start_date=None, end_date=None):
     
     return fig
 
-def create_production_by_client_chart(start_date=None, end_date=None, client_filter=None):
-    """Produção por Cliente - Cruzamento Rel_Carga com clientes"""
-    
-    # Construir filtro de data
-    date_filter = "WHERE rc.\"Time_Stamp\" >= CURRENT_DATE - INTERVAL '30 days'"
-    if start_date and end_date:
-        date_filter = f"WHERE rc.\"Time_Stamp\" >= '{start_date}' AND rc.\"Time_Stamp\" <= '{end_date}'"
-    elif start_date:
-        date_filter = f"WHERE rc.\"Time_Stamp\" >= '{start_date}'"
-    elif end_date:
-        date_filter = f"WHERE rc.\"Time_Stamp\" <= '{end_date}'"
-    
-    # Adicionar filtro de cliente se especificado
-    if client_filter:
-        if 'WHERE' in date_filter:
-            date_filter += f" AND rc.\"C1\" = '{client_filter}'"
-        else:
-            date_filter = f"WHERE rc.\"C1\" = '{client_filter}'"
+def create_production_by_client_chart(start_date=None, end_date=None, client_filter=None, summary=None):
+    """Produção por Cliente - recorte do cubo em memória de Rel_Carga
     
-    query = f"""
-    SELECT 
-        COALESCE(c.client_name, 'Cliente ' || CAST(rc."C1" AS TEXT)) as client_display,
-        rc."C1" as client_id,
-        COUNT(*) as total_loads,
-        SUM(rc."C2") as total_weight_kg,
-        AVG(rc."C2") as avg_weight_per_load
-    FROM "Rel_Carga" rc
-    LEFT JOIN clientes c ON CAST(rc."C1" AS INTEGER) = c.client_id
-    {date_filter}
-    GROUP BY c.client_name, rc."C1"
-    ORDER BY total_weight_kg DESC
-    LIMIT 15
+    `summary` (resultado de production_cube.summary) permite montar este e os
+    demais gráficos de produção a partir do mesmo recorte.
     """
+    if summary is None:
+        from dstech_cube import production_cube
+        summary = production_cube.summary(start_date, end_date, client_filter)
     
-    df = execute_query(query)
+    df = summary['clients'].head(15)
     
     if df.empty:
         return go.Figure().add_annotation(text="Sem dados de produção por cliente", 
@@ -460,49 +565,19 @@ def create_production_by_client_chart(start_date=None, end_date=None, client_fil
     
     return fig
 
-def create_production_by_program_chart(start_date=None, end_date=None, client_filter=None):
-    """Produção por Programa - Cruzamento Rel_Carga com programas"""
+def create_production_by_program_chart(start_date=None, end_date=None, client_filter=None, summary=None):
+    """Produção por Programa - recorte do cubo em memória de Rel_Carga"""
+    if summary is None:
+        from dstech_cube import production_cube
+        summary = production_cube.summary(start_date, end_date, client_filter)
     
-    # Construir filtro de data
-    date_filter = "WHERE rc.\"Time_Stamp\" >= CURRENT_DATE - INTERVAL '30 days'"
-    if start_date and end_date:
-        date_filter = f"WHERE rc.\"Time_Stamp\" >= '{start_date}' AND rc.\"Time_Stamp\" <= '{end_date}'"
-    elif start_date:
-        date_filter = f"WHERE rc.\"Time_Stamp\" >= '{start_date}'"
-    elif end_date:
-        date_filter = f"WHERE rc.\"Time_Stamp\" <= '{end_date}'"
-    
-    # Adicionar filtro de cliente se especificado
-    if client_filter:
-        if 'WHERE' in date_filter:
-            date_filter += f" AND rc.\"C1\" = '{client_filter}'"
-        else:
-            date_filter = f"WHERE rc.\"C1\" = '{client_filter}'"
-    
-    query = f"""
-    SELECT 
-        p.program_name,
-        rc."C0" as program_id,
-        COUNT(*) as total_loads,
-        SUM(rc."C2") as total_weight_kg,
-        AVG(rc."C2") as avg_weight_per_load
-    FROM "Rel_Carga" rc
-    LEFT JOIN programas p ON rc."C0" = p.program_id
-    {date_filter}
-    GROUP BY p.program_name, rc."C0"
-    ORDER BY total_weight_kg DESC
-    """
-    
-    df = execute_query(query)
+    df = summary['programs']
     
     if df.empty:
         return go.Figure().add_annotation(text="Sem dados de produção por programa", 
                                         xref="paper", yref="paper",
                                         x=0.5, y=0.5, showarrow=False)
     
-    # Tratar programas sem nome
-    df['program_display'] = df['program_name'].fillna("Programa " + df['program_id'].astype(str))
-    
     colors = ['#e74c3c', '#f39c12', '#2ecc71', '#9b59b6', '#1abc9c']
     
     fig = go.Figure(data=[
@@ -524,6 +599,37 @@ def create_production_by_program_chart(start_date=None, end_date=None, client_fi
     
     return fig
 
+def create_client_program_heatmap(start_date=None, end_date=None, client_filter=None, summary=None):
+    """Mapa de calor Cliente × Programa (kg) - recorte do cubo em memória de Rel_Carga"""
+    if summary is None:
+        from dstech_cube import production_cube
+        summary = production_cube.summary(start_date, end_date, client_filter)
+    
+    matrix = summary['matrix'].head(15)
+    
+    if matrix.empty:
+        return go.Figure().add_annotation(text="Sem dados de produção por cliente e programa", 
+                                        xref="paper", yref="paper",
+                                        x=0.5, y=0.5, showarrow=False)
+    
+    fig = go.Figure(data=go.Heatmap(
+        z=matrix.to_numpy(),
+        x=matrix.columns,
+        y=matrix.index,
+        colorscale='Blues',
+        colorbar=dict(title='kg'),
+        hovertemplate='<b>%{y}</b><br>Programa: %{x}<br>Peso: %{z:.0f} kg<extra></extra>'
+    ))
+    
+    fig.update_layout(
+        title="Produção por Cliente × Programa (kg)",
+        xaxis_title="Programa",
+        yaxis=dict(autorange='reversed'),
+        template='plotly_white'
+    )
+    
+    return fig
+
 # ===== FUNÇÕES AUXILIARES =====
 
 def format_number_abbreviated(value):
@@ -564,6 +670,14 @@ def get_operational_kpis(start_date=None, end_date=None, client_filter=None):
         client_filter: Filtro de cliente (opcional)
     """
     
+    # Períodos sem filtro de cliente vêm do índice de somas acumuladas (sem consulta)
+    if start_date and end_date and (not client_filter or client_filter == 'all'):
+        from dstech_kpi_index import kpi_index
+        try:
+            return kpi_index.kpis(start_date, end_date)
+        except Exception as e:
+            print(f"Erro no índice de KPIs, usando consulta direta: {e}")
+    
     # Construir filtros baseados nos parâmetros
     date_filter_today = """"Time_Stamp" >= NOW() - INTERVAL '24 hours'"""
     date_filter_week = """"Time_Stamp" >= CURRENT_DATE - INTERVAL '7 days'"""
@@ -700,8 +814,8 @@ def get_operational_kpis(start_date=None, end_date=None, client_filter=None):
             'alarmes_ativos': 0
         }
 
-def create_active_alarms_table():
-    """Tabela de alarmes ativos"""
+def get_active_alarms_rows():
+    """Linhas da tabela de alarmes ativos, cada uma com 'id' estável (tag + início)"""
     
     query = """
     SELECT 
@@ -721,10 +835,7 @@ def create_active_alarms_table():
     df = execute_query(query)
     
     if df.empty:
-        return html.Div([
-            html.H5("Alarmes Ativos", className="text-center mb-3"),
-            html.P("Nenhum alarme ativo no momento", className="text-center text-muted")
-        ])
+        return []
     
     # Mapear prioridades
     priority_map = {1: 'Crítico', 2: 'Alto', 3: 'Médio', 4: 'Baixo', 5: 'Info'}
@@ -741,6 +852,7 @@ def create_active_alarms_table():
     table_data = []
     for _, row in df.iterrows():
         table_data.append({
+            'id': f"{row['tag']}|{row['start_time'].isoformat()}",
             'Tag': row['tag'],
             'Mensagem': row['message_short'],
             'Área': row['area'],
@@ -749,9 +861,61 @@ def create_active_alarms_table():
             'Duração': row['duration_formatted']
         })
     
+    return table_data
+
+def get_active_alarms_title(rows):
+    """Título da tabela de alarmes ativos"""
+    if not rows:
+        return "Nenhum alarme ativo no momento"
+    return f"Alarmes Ativos ({len(rows)})"
+
+def diff_table_rows(old_rows, new_rows):
+    """Gera um Patch com apenas as células e linhas alteradas de um DataTable
+
+    As linhas são identificadas pela chave 'id'. Linhas removidas saem da
+    tabela, linhas novas são inseridas na posição correta e, nas demais, só as
+    células com valor diferente são enviadas. Retorna `no_update` quando nada
+    mudou e a lista completa quando a ordem das linhas existentes mudou.
+    """
+    old_rows = old_rows or []
+    new_ids = {row['id'] for row in new_rows}
+    patch = Patch()
+    changed = False
+    
+    current = []
+    for row in old_rows:
+        if row.get('id') in new_ids:
+            current.append(row)
+        else:
+            patch.remove(row)
+            changed = True
+    
+    for index, row in enumerate(new_rows):
+        if index < len(current) and current[index]['id'] == row['id']:
+            for key, value in row.items():
+                if current[index].get(key) != value:
+                    patch[index][key] = value
+                    changed = True
+        elif any(existing['id'] == row['id'] for existing in current):
+            # Reordenação de linhas existentes: mais simples enviar a tabela inteira
+            return new_rows
+        else:
+            patch.insert(index, row)
+            current.insert(index, row)
+            changed = True
+    
+    return patch if changed else no_update
+
+def create_active_alarms_table(rows=None):
+    """Tabela de alarmes ativos (atualizada depois via diff_table_rows)"""
+    
+    table_data = get_active_alarms_rows() if rows is None else rows
+    
     return html.Div([
-        html.H5(f"Alarmes Ativos ({len(df)})", className="text-center mb-3"),
+        html.H5(get_active_alarms_title(table_data), className="text-center mb-3",
+                id='active-alarms-title'),
         dash_table.DataTable(
+            id='active-alarms-table',
             data=table_data,
             columns=[
                 {'name': 'Tag', 'id': 'Tag'},
@@ -925,6 +1089,7 @@ Funções principais do módulo dstech_charts.py:
 5. create_alarm_analysis_chart() - Análise de alarmes por área
 6. create_production_by_client_chart() - Produção por cliente
 7. create_production_by_program_chart() - Produção por programa
+   create_client_program_heatmap() - Produção por cliente × programa
 8. get_operational_kpis() - KPIs operacionais principais
 9. create_active_alarms_table() - Tabela de alarmes ativos
 10. get_dashboard_summary() - Resumo geral do dashboard
@@ -933,126 +1098,176 @@ Todas as funções utilizam dados reais do PostgreSQL com cálculos
 baseados no README e arquivo de reunião.
 """
 
-def create_temperature_trend_chart(start_date=None, end_date=None):
-    """Gráfico de tendência de sensores e variáveis do processo"""
-    
-    # Construir filtro de data
-    date_filter = "WHERE \"Time_Stamp\" >= CURRENT_DATE - INTERVAL '7 days'"
-    if start_date and end_date:
-        date_filter = f"WHERE \"Time_Stamp\" >= '{start_date}' AND \"Time_Stamp\" <= '{end_date}'"
-    elif start_date:
-        date_filter = f"WHERE \"Time_Stamp\" >= '{start_date}'"
-    elif end_date:
-        date_filter = f"WHERE \"Time_Stamp\" <= '{end_date}'"
-    
+# ===== TENDÊNCIAS (TREND001) =====
+
+# Colunas da TREND001 exibidas nos gráficos de tendência, na ordem dos traces.
+# A ordem é fixa para que o streaming via extendData encontre cada trace pelo índice.
+TREND_COLUMNS = [
+    ('Real_R_0', 'sensor_principal'),
+    ('Real_R_10', 'sensor_secundario'),
+    ('C8_Real_0', 'variavel_c8'),
+    ('C3_Real_0', 'variavel_c3'),
+    ('C4_Real_0', 'variavel_c4')
+]
+
+# Pontos do histórico inicial (reduzido no banco por média em intervalos de tempo)
+TREND_HISTORY_POINTS = 1000
+
+# Janela móvel dos gráficos em streaming (maxPoints do extendData): os pontos
+# novos chegam nos mesmos intervalos do histórico, então a janela continua
+# cobrindo o período selecionado em vez dos últimos segundos de dados brutos
+TREND_STREAM_MAX_POINTS = TREND_HISTORY_POINTS
+
+# Prévia rápida (carregamento progressivo): menos pontos sobre uma amostra de blocos da tabela
+TREND_PREVIEW_POINTS = 200
+TREND_PREVIEW_SAMPLE_PERCENT = float(os.getenv('DSTECH_TREND_SAMPLE_PERCENT', '2'))
+
+def get_trend_history(start_date=None, end_date=None, max_points=TREND_HISTORY_POINTS, sample_percent=None):
+    """Histórico da TREND001 reduzido a no máximo `max_points` pontos (média por intervalo)
+
+    O DataFrame retornado traz em `attrs['last_ts']` o último Time_Stamp bruto do
+    período, usado como marca d'água para o streaming de novos pontos, e em
+    `attrs['bucket_seconds']` o tamanho dos intervalos. Com
+    `sample_percent`, lê só essa porcentagem dos blocos (TABLESAMPLE SYSTEM):
+    médias aproximadas, usadas na prévia do carregamento progressivo.
+    """
+    if start_date is None and end_date is None:
+        start_date = datetime.now() - timedelta(days=7)
+    start = pd.to_datetime(start_date) if start_date else None
+    end = pd.to_datetime(end_date) if end_date else datetime.now()
+    if start is None:
+        start = end - timedelta(days=7)
+
+    # date_bin (PostgreSQL 14+) mantém o tipo e o fuso de "Time_Stamp";
+    # to_timestamp(epoch) devolvia timestamptz e deslocava os intervalos
+    bucket_seconds = max(1, int((end - start).total_seconds() / max_points))
+    averages = ",\n        ".join(f'AVG("{column}") as {alias}' for column, alias in TREND_COLUMNS)
+
     query = f"""
     SELECT 
-        "Time_Stamp" as timestamp,
-        "Real_R_0" as sensor_principal,
-        "Real_R_10" as sensor_secundario,
-        "C8_Real_0" as variavel_processo_1,
-        "C3_Real_0" as variavel_processo_2,
-        "C4_Real_0" as variavel_processo_3
+        date_bin(make_interval(secs => %(bucket)s), "Time_Stamp", TIMESTAMP '2000-01-01') as timestamp,
+        {averages},
+        MAX("Time_Stamp") as last_ts
+    FROM "TREND001" {'TABLESAMPLE SYSTEM (%(sample)s)' if sample_percent else ''}
+    WHERE "Time_Stamp" >= %(start)s AND "Time_Stamp" <= %(end)s
+    GROUP BY 1
+    ORDER BY 1 ASC
+    """
+
+    df = execute_query(query, {'bucket': bucket_seconds, 'start': start, 'end': end, 'sample': sample_percent})
+    if df.empty:
+        return df
+
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    for _, alias in TREND_COLUMNS:
+        df[alias] = pd.to_numeric(df[alias], errors='coerce')
+    df.attrs['last_ts'] = pd.to_datetime(df['last_ts']).max().isoformat()
+    df.attrs['bucket_seconds'] = bucket_seconds
+    return df
+
+def drop_open_bucket(df, since=None):
+    """Remove o último intervalo (ainda recebendo pontos) e recua a marca d'água
+
+    A marca d'água passa a ser o último Time_Stamp bruto dos intervalos
+    mantidos (ou `since`, se nenhum ficou): os pontos do intervalo removido
+    voltam na próxima consulta do streaming, já com a média do intervalo completo.
+    """
+    closed = df.iloc[:-1].copy()
+    closed.attrs = dict(df.attrs)
+    closed.attrs['last_ts'] = pd.to_datetime(closed['last_ts']).max().isoformat() if not closed.empty else since
+    return closed
+
+def get_trend_points_since(since, bucket_seconds, limit=TREND_STREAM_MAX_POINTS):
+    """Intervalos fechados da TREND001 posteriores à marca d'água `since`
+
+    Média por intervalo de `bucket_seconds`, alinhada aos intervalos de
+    get_trend_history; `attrs['last_ts']` traz a nova marca d'água.
+    """
+    averages = ",\n        ".join(f'AVG("{column}") as {alias}' for column, alias in TREND_COLUMNS)
+    query = f"""
+    SELECT 
+        date_bin(make_interval(secs => %(bucket)s), "Time_Stamp", TIMESTAMP '2000-01-01') as timestamp,
+        {averages},
+        MAX("Time_Stamp") as last_ts
     FROM "TREND001"
-    {date_filter}
-    ORDER BY "Time_Stamp" ASC
-    LIMIT 1000
+    WHERE "Time_Stamp" > %(since)s
+    GROUP BY 1
+    ORDER BY 1 ASC
+    LIMIT %(limit)s
     """
+    df = execute_query(query, {'since': pd.to_datetime(since), 'bucket': bucket_seconds, 'limit': limit + 1})
+    if df.empty:
+        return df
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    for _, alias in TREND_COLUMNS:
+        df[alias] = pd.to_numeric(df[alias], errors='coerce')
+    return drop_open_bucket(df, since)
+
+def build_trend_extend_data(df, max_points=TREND_STREAM_MAX_POINTS):
+    """Monta o payload do extendData (um trace por coluna de TREND_COLUMNS)"""
+    xs, ys = [], []
+    for _, alias in TREND_COLUMNS:
+        valid = df[df[alias].notna()]
+        xs.append(valid['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist())
+        ys.append(valid[alias].tolist())
+    return dict(x=xs, y=ys), list(range(len(TREND_COLUMNS))), max_points
+
+def create_temperature_trend_chart(start_date=None, end_date=None, data=None):
+    """Gráfico de tendência de sensores e variáveis do processo"""
     
-    df = execute_query(query)
+    df = get_trend_history(start_date, end_date) if data is None else data
     
     if df.empty:
         return go.Figure().add_annotation(text="Sem dados de tendência disponíveis", 
                                         xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False)
     
-    # Converter para numérico
-    numeric_cols = ['sensor_principal', 'sensor_secundario', 'variavel_processo_1', 'variavel_processo_2', 'variavel_processo_3']
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    
     fig = go.Figure()
     
-    # Sensores e variáveis do processo
+    # Sensores e variáveis do processo (sempre todos os traces, na ordem de TREND_COLUMNS)
     variables = [
         ('sensor_principal', 'Sensor Principal', '#e74c3c'),
         ('sensor_secundario', 'Sensor Secundário', '#3498db'),
-        ('variavel_processo_1', 'Variável C8', '#2ecc71'),
-        ('variavel_processo_2', 'Variável C3', '#f39c12'),
-        ('variavel_processo_3', 'Variável C4', '#9b59b6')
+        ('variavel_c8', 'Variável C8', '#2ecc71'),
+        ('variavel_c3', 'Variável C3', '#f39c12'),
+        ('variavel_c4', 'Variável C4', '#9b59b6')
     ]
     
     for col, name, color in variables:
-        if col in df.columns and not df[col].isna().all():
-            # Filtrar valores válidos
-            valid_data = df[df[col].notna()]
-            if not valid_data.empty:
-                fig.add_trace(go.Scatter(
-                    x=valid_data['timestamp'],
-                    y=valid_data[col],
-                    mode='lines+markers',
-                    name=name,
-                    line=dict(color=color, width=2),
-                    marker=dict(size=4),
-                    hovertemplate=f'<b>{name}</b><br>%{{x}}<br>Valor: %{{y:.2f}}<extra></extra>'
-                ))
-    
-    # Adicionar estatísticas se houver dados
-    if not df.empty and len(fig.data) > 0:
-        # Calcular médias para cada variável
-        stats_text = "Médias: "
-        for col, name, _ in variables:
-            if col in df.columns and not df[col].isna().all():
-                avg_val = df[col].mean()
-                if not pd.isna(avg_val):
-                    stats_text += f"{name}: {avg_val:.1f} | "
-        
-        fig.update_layout(
-            title=f"Análise de Tendências do Processo<br><sub>{stats_text.rstrip(' | ')}</sub>",
-            xaxis_title="Data/Hora",
-            yaxis_title="Valores dos Sensores/Variáveis",
-            hovermode='x unified',
-            template='plotly_white',
-            showlegend=True,
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
-    else:
-        fig.update_layout(
-            title="Análise de Tendências do Processo",
-            xaxis_title="Data/Hora",
-            yaxis_title="Valores dos Sensores/Variáveis",
-            template='plotly_white'
-        )
+        # Filtrar valores válidos
+        valid_data = df[df[col].notna()]
+        fig.add_trace(go.Scatter(
+            x=valid_data['timestamp'],
+            y=valid_data[col],
+            mode='lines+markers',
+            name=name,
+            line=dict(color=color, width=2),
+            marker=dict(size=4),
+            hovertemplate=f'<b>{name}</b><br>%{{x}}<br>Valor: %{{y:.2f}}<extra></extra>'
+        ))
+    
+    # Calcular médias para cada variável
+    stats_text = "Médias: "
+    for col, name, _ in variables:
+        avg_val = df[col].mean()
+        if not pd.isna(avg_val):
+            stats_text += f"{name}: {avg_val:.1f} | "
+    
+    fig.update_layout(
+        title=f"Análise de Tendências do Processo<br><sub>{stats_text.rstrip(' | ')}</sub>",
+        xaxis_title="Data/Hora",
+        yaxis_title="Valores dos Sensores/Variáveis",
+        hovermode='x unified',
+        template='plotly_white',
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
     
     return fig
 
-def create_sensors_trend_chart(start_date=None, end_date=None):
+def create_sensors_trend_chart(start_date=None, end_date=None, data=None):
     """Gráfico de análise completa de sensores usando dados reais da TREND001"""
     
-    # Construir filtro de data
-    date_filter = "WHERE \"Time_Stamp\" >= CURRENT_DATE - INTERVAL '7 days'"
-    if start_date and end_date:
-        date_filter = f"WHERE \"Time_Stamp\" >= '{start_date}' AND \"Time_Stamp\" <= '{end_date}'"
-    elif start_date:
-        date_filter = f"WHERE \"Time_Stamp\" >= '{start_date}'"
-    elif end_date:
-        date_filter = f"WHERE \"Time_Stamp\" <= '{end_date}'"
-    
-    query = f"""
-    SELECT 
-        "Time_Stamp" as timestamp,
-        "Real_R_0" as sensor_principal,
-        "Real_R_10" as sensor_secundario,
-        "C8_Real_0" as variavel_c8,
-        "C3_Real_0" as variavel_c3,
-        "C4_Real_0" as variavel_c4 
-    FROM "TREND001"
-    {date_filter}
-    ORDER BY "Time_Stamp" DESC
-    LIMIT 1000
-    """
-    
-    df = execute_query(query)
+    df = get_trend_history(start_date, end_date) if data is None else data
     
     if df.empty:
         return go.Figure().add_annotation(
@@ -1061,13 +1276,9 @@ def create_sensors_trend_chart(start_date=None, end_date=None):
             font=dict(size=16, color="#7f8c8d")
         )
     
-    # Converter timestamp para datetime
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    df = df.sort_values('timestamp')
-    
     fig = go.Figure()
     
-    # Adicionar cada sensor como uma linha
+    # Adicionar cada sensor como uma linha (sempre todos, na ordem de TREND_COLUMNS)
     sensors = [
         ('sensor_principal', 'Sensor Principal', '#3498db'),
         ('sensor_secundario', 'Sensor Secundário', '#e74c3c'),
@@ -1077,20 +1288,20 @@ def create_sensors_trend_chart(start_date=None, end_date=None):
     ]
     
     for col, name, color in sensors:
-        if col in df.columns and not df[col].isna().all():
-            fig.add_trace(go.Scatter(
-                x=df['timestamp'],
-                y=df[col],
-                mode='lines',
-                name=name,
-                line=dict(color=color, width=2),
-                hovertemplate=f'<b>{name}</b><br>Valor: %{{y:.2f}}<br>Tempo: %{{x}}<extra></extra>'
-            ))
+        valid_data = df[df[col].notna()]
+        fig.add_trace(go.Scatter(
+            x=valid_data['timestamp'],
+            y=valid_data[col],
+            mode='lines',
+            name=name,
+            line=dict(color=color, width=2),
+            hovertemplate=f'<b>{name}</b><br>Valor: %{{y:.2f}}<br>Tempo: %{{x}}<extra></extra>'
+        ))
     
     # Calcular estatísticas dos sensores
     stats_text = []
     for col, name, _ in sensors:
-        if col in df.columns and not df[col].isna().all():
+        if not df[col].isna().all():
             mean_val = df[col].mean()
             stats_text.append(f"{name}: {mean_val:.1f}")
     
@@ -1111,24 +1322,19 @@ def create_sensors_trend_chart(start_date=None, end_date=None):
 def create_client_analysis_chart(client_filter=None):
     """Gráfico de análise por cliente baseado nos dados de produção"""
     
-    # Se há filtro de cliente específico, usar dados reais da tabela Rel_Carga
+    # Se há filtro de cliente específico, usar o cubo em memória de Rel_Carga
     if client_filter:
-        query = f"""
-        SELECT 
-            COALESCE(c.client_name, 'Cliente ' || CAST(rc."C1" AS TEXT)) as cliente,
-            COUNT(*) as total_ciclos,
-            SUM(rc."C2") as total_kg,
-            AVG(rc."C2") as media_kg_ciclo,
-            0 as total_agua_litros,
-            0 as total_quimicos_kg
-        FROM "Rel_Carga" rc
-        LEFT JOIN clientes c ON CAST(rc."C1" AS INTEGER) = c.client_id
-        WHERE rc."Time_Stamp" >= CURRENT_DATE - INTERVAL '30 days'
-          AND rc."C1" = '{client_filter}'
-          AND rc."C2" > 0
-        GROUP BY c.client_name, rc."C1"
-        ORDER BY total_kg DESC
-        """
+        from dstech_cube import production_cube
+        
+        clients = production_cube.by_client(client_id=client_filter)
+        df = pd.DataFrame({
+            'cliente': clients['client_display'],
+            'total_ciclos': clients['total_loads'],
+            'total_kg': clients['total_weight_kg'],
+            'media_kg_ciclo': clients['avg_weight_per_load'],
+            'total_agua_litros': 0,
+            'total_quimicos_kg': 0
+        })
     else:
         query = """
         SELECT 
@@ -1155,8 +1361,7 @@ def create_client_analysis_chart(client_filter=None):
             END
         ORDER BY total_kg DESC
         """
-    
-    df = execute_query(query)
+        df = execute_query(query)
     
     if df.empty:
         return go.Figure().add_annotation(text="Sem dados de clientes disponíveis", 
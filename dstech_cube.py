@@ -0,0 +1,246 @@
+"""
+DSTech Dashboard - Cubo de Produção em Memória
+Cubo cliente × programa × dia sobre Rel_Carga (kg e número de cargas).
+
+O cubo é montado a partir de um agregado diário e atualizado de forma
+incremental: a cada atualização só os dias a partir do último dia carregado
+são reconsultados e substituídos. Qualquer combinação de cliente e período
+vira um recorte de array seguido de soma, sem consultar o PostgreSQL.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from dstech_charts import execute_query
+from dstech_db import query_class
+from dstech_dimensions import dimensions
+
+# Dias carregados na primeira montagem (períodos mais antigos são carregados sob demanda)
+CUBE_INITIAL_DAYS = int(os.getenv('DSTECH_CUBE_DAYS', '90'))
+
+# Colunas do agregado diário
+CUBE_COLUMNS = ['dia', 'client_id', 'program_id', 'kg', 'cargas']
+
+# Agregado diário por cliente e programa
+CUBE_QUERY = """
+SELECT
+    DATE("Time_Stamp") AS dia,
+    "C1" AS client_id,
+    "C0" AS program_id,
+    SUM("C2") AS kg,
+    COUNT(*) AS cargas
+FROM "Rel_Carga"
+WHERE "Time_Stamp" >= %(start)s AND "Time_Stamp" < %(end)s
+  AND "C2" > 0
+GROUP BY DATE("Time_Stamp"), "C1", "C0"
+"""
+
+def _to_day(value):
+    """Converte str/datetime/date em date (None permanece None)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value.date() if isinstance(value, datetime) else value
+
+class ProductionCube:
+    """Cubo kg/cargas indexado por (cliente, programa, dia)
+
+    Os arrays nunca são alterados no lugar: cada atualização monta um novo
+    estado e o troca de uma vez, então leituras concorrentes sempre veem um
+    cubo consistente.
+    """
+
+    def __init__(self, query_source=execute_query, initial_days=CUBE_INITIAL_DAYS):
+        self.query_source = query_source
+        self.initial_days = initial_days
+        self._lock = threading.Lock()
+        self._state = None
+        self.updated_at = None
+
+    def reset_after_fork(self):
+        """No processo filho: trava nova, mantendo o cubo herdado do pai"""
+        self._lock = threading.Lock()
+
+    def _fetch(self, start_day, end_day):
+        """Agregado diário de [start_day, end_day] como DataFrame
+
+        LookupError quando a consulta falha (execute_query devolve um DataFrame
+        sem colunas): os dias do período não podem virar zeros no cubo.
+        """
+        with query_class('analytics'):
+            df = self.query_source(CUBE_QUERY, {
+                'start': datetime.combine(start_day, datetime.min.time()),
+                'end': datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+            })
+        if not set(CUBE_COLUMNS) <= set(df.columns):
+            raise LookupError(f"agregado de Rel_Carga de {start_day} a {end_day} indisponível")
+        if df.empty:
+            return pd.DataFrame(columns=CUBE_COLUMNS)
+        df['dia'] = pd.to_datetime(df['dia']).dt.date
+        # Ids brutos de Rel_Carga (texto/double) convertidos para inteiros em memória;
+        # cargas sem cliente/programa válido (NULL ou texto) ficam fora do cubo
+        df['client_id'] = pd.to_numeric(df['client_id'], errors='coerce')
+        df['program_id'] = pd.to_numeric(df['program_id'], errors='coerce')
+        df = df.dropna(subset=['client_id', 'program_id'])
+        df['client_id'] = df['client_id'].astype(int)
+        df['program_id'] = df['program_id'].astype(int)
+        return df
+
+    def _merge(self, state, df, start_day, end_day):
+        """Novo estado com os dias [start_day, end_day] substituídos pelo agregado `df`"""
+        if state is None:
+            clients, programs = np.array([], dtype=int), np.array([], dtype=int)
+            first_day, last_day = start_day, end_day
+            kg = np.zeros((0, 0, (end_day - start_day).days + 1))
+            loads = np.zeros(kg.shape, dtype=np.int64)
+        else:
+            clients, programs = state['clients'], state['programs']
+            first_day, last_day = min(state['first_day'], start_day), max(state['last_day'], end_day)
+            kg, loads = state['kg'], state['loads']
+
+        # Novos clientes/programas entram no fim dos eixos
+        new_clients = np.setdiff1d(df['client_id'].to_numpy(dtype=int), clients)
+        new_programs = np.setdiff1d(df['program_id'].to_numpy(dtype=int), programs)
+        clients = np.concatenate([clients, new_clients])
+        programs = np.concatenate([programs, new_programs])
+
+        # Expandir o eixo de dias e copiar o estado anterior para a posição certa
+        n_days = (last_day - first_day).days + 1
+        new_kg = np.zeros((len(clients), len(programs), n_days))
+        new_loads = np.zeros(new_kg.shape, dtype=np.int64)
+        if state is not None:
+            offset = (state['first_day'] - first_day).days
+            c, p, d = kg.shape
+            new_kg[:c, :p, offset:offset + d] = kg
+            new_loads[:c, :p, offset:offset + d] = loads
+
+        # Substituir os dias reconsultados
+        lo, hi = (start_day - first_day).days, (end_day - first_day).days + 1
+        new_kg[:, :, lo:hi] = 0
+        new_loads[:, :, lo:hi] = 0
+        if not df.empty:
+            client_idx = pd.Index(clients).get_indexer(df['client_id'].to_numpy(dtype=int))
+            program_idx = pd.Index(programs).get_indexer(df['program_id'].to_numpy(dtype=int))
+            day_idx = np.array([(day - first_day).days for day in df['dia']])
+            np.add.at(new_kg, (client_idx, program_idx, day_idx), df['kg'].to_numpy(dtype=float))
+            np.add.at(new_loads, (client_idx, program_idx, day_idx), df['cargas'].to_numpy(dtype=np.int64))
+
+        return {
+            'clients': clients, 'programs': programs,
+            'first_day': first_day, 'last_day': last_day,
+            'kg': new_kg, 'loads': new_loads
+        }
+
+    def refresh(self):
+        """Monta o cubo ou reconsulta apenas os dias a partir do último carregado
+
+        Com a consulta falhando o cubo fica como estava (e sem cubo montado a
+        próxima chamada tenta de novo).
+        """
+        with self._lock:
+            today = datetime.now().date()
+            state = self._state
+            start_day = today - timedelta(days=self.initial_days) if state is None else state['last_day']
+            try:
+                df = self._fetch(start_day, today)
+            except LookupError as e:
+                print(f"Cubo de produção não atualizado: {e}")
+                return
+            self._state = self._merge(state, df, start_day, today)
+            self.updated_at = datetime.now()
+
+    def _ensure(self, start_day):
+        """Garante cubo montado e cobrindo `start_day` (carrega dias antigos sob demanda)
+
+        Se a carga falhar, responde com o que houver (cubo vazio sem nenhuma
+        carga) sem marcar os dias como carregados: a próxima chamada repete.
+        """
+        if self._state is None:
+            self.refresh()
+        state = self._state
+        if state is None:
+            today = datetime.now().date()
+            return self._merge(None, pd.DataFrame(columns=CUBE_COLUMNS), today, today)
+        if start_day < state['first_day']:
+            with self._lock:
+                state = self._state
+                if start_day < state['first_day']:
+                    end_day = state['first_day'] - timedelta(days=1)
+                    try:
+                        self._state = self._merge(state, self._fetch(start_day, end_day), start_day, end_day)
+                    except LookupError as e:
+                        print(f"Dias antigos do cubo de produção não carregados: {e}")
+                state = self._state
+        return state
+
+    def slice(self, start_date=None, end_date=None, client_id=None, default_days=30):
+        """Recorte do período/cliente somado nos dias: (kg, cargas, clientes, programas)
+
+        `kg` e `cargas` têm forma (clientes, programas). Períodos alinhados a
+        dias inteiros; sem datas, usa os últimos `default_days` dias.
+        """
+        end_day = _to_day(end_date) or datetime.now().date()
+        start_day = _to_day(start_date) or end_day - timedelta(days=default_days)
+        state = self._ensure(start_day)
+
+        lo = max((start_day - state['first_day']).days, 0)
+        hi = max((end_day - state['first_day']).days + 1, lo)
+        kg = state['kg'][:, :, lo:hi].sum(axis=2)
+        loads = state['loads'][:, :, lo:hi].sum(axis=2)
+        clients = state['clients']
+
+        if client_id not in (None, 'all', ''):
+            mask = clients == int(float(client_id))
+            kg, loads, clients = kg[mask], loads[mask], clients[mask]
+        return kg, loads, clients, state['programs']
+
+    def client_ids(self):
+        """Clientes presentes no cubo"""
+        return list(self._ensure(datetime.now().date())['clients'])
+
+    def summary(self, start_date=None, end_date=None, client_id=None):
+        """Quebras por cliente, por programa e cliente × programa de um único recorte
+
+        Retorna dict com 'clients' e 'programs' (totais ordenados por kg) e
+        'matrix' (kg por cliente × programa, rótulos nos eixos).
+        """
+        kg, loads, clients, programs = self.slice(start_date, end_date, client_id)
+        client_labels = dimensions.client_labels(clients)
+        program_labels = dimensions.program_labels(programs)
+
+        client_totals = self._totals(clients, client_labels, kg.sum(axis=1), loads.sum(axis=1), 'client')
+        program_totals = self._totals(programs, program_labels, kg.sum(axis=0), loads.sum(axis=0), 'program')
+
+        # Matriz apenas com clientes/programas presentes no recorte, na ordem dos totais
+        matrix = pd.DataFrame(kg, index=clients, columns=programs)
+        matrix = matrix.loc[client_totals['client_id'], program_totals['program_id']]
+        matrix.index = client_totals['client_display']
+        matrix.columns = program_totals['program_display']
+
+        return {'clients': client_totals, 'programs': program_totals, 'matrix': matrix}
+
+    def by_client(self, start_date=None, end_date=None, client_id=None):
+        """Totais por cliente do recorte (maior produção primeiro)"""
+        return self.summary(start_date, end_date, client_id)['clients']
+
+    def by_program(self, start_date=None, end_date=None, client_id=None):
+        """Totais por programa do recorte (maior produção primeiro)"""
+        return self.summary(start_date, end_date, client_id)['programs']
+
+    @staticmethod
+    def _totals(ids, labels, kg, loads, dimension):
+        df = pd.DataFrame({
+            f'{dimension}_id': ids,
+            f'{dimension}_display': labels,
+            'total_loads': loads,
+            'total_weight_kg': kg,
+            'avg_weight_per_load': np.divide(kg, loads, out=np.zeros(len(kg)), where=loads > 0)
+        })
+        return df[df['total_loads'] > 0].sort_values('total_weight_kg', ascending=False, ignore_index=True)
+
+# Instância compartilhada pelo processo
+production_cube = ProductionCube()
+os.register_at_fork(after_in_child=production_cube.reset_after_fork)
@@ -0,0 +1,834 @@
+"""
+DSTech Dashboard - Acesso ao PostgreSQL
+Pool de conexões, statement_timeout por classe de consulta, cancelamento
+de consultas de callbacks que já foram substituídos por um pedido mais novo
+e resultados antigos (stale-while-revalidate) com o banco indisponível.
+
+Cada consulta roda com o statement_timeout da sua classe ('live', 'chart',
+'analytics' ou 'export'), definida com `with query_class(...)` ou pelo
+decorador `cancel_superseded`. O decorador também numera as execuções de
+cada callback por aba do navegador: quando chega um pedido mais novo para
+a mesma aba e callback, as consultas ainda em andamento do pedido antigo
+são canceladas no servidor (cancel da conexão) e o resultado antigo é
+descartado.
+
+Falhas de conexão e timeouts alimentam um disjuntor: aberto, as consultas
+não vão ao banco e recebem o último resultado bom da mesma consulta
+(marcado com a idade), enquanto uma revalidação em segundo plano tenta
+atualizá-lo.
+
+Antes de pegar uma conexão, cada consulta passa pelo agendador de
+prioridades: interações do usuário ('interactive') antes de atualizações
+automáticas ('periodic') e estas antes de exportações ('export'), com
+limite de consultas simultâneas por classe.
+
+Com réplicas de leitura configuradas, consultas 'live' vão ao primário e as
+demais à réplica com menor atraso (dentro de DSTECH_REPLICA_MAX_LAG_SECONDS).
+"""
+
+import functools
+import itertools
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# pandas fica na importação: execute_query devolve DataFrames e todo módulo
+# de dados e callback os usa. psycopg2 (e SQLAlchemy) só com a primeira conexão.
+import pandas as pd
+from dotenv import load_dotenv
+from dash import callback_context
+from dash.exceptions import PreventUpdate
+
+# Carregar variáveis de ambiente
+load_dotenv('.env_dstech')
+
+# Configurações do banco
+PG_CONFIG = {
+    'host': os.getenv('POSTGRES_HOST', 'localhost'),
+    'port': os.getenv('POSTGRES_PORT', '5432'),
+    'user': os.getenv('POSTGRES_USER', 'postgres'),
+    'password': os.getenv('POSTGRES_PASSWORD', 'postgres123'),
+    'database': os.getenv('POSTGRES_DB', 'dstech_dashboard')
+}
+
+# Conexões mantidas abertas pelo pool (mais as extras sob pico)
+POOL_SIZE = int(os.getenv('DSTECH_DB_POOL_SIZE', '5'))
+POOL_MAX_OVERFLOW = int(os.getenv('DSTECH_DB_POOL_OVERFLOW', '10'))
+
+# Espera máxima por uma conexão livre do pool (segundos): com o banco lento,
+# os workers desistem cedo e servem o último resultado bom
+POOL_TIMEOUT = int(os.getenv('DSTECH_DB_POOL_TIMEOUT', '5'))
+
+# Disjuntor: falhas seguidas para abrir e tempo aberto antes de testar de novo
+BREAKER_FAILURES = int(os.getenv('DSTECH_BREAKER_FAILURES', '5'))
+BREAKER_RESET_SECONDS = int(os.getenv('DSTECH_BREAKER_RESET_SECONDS', '30'))
+
+# Consultas com último resultado bom guardado em memória
+LAST_GOOD_MAX_ENTRIES = int(os.getenv('DSTECH_LAST_GOOD_ENTRIES', '256'))
+# Limite de memória desses resultados (tamanho aproximado dos DataFrames)
+LAST_GOOD_MAX_BYTES = int(float(os.getenv('DSTECH_LAST_GOOD_MB', '64')) * 1024 * 1024)
+
+# Prioridades do agendador (ordem = prioridade) e consultas simultâneas por
+# classe. Atualizações periódicas e exportações têm limite baixo, deixando o
+# restante do pool sempre livre para as interações do usuário.
+PRIORITY_CLASSES = ['interactive', 'periodic', 'export']
+PRIORITY_LIMITS = {
+    'interactive': POOL_SIZE + POOL_MAX_OVERFLOW,
+    'periodic': int(os.getenv('DSTECH_PERIODIC_QUERIES', '3')),
+    'export': int(os.getenv('DSTECH_EXPORT_QUERIES', '1'))
+}
+# Espera máxima na fila antes de desistir (e servir o último resultado bom)
+PRIORITY_MAX_WAIT = {'interactive': 30, 'periodic': 10, 'export': 300}
+
+# Classes cujo limite vale para todos os processos (workers do gunicorn e
+# processos dos callbacks em segundo plano), com vagas no diskcache. A vaga
+# de um processo que morreu expira após SHARED_SLOT_LEASE_SECONDS.
+SHARED_PRIORITY_CLASSES = ('export',)
+SHARED_SLOT_LEASE_SECONDS = int(os.getenv('DSTECH_EXPORT_LEASE_SECONDS', '900'))
+SHARED_SLOT_POLL_SECONDS = 0.5
+SHARED_SLOTS_DIR = os.path.join(
+    os.getenv('DSTECH_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')), 'slots')
+
+# Gatilhos de callbacks que são atualizações automáticas (não ações do usuário)
+PERIODIC_TRIGGERS = ('interval-component', 'data-push-store')
+
+# Réplicas de leitura ('host[:porta]' separados por vírgula; mesmo usuário e banco).
+# Consultas 'live' (alarmes ativos, KPIs do dia, streaming) vão sempre ao
+# primário; as demais usam a réplica com menor atraso, se dentro do limite.
+PRIMARY = 'primary'
+READ_REPLICAS = [host.strip() for host in os.getenv('DSTECH_READ_REPLICAS', '').split(',') if host.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('DSTECH_REPLICA_MAX_LAG_SECONDS', '30'))
+REPLICA_CHECK_SECONDS = int(os.getenv('DSTECH_REPLICA_CHECK_SECONDS', '10'))
+PRIMARY_QUERY_CLASSES = ('live',)
+
+# Atraso da réplica: zero se já aplicou todo o WAL recebido. Sem receptor de
+# WAL transmitindo (primário fora, replicação parada) a réplica não recebe nada
+# novo e "aplicou tudo" não quer dizer atualizada: NULL, fora da rotação.
+# O usuário precisa ver pg_stat_wal_receiver (papel pg_monitor ou pg_read_all_stats).
+REPLICA_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN NULL
+    WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END AS lag
+"""
+
+# statement_timeout (ms) por classe de consulta
+STATEMENT_TIMEOUTS = {
+    'live': int(os.getenv('DSTECH_TIMEOUT_LIVE_MS', '5000')),           # KPIs, alarmes ativos, streaming
+    'chart': int(os.getenv('DSTECH_TIMEOUT_CHART_MS', '20000')),        # gráficos interativos
+    'analytics': int(os.getenv('DSTECH_TIMEOUT_ANALYTICS_MS', '60000')),  # cubos, índices, históricos
+    'export': int(os.getenv('DSTECH_TIMEOUT_EXPORT_MS', '600000'))      # relatórios e exportações
+}
+DEFAULT_QUERY_CLASS = 'chart'
+
+# dcc.Store com o id da aba do navegador (gerado a cada layout do dashboard);
+# os callbacks com `cancel_superseded` o recebem como último State
+TAB_ID_STORE = 'browser-tab-id'
+
+_engines = {}
+_engine_lock = threading.Lock()
+_local = threading.local()
+
+def get_engine(endpoint=PRIMARY):
+    """Engine SQLAlchemy (pool de conexões) do primário ou de uma réplica 'host[:porta]'"""
+    engine = _engines.get(endpoint)
+    if engine is None:
+        with _engine_lock:
+            engine = _engines.get(endpoint)
+            if engine is None:
+                # SQLAlchemy só é importado na primeira conexão (inicialização mais rápida)
+                from sqlalchemy import create_engine
+                host, _, port = (PG_CONFIG['host'] if endpoint == PRIMARY else endpoint).partition(':')
+                connection_string = f"postgresql+psycopg2://{PG_CONFIG['user']}:{PG_CONFIG['password']}@{host}:{port or PG_CONFIG['port']}/{PG_CONFIG['database']}"
+                engine = create_engine(connection_string, pool_size=POOL_SIZE,
+                                       max_overflow=POOL_MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT,
+                                       pool_pre_ping=True)
+                _engines[endpoint] = engine
+    return engine
+
+def get_db_connection():
+    """Cria conexão com PostgreSQL"""
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+    return psycopg2.connect(**PG_CONFIG, cursor_factory=RealDictCursor)
+
+def prewarm_pool(size=POOL_SIZE):
+    """Abre as `size` conexões mínimas do pool do primário (e das réplicas) antes do primeiro usuário
+
+    As conexões são abertas ao mesmo tempo, validadas com SELECT 1 e devolvidas
+    ao pool, onde ficam abertas. Falha no primário propaga a exceção; réplicas
+    fora do ar são apenas registradas. Retorna o número de conexões abertas.
+    """
+    opened = 0
+    for endpoint in [PRIMARY] + READ_REPLICAS:
+        connections = []
+        try:
+            for _ in range(size):
+                conn = get_engine(endpoint).connect()
+                connections.append(conn)
+                conn.exec_driver_sql("SELECT 1")
+            opened += len(connections)
+        except Exception as e:
+            if endpoint == PRIMARY:
+                raise
+            print(f"Réplica {endpoint} indisponível no aquecimento: {e}")
+        finally:
+            for conn in connections:
+                conn.close()
+    return opened
+
+@contextmanager
+def query_class(name):
+    """Define a classe (e o statement_timeout) das consultas feitas no bloco"""
+    previous = getattr(_local, 'query_class', None)
+    _local.query_class = name
+    try:
+        yield
+    finally:
+        _local.query_class = previous
+
+@contextmanager
+def query_class_at_least(name):
+    """Como `query_class`, mas mantém a classe de quem chamou se o timeout dela não for menor
+
+    Funções compartilhadas (agregados de relatório) pedem 'analytics' sem
+    rebaixar uma exportação ('export') que as chama.
+    """
+    current = getattr(_local, 'query_class', None)
+    if current and STATEMENT_TIMEOUTS[current] >= STATEMENT_TIMEOUTS[name]:
+        yield
+        return
+    with query_class(name):
+        yield
+
+class QueryGenerations:
+    """Geração atual de cada (aba, callback) e conexões em uso por geração"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        self._current = {}
+        self._running = {}
+
+    def begin(self, scope):
+        """Nova geração do escopo; cancela as consultas das gerações anteriores
+
+        O cancelamento acontece sob a trava: uma conexão só sai de `_running`
+        (também sob a trava) antes de voltar ao pool, então o cancel nunca
+        atinge uma conexão já reutilizada por outro pedido.
+        """
+        with self._lock:
+            token = next(self._counter)
+            self._current[scope] = token
+            for (running_scope, running_token), conns in self._running.items():
+                if running_scope != scope or running_token >= token:
+                    continue
+                for conn in conns:
+                    try:
+                        conn.cancel()
+                    except Exception as e:
+                        print(f"Erro ao cancelar consulta: {e}")
+        return token
+
+    def end(self, scope, token):
+        """Fim da execução: esquece o escopo se esta ainda era a geração atual"""
+        with self._lock:
+            if self._current.get(scope) == token:
+                del self._current[scope]
+
+    def is_stale(self, scope, token):
+        return self._current.get(scope) != token
+
+    @contextmanager
+    def running(self, scope, token, conn):
+        """Registra a conexão DBAPI em uso enquanto a consulta executa"""
+        key = (scope, token)
+        with self._lock:
+            self._running.setdefault(key, set()).add(conn)
+        try:
+            yield
+        finally:
+            with self._lock:
+                conns = self._running.get(key, set())
+                conns.discard(conn)
+                if not conns:
+                    self._running.pop(key, None)
+
+generations = QueryGenerations()
+
+def new_tab_id():
+    """Id de uma aba do navegador (valor inicial do dcc.Store TAB_ID_STORE)"""
+    return uuid.uuid4().hex
+
+def current_tab_id():
+    """Id da aba do navegador do callback atual (None fora de `cancel_superseded`)"""
+    return getattr(_local, 'tab_id', None)
+
+def after_fresh_result(function):
+    """Executa `function` quando o callback atual terminar com dados atuais do banco
+
+    Não executa se o callback falhar, for substituído por um pedido mais novo
+    ou se alguma consulta dele falhar ou for atendida pelo último resultado
+    bom. Fora de `cancel_superseded`, executa na hora.
+    """
+    pending = getattr(_local, 'after_fresh', None)
+    if pending is None:
+        function()
+    else:
+        pending.append(function)
+
+@contextmanager
+def db_priority(name):
+    """Define a prioridade no agendador das consultas feitas no bloco"""
+    previous = getattr(_local, 'priority', None)
+    _local.priority = name
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+def current_priority():
+    """Prioridade da consulta atual (exportações sempre na classe 'export')"""
+    if getattr(_local, 'query_class', None) == 'export':
+        return 'export'
+    # Fora de callbacks (threads de fundo, revalidações): atualização periódica
+    return getattr(_local, 'priority', None) or 'periodic'
+
+class SharedSlots:
+    """Vagas de uma classe compartilhadas entre processos
+
+    Cada vaga é uma chave do diskcache gravada com `add` (atômico) e validade
+    `lease_seconds`; o diskcache reabre a conexão em cada processo, então a
+    mesma instância vale depois de um fork.
+    """
+
+    def __init__(self, name, limit, lease_seconds=SHARED_SLOT_LEASE_SECONDS, directory=SHARED_SLOTS_DIR):
+        self.name = name
+        self.limit = limit
+        self.lease_seconds = lease_seconds
+        self.directory = directory
+        self._cache = None
+
+    @property
+    def cache(self):
+        if self._cache is None:
+            import diskcache
+            self._cache = diskcache.Cache(self.directory)
+        return self._cache
+
+    def acquire(self, timeout):
+        """(chave, token) da vaga obtida ou None se nenhuma vagar em `timeout` segundos"""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + max(timeout, 0)
+        while True:
+            for index in range(self.limit):
+                key = f"{self.name}-{index}"
+                if self.cache.add(key, token, expire=self.lease_seconds):
+                    return key, token
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(SHARED_SLOT_POLL_SECONDS)
+
+    def release(self, lease):
+        """Libera a vaga se ainda for desta chamada (não a de quem a obteve após expirar)"""
+        key, token = lease
+        with self.cache.transact():
+            if self.cache.get(key) == token:
+                self.cache.delete(key)
+
+    def in_use(self):
+        return sum(1 for index in range(self.limit) if self.cache.get(f"{self.name}-{index}") is not None)
+
+class QueryScheduler:
+    """Fila de prioridade na frente do pool de conexões
+
+    Uma consulta só começa se a sua classe está abaixo do limite, o total
+    está abaixo da capacidade do pool e nenhuma classe de prioridade maior
+    que também poderia rodar está esperando.
+    """
+
+    def __init__(self, limits=PRIORITY_LIMITS, capacity=POOL_SIZE + POOL_MAX_OVERFLOW,
+                 max_wait=PRIORITY_MAX_WAIT, shared_classes=SHARED_PRIORITY_CLASSES):
+        self.limits = limits
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.shared = {name: SharedSlots(name, limits[name]) for name in shared_classes}
+        self._cond = threading.Condition()
+        self._running = {name: 0 for name in PRIORITY_CLASSES}
+        self._waiting = {name: 0 for name in PRIORITY_CLASSES}
+        self._stats = {name: {'executadas': 0, 'desistencias': 0, 'espera_total_s': 0.0, 'espera_max_s': 0.0}
+                       for name in PRIORITY_CLASSES}
+
+    def _can_run(self, name):
+        if self._running[name] >= self.limits[name] or sum(self._running.values()) >= self.capacity:
+            return False
+        for higher in PRIORITY_CLASSES[:PRIORITY_CLASSES.index(name)]:
+            if self._waiting[higher] and self._running[higher] < self.limits[higher]:
+                return False
+        return True
+
+    @contextmanager
+    def slot(self, name):
+        """Ocupa uma vaga da classe durante o bloco; TimeoutError se a espera estourar
+
+        Classes compartilhadas ocupam também uma vaga entre processos, dentro
+        da mesma espera máxima.
+        """
+        started = time.monotonic()
+        with self._cond:
+            self._waiting[name] += 1
+            try:
+                granted = self._cond.wait_for(lambda: self._can_run(name), timeout=self.max_wait[name])
+            finally:
+                self._waiting[name] -= 1
+            if not granted:
+                self._stats[name]['desistencias'] += 1
+                self._cond.notify_all()
+                raise TimeoutError(f"fila do banco ({name}) excedeu {self.max_wait[name]}s")
+            self._running[name] += 1
+        shared, lease = self.shared.get(name), None
+        try:
+            if shared is not None:
+                lease = shared.acquire(self.max_wait[name] - (time.monotonic() - started))
+                if lease is None:
+                    with self._cond:
+                        self._stats[name]['desistencias'] += 1
+                    raise TimeoutError(f"vagas de {name} ocupadas em outros processos por mais de {self.max_wait[name]}s")
+            waited = time.monotonic() - started
+            with self._cond:
+                stats = self._stats[name]
+                stats['executadas'] += 1
+                stats['espera_total_s'] += waited
+                stats['espera_max_s'] = max(stats['espera_max_s'], waited)
+            yield
+        finally:
+            if lease is not None:
+                shared.release(lease)
+            with self._cond:
+                self._running[name] -= 1
+                self._cond.notify_all()
+
+    def metrics(self):
+        """Profundidade das filas, consultas em execução e esperas por classe
+
+        Classes compartilhadas trazem também as vagas ocupadas em todos os processos.
+        """
+        with self._cond:
+            metrics = {
+                name: dict(self._stats[name],
+                           na_fila=self._waiting[name],
+                           executando=self._running[name],
+                           limite=self.limits[name],
+                           espera_media_s=round(self._stats[name]['espera_total_s'] / self._stats[name]['executadas'], 4)
+                           if self._stats[name]['executadas'] else 0.0)
+                for name in PRIORITY_CLASSES
+            }
+        for name, shared in self.shared.items():
+            metrics[name]['vagas_em_uso_todos_processos'] = shared.in_use()
+        return metrics
+
+scheduler = QueryScheduler()
+
+class ReplicaRouter:
+    """Escolhe o servidor de cada consulta conforme a classe e o atraso das réplicas
+
+    O atraso é medido no máximo a cada `check_seconds`; réplicas fora do ar,
+    que não estão em recuperação, sem receptor de WAL transmitindo ou com
+    atraso acima de `max_lag` ficam de fora até a próxima medição, e sem
+    réplica disponível tudo vai ao primário.
+    """
+
+    def __init__(self, replicas=READ_REPLICAS, max_lag=REPLICA_MAX_LAG_SECONDS,
+                 check_seconds=REPLICA_CHECK_SECONDS):
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self.lags = {replica: None for replica in self.replicas}
+        self._checked_at = None
+
+    def measure_lag(self, replica):
+        """Atraso da réplica em segundos (None se inacessível, não for réplica ou sem replicação ativa)"""
+        try:
+            with get_engine(replica).connect() as conn:
+                with conn.begin():
+                    conn.exec_driver_sql("SELECT set_config('statement_timeout', '2000', true)")
+                    lag = conn.exec_driver_sql(REPLICA_LAG_QUERY).scalar()
+            return None if lag is None else float(lag)
+        except Exception as e:
+            print(f"Réplica {replica} indisponível: {e}")
+            return None
+
+    def _refresh_lags(self):
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_seconds:
+            return
+        with self._lock:
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_seconds:
+                return
+            self.lags = {replica: self.measure_lag(replica) for replica in self.replicas}
+            self._checked_at = time.monotonic()
+
+    def choose(self, query_class_name):
+        """'primary' ou a réplica com menor atraso aceitável"""
+        if not self.replicas or query_class_name in PRIMARY_QUERY_CLASSES:
+            return PRIMARY
+        self._refresh_lags()
+        candidates = [(lag, replica) for replica, lag in self.lags.items()
+                      if lag is not None and lag <= self.max_lag]
+        return min(candidates)[1] if candidates else PRIMARY
+
+    def mark_down(self, replica):
+        """Tira a réplica da rotação até a próxima medição"""
+        with self._lock:
+            self.lags[replica] = None
+
+    def status(self):
+        return {replica: lag for replica, lag in self.lags.items()}
+
+router = ReplicaRouter()
+
+class CircuitBreaker:
+    """Disjuntor do banco: após `failure_threshold` falhas seguidas de conexão ou
+    timeout, abre por `reset_seconds` e as consultas não chegam ao PostgreSQL.
+    Depois disso uma única consulta de teste decide se volta a fechar.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened_at >= self.reset_seconds else 'open'
+
+    def allow(self):
+        """A consulta pode ir ao banco? (no estado meio-aberto, só uma por vez)"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                print("✅ Banco respondendo novamente - disjuntor fechado")
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def release_probe(self):
+        """Libera a consulta de teste que não chegou ao banco"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    print(f"⚡ {self.failures} falhas seguidas no banco - disjuntor aberto por {self.reset_seconds}s")
+                self.opened_at = time.monotonic()
+
+breaker = CircuitBreaker()
+
+class LastGoodResults:
+    """Último resultado bem-sucedido de cada consulta (LRU limitado em memória)
+
+    Limitado em número de consultas e em bytes (memory_usage profundo de cada
+    DataFrame); um resultado maior que o limite inteiro não é guardado.
+    """
+
+    def __init__(self, max_entries=LAST_GOOD_MAX_ENTRIES, max_bytes=LAST_GOOD_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+        self._bytes = 0
+
+    def set(self, key, df):
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            previous = self._results.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            if size > self.max_bytes:
+                return
+            self._results[key] = (df, time.time(), size)
+            self._bytes += size
+            while len(self._results) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._results.popitem(last=False)
+                self._bytes -= evicted
+
+    def __len__(self):
+        return len(self._results)
+
+    @property
+    def total_bytes(self):
+        return self._bytes
+
+    def get(self, key):
+        """(DataFrame, idade em segundos) ou None"""
+        with self._lock:
+            entry = self._results.get(key)
+        if entry is None:
+            return None
+        df, stored_at, _ = entry
+        return df, time.time() - stored_at
+
+last_good = LastGoodResults()
+
+# Revalidações em segundo plano (no máximo uma por consulta)
+_revalidator = ThreadPoolExecutor(max_workers=2, thread_name_prefix='dstech-revalidate')
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+def format_age(seconds):
+    """Idade legível de um resultado em cache"""
+    if seconds < 60:
+        return f"{int(seconds)}s"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min"
+    return f"{seconds / 3600:.1f} h"
+
+def mark_stale_outputs(result, age_seconds):
+    """Sinaliza nas figuras retornadas por um callback que os dados são antigos"""
+    note = dict(text=f"⚠️ Banco indisponível - dados de {format_age(age_seconds)} atrás",
+                xref="paper", yref="paper", x=1, y=1.12, xanchor="right", showarrow=False,
+                font=dict(size=11, color="#e67e22"))
+    if isinstance(result, (tuple, list)):
+        return type(result)(mark_stale_outputs(item, age_seconds) for item in result)
+    if hasattr(result, 'add_annotation'):
+        return result.add_annotation(**note)
+    if isinstance(result, dict) and 'data' in result and 'layout' in result:
+        layout = dict(result['layout'])
+        layout['annotations'] = list(layout.get('annotations', [])) + [note]
+        return dict(result, layout=layout)
+    return result
+
+def _triggered_by():
+    """Id do componente que disparou o callback atual (None fora de callbacks)"""
+    try:
+        return callback_context.triggered_id
+    except Exception:
+        return None
+
+def cancel_superseded(func=None, *, query_class_name=DEFAULT_QUERY_CLASS):
+    """Decorador de callbacks: consultas com timeout da classe e cancelamento
+    das execuções antigas do mesmo callback na mesma aba do navegador
+
+    Usado abaixo de `@callback`, que declara `State(TAB_ID_STORE, 'data')` por
+    último: o decorador consome esse argumento (a função não o recebe). Sem id
+    da aba não há cancelamento. Um resultado de execução substituída é
+    descartado com PreventUpdate (o pedido mais novo atualiza a saída). Se
+    alguma consulta do callback foi atendida pelo último resultado bom (banco
+    indisponível), as figuras retornadas recebem o aviso com a idade dos dados.
+    """
+    if func is None:
+        return functools.partial(cancel_superseded, query_class_name=query_class_name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        *args, tab_id = args
+        scope = (tab_id, func.__name__)
+        token = generations.begin(scope) if tab_id else None
+        previous = (getattr(_local, 'generation', None), getattr(_local, 'stale_age', None),
+                    getattr(_local, 'tab_id', None), getattr(_local, 'query_failed', False),
+                    getattr(_local, 'after_fresh', None))
+        _local.generation = (scope, token) if tab_id else None
+        _local.stale_age = None
+        _local.tab_id = tab_id
+        _local.query_failed = False
+        _local.after_fresh = []
+        priority = 'periodic' if _triggered_by() in PERIODIC_TRIGGERS else 'interactive'
+        try:
+            with query_class(query_class_name), db_priority(priority):
+                result = func(*args, **kwargs)
+            if tab_id and generations.is_stale(scope, token):
+                raise PreventUpdate
+            if _local.stale_age is not None:
+                result = mark_stale_outputs(result, _local.stale_age)
+            elif not _local.query_failed:
+                for function in _local.after_fresh:
+                    function()
+            return result
+        finally:
+            if tab_id:
+                generations.end(scope, token)
+            (_local.generation, _local.stale_age, _local.tab_id, _local.query_failed,
+             _local.after_fresh) = previous
+    return wrapper
+
+def is_database_failure(error):
+    """Falhas de conexão/timeout (contam para o disjuntor; erros de SQL não)"""
+    from sqlalchemy import exc as sa_exc
+    return isinstance(error, (sa_exc.OperationalError, sa_exc.InterfaceError, sa_exc.TimeoutError))
+
+def _run_on(endpoint, query, params, timeout, generation=None):
+    with get_engine(endpoint).connect() as conn:
+        with conn.begin():
+            conn.exec_driver_sql("SELECT set_config('statement_timeout', %s, true)", (str(timeout),))
+            if generation:
+                with generations.running(*generation, conn.connection.dbapi_connection):
+                    return pd.read_sql_query(query, conn, params=params)
+            return pd.read_sql_query(query, conn, params=params)
+
+def _run_query(query, params, class_name, generation=None):
+    """Executa no servidor escolhido pelo roteador (réplica com falha: repete no primário)"""
+    timeout = STATEMENT_TIMEOUTS[class_name]
+    endpoint = router.choose(class_name)
+    with scheduler.slot(current_priority()):
+        if endpoint != PRIMARY:
+            try:
+                return _run_on(endpoint, query, params, timeout, generation)
+            except Exception as e:
+                from psycopg2.errors import QueryCanceled
+                # Timeout/cancelamento não se repete no primário: só falhas da réplica
+                if (not is_database_failure(e) or isinstance(getattr(e, 'orig', None), QueryCanceled)
+                        or (generation and generations.is_stale(*generation))):
+                    raise
+                print(f"Réplica {endpoint} falhou ({e}); repetindo no primário")
+                router.mark_down(endpoint)
+        return _run_on(PRIMARY, query, params, timeout, generation)
+
+def _revalidate(key, query, params, class_name):
+    """Tenta atualizar em segundo plano o último resultado bom de uma consulta"""
+    try:
+        if breaker.allow():
+            try:
+                df = _run_query(query, params, class_name)
+            except TimeoutError:
+                breaker.release_probe()
+            except Exception as e:
+                if is_database_failure(e):
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                print(f"Erro ao revalidar query: {e}")
+            else:
+                breaker.record_success()
+                last_good.set(key, df)
+    finally:
+        with _revalidating_lock:
+            _revalidating.discard(key)
+
+def _serve_stale(key, query, params, class_name):
+    """Último resultado bom (marcado com a idade) e agenda a revalidação"""
+    _local.query_failed = True
+    with _revalidating_lock:
+        if key not in _revalidating:
+            _revalidating.add(key)
+            _revalidator.submit(_revalidate, key, query, params, class_name)
+
+    cached = last_good.get(key)
+    if cached is None:
+        return pd.DataFrame()
+    df, age = cached
+    df = df.copy()
+    df.attrs['stale_age_seconds'] = age
+    if getattr(_local, 'stale_age', None) is None or age > _local.stale_age:
+        _local.stale_age = age
+    return df
+
+def execute_query(query, params=None):
+    """Executa query e retorna DataFrame usando SQLAlchemy
+
+    Com o banco lento ou fora do ar (disjuntor aberto ou falha de conexão),
+    devolve o último resultado bom da mesma consulta com
+    `attrs['stale_age_seconds']` e tenta atualizá-lo em segundo plano.
+    """
+    generation = getattr(_local, 'generation', None)
+    if generation and generations.is_stale(*generation):
+        # Pedido já substituído: nem inicia a consulta
+        raise PreventUpdate
+
+    class_name = getattr(_local, 'query_class', None) or DEFAULT_QUERY_CLASS
+    key = (query, repr(sorted(params.items())) if isinstance(params, dict) else repr(params))
+    if not breaker.allow():
+        return _serve_stale(key, query, params, class_name)
+
+    try:
+        df = _run_query(query, params, class_name, generation)
+    except TimeoutError as e:
+        # Fila do agendador cheia: o banco não falhou, só há trabalho demais
+        print(f"Erro na query: {e}")
+        breaker.release_probe()
+        return _serve_stale(key, query, params, class_name)
+    except Exception as e:
+        if generation and generations.is_stale(*generation):
+            breaker.record_success()
+            raise PreventUpdate
+        print(f"Erro na query: {e}")
+        _local.query_failed = True
+        if not is_database_failure(e):
+            breaker.record_success()
+            return pd.DataFrame()
+        breaker.record_failure()
+        return _serve_stale(key, query, params, class_name)
+
+    breaker.record_success()
+    last_good.set(key, df)
+    return df
+
+def close_connections():
+    """Fecha as conexões de todos os pools (no processo mestre, antes de criar os workers)"""
+    with _engine_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+# Engines herdadas em um fork: ficam referenciadas e sem uso, porque fechar as
+# conexões (ou deixar o coletor de lixo fechá-las) encerraria as do processo pai
+_inherited_engines = []
+
+def reset_after_fork():
+    """Recria no processo filho o estado por processo: pools, travas, fila e disjuntor
+
+    Roda após qualquer fork (workers do gunicorn, processos dos callbacks em
+    segundo plano): cada processo abre as próprias conexões e nenhuma trava
+    fica presa por uma thread que só existia no pai. Os últimos resultados
+    bons herdados são mantidos.
+    """
+    global _engine_lock, _local, _revalidator, _revalidating_lock
+    _inherited_engines.extend(_engines.values())
+    _engines.clear()
+    _engine_lock = threading.Lock()
+    _local = threading.local()
+    generations.__init__()
+    scheduler.__init__()
+    router.__init__()
+    breaker.__init__()
+    last_good._lock = threading.Lock()
+    _revalidator = ThreadPoolExecutor(max_workers=2, thread_name_prefix='dstech-revalidate')
+    _revalidating.clear()
+    _revalidating_lock = threading.Lock()
+
+os.register_at_fork(after_in_child=reset_after_fork)
+
+def register_db_routes(server):
+    """Registra /api/db-status (filas do agendador, disjuntor, últimos resultados bons e
+    atraso das réplicas) no servidor Flask"""
+    from flask import jsonify
+
+    @server.route('/api/db-status')
+    def db_status():
+        return jsonify({'agendador': scheduler.metrics(),
+                        'disjuntor': {'estado': breaker.state, 'falhas': breaker.failures},
+                        'ultimos_resultados': {'consultas': len(last_good), 'mb': round(last_good.total_bytes / 2**20, 1)},
+                        'replicas': router.status()})
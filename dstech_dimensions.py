@@ -0,0 +1,109 @@
+"""
+DSTech Dashboard - Tabelas de Dimensão em Memória
+Nomes de clientes e programas mantidos em cache no processo.
+
+As consultas de fatos agrupam pelo id bruto de Rel_Carga e os rótulos são
+aplicados aqui, sem JOIN com clientes/programas a cada chamada. O cache é
+recarregado a cada DIMENSION_REFRESH_SECONDS ou quando o monitor de novos
+dados (dstech_push) acusa mudança nas tabelas de dimensão.
+"""
+
+import os
+import threading
+import time
+
+from dstech_charts import execute_query
+from dstech_push import notifier
+
+# Intervalo máximo entre recargas das dimensões (segundos)
+DIMENSION_REFRESH_SECONDS = int(os.getenv('DSTECH_DIMENSION_REFRESH_SECONDS', '600'))
+
+# Consulta e rótulo padrão (para ids sem cadastro) de cada dimensão
+DIMENSIONS = {
+    'clientes': ("SELECT client_id AS id, client_name AS name FROM clientes", "Cliente {}"),
+    'programas': ("SELECT program_id AS id, program_name AS name FROM programas", "Programa {}")
+}
+
+def _normalize_id(value):
+    """Ids de Rel_Carga chegam como texto ou double; o cadastro usa inteiros"""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return value
+
+class DimensionCache:
+    """Mapeia id → nome de clientes e programas, recarregando quando necessário"""
+
+    def __init__(self, query_source=execute_query, refresh_seconds=DIMENSION_REFRESH_SECONDS,
+                 change_notifier=notifier):
+        self.query_source = query_source
+        self.refresh_seconds = refresh_seconds
+        self.change_notifier = change_notifier
+        self._lock = threading.Lock()
+        self._names = {}
+        self._loaded_at = None
+        self._seen_versions = {}
+
+    def reset_after_fork(self):
+        """Trava nova no processo filho; os nomes herdados continuam válidos"""
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Recarrega todas as dimensões
+
+        Consulta vazia (banco fora do ar, erro na query) mantém os nomes já
+        carregados daquela dimensão em vez de trocá-los pelos rótulos padrão.
+        """
+        names = dict(self._names)
+        for table, (query, _) in DIMENSIONS.items():
+            df = self.query_source(query)
+            if df.empty or not {'id', 'name'} <= set(df.columns):
+                print(f"Dimensão {table} não recarregada; mantendo {len(names.get(table, {}))} nomes")
+                continue
+            names[table] = {_normalize_id(key): value for key, value in zip(df['id'], df['name'])}
+        with self._lock:
+            self._names = names
+            self._loaded_at = time.monotonic()
+            self._seen_versions = self._dimension_versions()
+
+    def _dimension_versions(self):
+        versions = self.change_notifier.dataset_versions if self.change_notifier else {}
+        return {table: versions.get(table, 0) for table in DIMENSIONS}
+
+    def _current(self):
+        """Nomes atuais, recarregando se expirados ou alterados no banco"""
+        expired = self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds
+        if expired or self._dimension_versions() != self._seen_versions:
+            self.refresh()
+        return self._names
+
+    def names(self, table):
+        """Dicionário id → nome da dimensão"""
+        return self._current().get(table, {})
+
+    def labels(self, table, ids):
+        """Rótulos para uma sequência de ids (ids sem cadastro recebem nome padrão)"""
+        names = self.names(table)
+        default = DIMENSIONS[table][1]
+        return [names.get(_normalize_id(value)) or default.format(_normalize_id(value)) for value in ids]
+
+    def client_labels(self, ids):
+        return self.labels('clientes', ids)
+
+    def program_labels(self, ids):
+        return self.labels('programas', ids)
+
+    def client_options(self, ids=()):
+        """Opções de dropdown de clientes ('Todos' primeiro, depois por nome)
+
+        `ids` acrescenta clientes presentes nos dados mas ausentes do cadastro.
+        """
+        client_ids = list(set(self.names('clientes')) | {_normalize_id(value) for value in ids})
+        clients = sorted(zip(client_ids, self.client_labels(client_ids)), key=lambda item: str(item[1]))
+        return [{'label': '🏢 Todos', 'value': 'all'}] + [
+            {'label': f"🏪 {name}", 'value': str(client_id)} for client_id, name in clients
+        ]
+
+# Instância compartilhada pelo processo
+dimensions = DimensionCache()
+os.register_at_fork(after_in_child=dimensions.reset_after_fork)
@@ -0,0 +1,223 @@
+"""
+DSTech Dashboard - Índice de KPIs por Somas Acumuladas
+Somas acumuladas (prefix sums) por dia de Rel_Diario para KPIs de qualquer período.
+
+Os dias fechados ficam em arrays acumulados; o dia corrente é mantido como
+soma parcial separada e reconsultado no máximo a cada KPI_REFRESH_SECONDS.
+Na virada do dia os últimos KPI_RECHECK_CLOSED_DAYS dias fechados também são
+reconsultados, recebendo linhas gravadas com atraso.
+O total de um período é a diferença entre duas posições dos arrays (mais a
+parcial de hoje, se o período incluir hoje), independentemente da extensão.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from dstech_charts import execute_query, format_number_abbreviated
+from dstech_db import query_class
+
+# Idade máxima da parcial do dia corrente (segundos)
+KPI_REFRESH_SECONDS = int(os.getenv('DSTECH_KPI_REFRESH_SECONDS', '30'))
+
+# Dias fechados reconsultados a cada virada do dia (linhas que chegam atrasadas)
+KPI_RECHECK_CLOSED_DAYS = int(os.getenv('DSTECH_KPI_RECHECK_DAYS', '1'))
+
+# Métricas acumuladas, na ordem das colunas da consulta
+KPI_METRICS = ['kg', 'ciclos', 'agua_litros', 'quimicos_kg', 'tempo_producao', 'tempo_parado',
+               'soma_eficiencia', 'n_eficiencia']
+
+# Agregado diário de Rel_Diario com os mesmos filtros de get_operational_kpis:
+# produção/consumos de ciclos com "C4" > 0 e eficiência média dos ciclos com
+# "C1" > 0 (guardada como soma das razões + contagem para somar entre dias)
+KPI_DAILY_QUERY = """
+SELECT
+    DATE("Time_Stamp") AS dia,
+    COALESCE(SUM("C4") FILTER (WHERE "C4" > 0), 0) AS kg,
+    COUNT(*) FILTER (WHERE "C4" > 0) AS ciclos,
+    COALESCE(SUM("C2" * 1000) FILTER (WHERE "C4" > 0), 0) AS agua_litros,
+    COALESCE(SUM("C3") FILTER (WHERE "C4" > 0), 0) AS quimicos_kg,
+    COALESCE(SUM("C1") FILTER (WHERE "C4" > 0), 0) AS tempo_producao,
+    COALESCE(SUM("C0") FILTER (WHERE "C4" > 0), 0) AS tempo_parado,
+    COALESCE(SUM("C1" / ("C1" + "C0")) FILTER (WHERE "C1" > 0 AND "C0" >= 0), 0) AS soma_eficiencia,
+    COUNT(*) FILTER (WHERE "C1" > 0 AND "C0" >= 0) AS n_eficiencia
+FROM "Rel_Diario"
+WHERE "Time_Stamp" >= %(start)s AND "Time_Stamp" < %(end)s
+GROUP BY DATE("Time_Stamp")
+"""
+
+ACTIVE_ALARMS_QUERY = """
+SELECT COUNT(*) as alarmes_ativos
+FROM "ALARMHISTORY"
+WHERE "Al_Norm_Time" IS NULL
+  AND "Al_Start_Time" >= CURRENT_DATE - INTERVAL '1 day'
+"""
+
+# Início do histórico carregado na primeira montagem
+HISTORY_START = datetime(2000, 1, 1)
+
+def _to_day(value):
+    """Converte str/datetime/date em date"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value.date() if isinstance(value, datetime) else value
+
+class KpiIndex:
+    """Somas acumuladas por dia das métricas de Rel_Diario
+
+    `cumulative[m][i]` é a soma da métrica m nos dias fechados anteriores a
+    `first_day + i`; `today` guarda a parcial do dia corrente.
+    """
+
+    def __init__(self, query_source=execute_query, refresh_seconds=KPI_REFRESH_SECONDS):
+        self.query_source = query_source
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._state = None
+        self._refreshed_at = None
+
+    def reset_after_fork(self):
+        """Após um fork, recria a trava (a do pai pode ter sido copiada travada)"""
+        self._lock = threading.Lock()
+
+    def _fetch(self, start, end):
+        """Matriz (dias × métricas) do agregado diário entre `start` e `end` (exclusivo)
+
+        LookupError quando a consulta falha: execute_query devolve então um
+        DataFrame sem colunas, enquanto um período sem produção traz as colunas
+        e nenhuma linha.
+        """
+        with query_class('analytics'):
+            df = self.query_source(KPI_DAILY_QUERY, {'start': start, 'end': end})
+        if not set(['dia'] + KPI_METRICS) <= set(df.columns):
+            raise LookupError(f"agregado diário de {start:%Y-%m-%d} a {end:%Y-%m-%d} indisponível")
+        if df.empty:
+            return [], np.zeros((0, len(KPI_METRICS)))
+        days = [_to_day(day) for day in df['dia']]
+        return days, df[KPI_METRICS].to_numpy(dtype=float)
+
+    def _is_fresh(self):
+        return self._refreshed_at is not None and time.monotonic() - self._refreshed_at <= self.refresh_seconds
+
+    def refresh(self, force=False):
+        """Acrescenta os dias fechados desde a última carga e reconsulta a parcial de hoje
+
+        Quem esperou a trava enquanto outra thread recarregava não repete as
+        consultas (a menos que `force`). Se alguma consulta falhar, o índice
+        fica como estava: dias fechados só entram com os valores do banco, e
+        sem nenhuma carga bem-sucedida continua sem estado (a próxima chamada
+        tenta de novo).
+        """
+        with self._lock:
+            if not force and self._is_fresh():
+                return
+            try:
+                self._state = self._build_state(self._state)
+            except LookupError as e:
+                print(f"Índice de KPIs não atualizado: {e}")
+                return
+            self._refreshed_at = time.monotonic()
+
+    def _build_state(self, state):
+        """Novo estado a partir do anterior (None: todo o histórico)"""
+        today = datetime.now().date()
+        today_start = datetime.combine(today, datetime.min.time())
+        # Sem histórico carregado (primeira carga ou falha na anterior): recarregar tudo
+        if state is not None and len(state['cumulative']) == 1:
+            state = None
+
+        if state is None or state['open_day'] != today:
+            # Fechar os dias pendentes (todo o histórico na primeira carga) e
+            # refazer os últimos dias fechados, que podem ter recebido linhas atrasadas
+            if state is None:
+                start = HISTORY_START
+            else:
+                first_day = state['first_day']
+                cumulative = state['cumulative'][:max(len(state['cumulative']) - KPI_RECHECK_CLOSED_DAYS, 1)]
+                start = datetime.combine(first_day + timedelta(days=len(cumulative) - 1), datetime.min.time())
+            days, values = self._fetch(start, today_start)
+            if state is None:
+                first_day = min(days) if days else today
+                cumulative = np.zeros((1, len(KPI_METRICS)))
+
+            # Vetor diário contínuo dos dias novos; depois somas acumuladas
+            next_day = first_day + timedelta(days=len(cumulative) - 1)
+            n_new = (today - next_day).days
+            daily = np.zeros((max(n_new, 0), len(KPI_METRICS)))
+            for day, row in zip(days, values):
+                position = (day - next_day).days
+                if 0 <= position < n_new:
+                    daily[position] += row
+            cumulative = np.vstack([cumulative, cumulative[-1] + np.cumsum(daily, axis=0)])
+        else:
+            first_day, cumulative = state['first_day'], state['cumulative']
+
+        _, partial = self._fetch(today_start, today_start + timedelta(days=1))
+        alarms = self.query_source(ACTIVE_ALARMS_QUERY)
+        if 'alarmes_ativos' in alarms.columns and not alarms.empty:
+            active_alarms = int(alarms.iloc[0]['alarmes_ativos'])
+        else:
+            active_alarms = state['alarmes_ativos'] if state is not None else 0
+
+        return {
+            'first_day': first_day,
+            'open_day': today,
+            'cumulative': cumulative,
+            'today': partial.sum(axis=0) if len(partial) else np.zeros(len(KPI_METRICS)),
+            'alarmes_ativos': active_alarms
+        }
+
+    def _current(self):
+        """Estado atual; LookupError se o índice nunca pôde ser carregado"""
+        if not self._is_fresh():
+            self.refresh()
+        state = self._state
+        if state is None:
+            raise LookupError("índice de KPIs indisponível")
+        return state
+
+    def totals(self, start_date, end_date):
+        """Somas das métricas no período [start_date, end_date] (dias inteiros)"""
+        state = self._current()
+        start_day, end_day = _to_day(start_date), _to_day(end_date)
+        cumulative = state['cumulative']
+
+        # Posições nos arrays acumulados, limitadas aos dias fechados
+        closed_days = len(cumulative) - 1
+        lo = min(max((start_day - state['first_day']).days, 0), closed_days)
+        hi = min(max((end_day - state['first_day']).days + 1, 0), closed_days)
+        values = cumulative[max(hi, lo)] - cumulative[lo]
+        if start_day <= state['open_day'] <= end_day:
+            values = values + state['today']
+        return dict(zip(KPI_METRICS, values))
+
+    def kpis(self, start_date, end_date):
+        """KPIs do período no mesmo formato de get_operational_kpis"""
+        totals = self.totals(start_date, end_date)
+        kg, cycles = totals['kg'], int(totals['ciclos'])
+        efficiency = totals['soma_eficiencia'] / totals['n_eficiencia'] * 100 if totals['n_eficiencia'] else 0
+        water_per_kg = totals['agua_litros'] / kg if kg > 0 else 0
+        chemicals_per_kg = totals['quimicos_kg'] / kg if kg > 0 else 0
+
+        return {
+            'quilos_lavados_hoje': format_number_abbreviated(kg),
+            'quilos_lavados_hoje_raw': round(kg, 0),
+            'ciclos_hoje': cycles,
+            'quilos_lavados_semana': format_number_abbreviated(kg),
+            'quilos_lavados_semana_raw': round(kg, 0),
+            'ciclos_semana': cycles,
+            'litros_agua_hoje': format_number_abbreviated(totals['agua_litros']),
+            'litros_agua_hoje_raw': round(totals['agua_litros'], 0),
+            'litros_por_kg_hoje': round(water_per_kg, 2),
+            'kg_quimicos_hoje': round(totals['quimicos_kg'], 2),
+            'kg_quimicos_por_kg_hoje': round(chemicals_per_kg, 3),
+            'eficiencia_media': round(efficiency, 1),
+            'alarmes_ativos': self._state['alarmes_ativos']
+        }
+
+# Instância compartilhada pelo processo
+kpi_index = KpiIndex()
+os.register_at_fork(after_in_child=kpi_index.reset_after_fork)
@@ -0,0 +1,286 @@
+"""
+DSTech Dashboard - Notificação de Novos Dados
+Detecta novas linhas no PostgreSQL (marca d'água ou LISTEN/NOTIFY) e avisa
+os navegadores conectados via Server-Sent Events
+
+Cada tabela tem a sua cadência de verificação, ajustada ao ritmo observado
+de chegada de dados: tabelas que recebem linhas a cada poucos segundos são
+verificadas com frequência; tabelas paradas recuam até POLL_MAX_SECONDS.
+"""
+
+import json
+import os
+import select
+import threading
+import time
+
+from flask import Response, jsonify, stream_with_context
+
+from dstech_charts import execute_query, get_db_connection
+
+# Intervalo inicial entre verificações de marca d'água de cada tabela (segundos)
+POLL_SECONDS = int(os.getenv('DSTECH_PUSH_POLL_SECONDS', '15'))
+
+# Cadência adaptativa: cada tabela é verificada na metade do intervalo médio
+# observado entre chegadas de dados, dentro destes limites; sem novidade, o
+# intervalo cresce por POLL_BACKOFF até o máximo
+POLL_MIN_SECONDS = int(os.getenv('DSTECH_PUSH_MIN_SECONDS', '5'))
+POLL_MAX_SECONDS = int(os.getenv('DSTECH_PUSH_MAX_SECONDS', '600'))
+POLL_BACKOFF = 1.5
+
+# Peso da chegada mais recente na média móvel do intervalo entre chegadas
+ARRIVAL_SMOOTHING = 0.3
+
+# Intervalo de keep-alive do stream SSE (segundos)
+KEEPALIVE_SECONDS = 25
+
+# Streams SSE simultâneos por processo (0 = sem limite). Cada stream ocupa uma
+# thread do servidor enquanto a aba estiver aberta; acima do limite a conexão
+# recebe 503 e o navegador tenta de novo depois de SSE_BUSY_RETRY_SECONDS,
+# deixando as demais threads livres para os callbacks.
+SSE_MAX_STREAMS = int(os.getenv('DSTECH_SSE_MAX_STREAMS', '0'))
+SSE_BUSY_RETRY_SECONDS = 30
+
+# Canal opcional do PostgreSQL para LISTEN/NOTIFY (payload = nome da tabela)
+NOTIFY_CHANNEL = os.getenv('DSTECH_NOTIFY_CHANNEL')
+
+# Tabelas monitoradas e expressão usada como marca d'água. Em ALARMHISTORY a
+# normalização de um alarme atualiza a linha existente, por isso também
+# consideramos "Al_Norm_Time". As dimensões (sem coluna de data) usam um hash
+# do cadastro, que muda em inclusões e renomeações.
+WATCHED_TABLES = {
+    'Rel_Diario': 'MAX("Time_Stamp")',
+    'Rel_Quimico': 'MAX("Time_Stamp")',
+    'Rel_Carga': 'MAX("Time_Stamp")',
+    'TREND001': 'MAX("Time_Stamp")',
+    'ALARMHISTORY': 'GREATEST(MAX("Al_Start_Time"), MAX("Al_Norm_Time"))',
+    'clientes': "md5(string_agg(client_id || '=' || client_name, ',' ORDER BY client_id))",
+    'programas': "md5(string_agg(program_id || '=' || program_name, ',' ORDER BY program_id))"
+}
+
+def fetch_watermarks(tables=None):
+    """Busca a marca d'água das tabelas informadas (todas por padrão) em uma única consulta"""
+    tables = list(tables or WATCHED_TABLES)
+    columns = ",\n        ".join(
+        f'(SELECT {WATCHED_TABLES[table]} FROM "{table}") AS "{table}"'
+        for table in tables
+    )
+    df = execute_query(f"SELECT\n        {columns}")
+    if df.empty:
+        return {}
+    return {table: str(df.iloc[0][table]) for table in tables}
+
+class DataChangeNotifier:
+    """Detecta novas linhas e acorda os streams SSE inscritos
+
+    Cada tabela guarda a versão em que mudou pela última vez; um cliente que
+    viu a versão N recebe apenas as tabelas alteradas depois dela. A fonte das
+    marcas d'água é injetável e `publish()` pode ser chamado diretamente, o que
+    permite usar um notificador falso em processo sem PostgreSQL.
+    """
+
+    def __init__(self, watermark_source=fetch_watermarks, poll_seconds=POLL_SECONDS,
+                 channel=NOTIFY_CHANNEL, tables=WATCHED_TABLES,
+                 min_seconds=POLL_MIN_SECONDS, max_seconds=POLL_MAX_SECONDS):
+        self.watermark_source = watermark_source
+        self.poll_seconds = poll_seconds
+        self.channel = channel
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.version = 0
+        self.dataset_versions = {}
+        self.watermarks = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._listen_conn = None
+        self._inherited_connections = []
+
+        # Cadência por tabela: intervalo atual, próxima verificação,
+        # intervalo médio entre chegadas e momento da última chegada
+        now = time.monotonic()
+        self.check_intervals = {table: float(poll_seconds) for table in tables}
+        self.next_check = {table: now for table in tables}
+        self.arrival_intervals = {table: None for table in tables}
+        self.last_arrival = {table: None for table in tables}
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Inicia a thread de monitoramento (idempotente)"""
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='dstech-push', daemon=True)
+            self._thread.start()
+
+    def reset_after_fork(self):
+        """No processo filho a thread de monitoramento não existe e a conexão LISTEN é do pai"""
+        self._cond = threading.Condition()
+        self._thread = None
+        if self._listen_conn is not None:
+            # Não fechar: o fechamento encerraria a conexão do processo pai
+            self._inherited_connections.append(self._listen_conn)
+            self._listen_conn = None
+
+    def publish(self, datasets):
+        """Registra novas linhas nas tabelas informadas e acorda os inscritos"""
+        datasets = [dataset for dataset in datasets if dataset]
+        if not datasets:
+            return
+        with self._cond:
+            self.version += 1
+            for dataset in datasets:
+                self.dataset_versions[dataset] = self.version
+            self._cond.notify_all()
+
+    def changes_since(self, version):
+        """Tabelas alteradas depois da versão informada"""
+        return sorted(dataset for dataset, changed in self.dataset_versions.items()
+                      if changed > version)
+
+    def wait_for_change(self, version, timeout):
+        """Bloqueia até haver versão mais nova que `version` ou até o timeout
+
+        Retorna (versão atual, tabelas alteradas) ou None no timeout.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > version, timeout=timeout)
+            if self.version <= version:
+                return None
+            return self.version, self.changes_since(version)
+
+    def record_arrivals(self, tables, checked=()):
+        """Atualiza a cadência: tabelas com dados novos encurtam o intervalo
+        (metade do intervalo médio entre chegadas); as verificadas sem
+        novidade recuam por POLL_BACKOFF
+        """
+        now = time.monotonic()
+        for table in checked:
+            if table not in tables:
+                self.check_intervals[table] = min(self.check_intervals[table] * POLL_BACKOFF, self.max_seconds)
+                self.next_check[table] = now + self.check_intervals[table]
+        for table in tables:
+            if table not in self.check_intervals:
+                continue
+            last = self.last_arrival[table]
+            if last is not None:
+                gap = now - last
+                average = self.arrival_intervals[table]
+                self.arrival_intervals[table] = gap if average is None else (
+                    ARRIVAL_SMOOTHING * gap + (1 - ARRIVAL_SMOOTHING) * average)
+                self.check_intervals[table] = min(max(self.arrival_intervals[table] / 2, self.min_seconds),
+                                                  self.max_seconds)
+            self.last_arrival[table] = now
+            self.next_check[table] = now + self.check_intervals[table]
+
+    def due_tables(self):
+        """Tabelas cuja próxima verificação já venceu"""
+        now = time.monotonic()
+        return [table for table, due in self.next_check.items() if due <= now]
+
+    def seconds_until_due(self):
+        return max(min(self.next_check.values()) - time.monotonic(), 0) if self.next_check else self.poll_seconds
+
+    def check_watermarks(self, tables=None):
+        """Compara as marcas d'água atuais (das tabelas informadas ou das
+        vencidas) com as anteriores e publica as mudanças
+        """
+        tables = self.due_tables() if tables is None else list(tables)
+        if not tables:
+            return []
+        current = self.watermark_source(tables)
+        if not current:
+            return []
+        changed = [table for table, mark in current.items()
+                   if table in self.watermarks and mark != self.watermarks[table]]
+        self.watermarks.update(current)
+        self.record_arrivals(changed, checked=current)
+        self.publish(changed)
+        return changed
+
+    def cadence(self):
+        """Intervalo atual de verificação e intervalo médio entre chegadas por tabela (segundos)"""
+        return {table: {'verificacao_s': round(self.check_intervals[table], 1),
+                        'chegadas_s': round(self.arrival_intervals[table], 1)
+                        if self.arrival_intervals[table] is not None else None}
+                for table in self.check_intervals}
+
+    def _listen(self, timeout):
+        """Aguarda NOTIFY no canal configurado; retorna as tabelas notificadas"""
+        if self._listen_conn is None:
+            self._listen_conn = get_db_connection()
+            self._listen_conn.autocommit = True
+            with self._listen_conn.cursor() as cursor:
+                cursor.execute(f'LISTEN "{self.channel}"')
+
+        notified = []
+        if select.select([self._listen_conn], [], [], timeout) != ([], [], []):
+            self._listen_conn.poll()
+            while self._listen_conn.notifies:
+                notified.append(self._listen_conn.notifies.pop(0).payload)
+        return notified
+
+    def _run(self):
+        while True:
+            try:
+                # Dorme até a próxima tabela vencer (ou até um NOTIFY)
+                wait = self.seconds_until_due()
+                if self.channel:
+                    notified = self._listen(wait)
+                    self.publish(notified)
+                    # Tabelas notificadas: conferir a marca d'água já (registra a chegada)
+                    for table in notified:
+                        if table in self.next_check:
+                            self.next_check[table] = 0
+                else:
+                    time.sleep(wait)
+                self.check_watermarks()
+            except Exception as e:
+                print(f"Erro no monitoramento de novos dados: {e}")
+                if self._listen_conn is not None:
+                    try:
+                        self._listen_conn.close()
+                    except Exception:
+                        pass
+                    self._listen_conn = None
+                time.sleep(self.poll_seconds)
+
+# Instância compartilhada pelo processo
+notifier = DataChangeNotifier()
+os.register_at_fork(after_in_child=notifier.reset_after_fork)
+
+def register_push_routes(server, change_notifier=notifier, max_streams=SSE_MAX_STREAMS):
+    """Registra o endpoint SSE /stream/updates e /api/refresh-cadence no servidor Flask do Dash"""
+    streams = threading.BoundedSemaphore(max_streams) if max_streams > 0 else None
+
+    @server.route('/stream/updates')
+    def stream_updates():
+        if streams is not None and not streams.acquire(blocking=False):
+            return Response(f"retry: {SSE_BUSY_RETRY_SECONDS * 1000}\n\n", status=503,
+                            mimetype='text/event-stream',
+                            headers={'Retry-After': str(SSE_BUSY_RETRY_SECONDS), 'Cache-Control': 'no-cache'})
+        change_notifier.start()
+
+        def events():
+            version = change_notifier.version
+            yield "retry: 5000\n\n"
+            while True:
+                change = change_notifier.wait_for_change(version, KEEPALIVE_SECONDS)
+                if change is None:
+                    yield ": keepalive\n\n"
+                    continue
+                version, datasets = change
+                yield f"data: {json.dumps({'version': version, 'datasets': datasets})}\n\n"
+
+        response = Response(stream_with_context(events()), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        if streams is not None:
+            # Libera a vaga quando a conexão fecha (mesmo se o stream nem começou)
+            response.call_on_close(streams.release)
+        return response
+
+    @server.route('/api/refresh-cadence')
+    def refresh_cadence():
+        return jsonify(change_notifier.cadence())
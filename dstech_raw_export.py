@@ -0,0 +1,243 @@
+"""
+DSTech Dashboard - Exportação de Dados Brutos
+Exporta linhas de Rel_Diario, Rel_Quimico, Rel_Carga e ALARMHISTORY em
+streaming (cursor no servidor + escrita incremental), com memória constante
+independentemente do tamanho do período
+"""
+
+import csv
+import io
+import os
+import tempfile
+import uuid
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+
+from flask import Response, request, session, stream_with_context
+
+from dstech_db import PRIMARY, STATEMENT_TIMEOUTS, get_engine, router, scheduler
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet é opcional
+    pa = None
+    pq = None
+
+# Tabelas disponíveis e coluna de data usada no filtro de período
+RAW_EXPORT_TABLES = {
+    'Rel_Diario': 'Time_Stamp',
+    'Rel_Quimico': 'Time_Stamp',
+    'Rel_Carga': 'Time_Stamp',
+    'ALARMHISTORY': 'Al_Start_Time'
+}
+
+RAW_EXPORT_FORMATS = ['csv', 'xlsx', 'parquet']
+
+# Chave da sessão Flask (cookie assinado) gravada no login do dashboard
+LOGIN_SESSION_KEY = 'usuario'
+
+# Linhas buscadas do cursor por vez
+CHUNK_SIZE = int(os.getenv('DSTECH_EXPORT_CHUNK_SIZE', '5000'))
+
+# Tamanho dos blocos enviados ao navegador ao transmitir arquivos temporários
+FILE_CHUNK_BYTES = 256 * 1024
+
+def export_connection():
+    """Conexão DBAPI do pool do servidor que o roteador escolhe para exportações
+
+    Com réplicas configuradas a exportação lê de uma delas; se a réplica não
+    aceitar a conexão, sai da rotação e a exportação usa o primário.
+    """
+    endpoint = router.choose('export')
+    try:
+        return get_engine(endpoint).raw_connection()
+    except Exception as e:
+        if endpoint == PRIMARY:
+            raise
+        print(f"Réplica {endpoint} falhou ({e}); exportando do primário")
+        router.mark_down(endpoint)
+        return get_engine(PRIMARY).raw_connection()
+
+def iter_raw_rows(table, start_date, end_date, chunk_size=CHUNK_SIZE):
+    """Itera (colunas, linhas) de uma tabela em blocos usando cursor nomeado no servidor
+
+    A primeira tupla gerada traz os nomes das colunas; as seguintes, listas de
+    até `chunk_size` linhas. A conexão volta ao pool ao fim (ou se o consumidor
+    abandonar o gerador). A vaga de exportação no agendador é ocupada por
+    quem chama (o endpoint), antes de responder.
+    """
+    import psycopg2.extensions
+    from psycopg2 import sql
+    time_column = RAW_EXPORT_TABLES[table]
+    query = sql.SQL("SELECT * FROM {table} WHERE {col} >= %s AND {col} < %s ORDER BY {col}").format(
+        table=sql.Identifier(table), col=sql.Identifier(time_column)
+    )
+
+    conn = export_connection()
+    try:
+        # Timeout só desta transação (a do cursor nomeado): a conexão é do pool
+        with conn.cursor() as setup:
+            setup.execute("SELECT set_config('statement_timeout', %s, true)", (str(STATEMENT_TIMEOUTS['export']),))
+        cursor = conn.cursor(name=f"dstech_export_{uuid.uuid4().hex}",
+                             cursor_factory=psycopg2.extensions.cursor)
+        cursor.itersize = chunk_size
+        cursor.execute(query, (start_date, end_date))
+
+        rows = cursor.fetchmany(chunk_size)
+        yield [column.name for column in cursor.description]
+        while rows:
+            yield rows
+            rows = cursor.fetchmany(chunk_size)
+        cursor.close()
+    finally:
+        conn.close()
+
+def _excel_value(value):
+    """openpyxl não aceita datetimes com fuso horário"""
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.replace(tzinfo=None)
+    return value
+
+def stream_csv(table, start_date, end_date):
+    """Gera o CSV de uma tabela em blocos de texto"""
+    rows_iter = iter_raw_rows(table, start_date, end_date)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=';')
+
+    writer.writerow(next(rows_iter))
+    for rows in rows_iter:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def write_xlsx(tables, start_date, end_date, path):
+    """Grava as tabelas (uma aba cada) em modo write-only do openpyxl"""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    for table in tables:
+        sheet = workbook.create_sheet(title=table)
+        rows_iter = iter_raw_rows(table, start_date, end_date)
+        sheet.append(next(rows_iter))
+        for rows in rows_iter:
+            for row in rows:
+                sheet.append([_excel_value(value) for value in row])
+    workbook.save(path)
+
+def write_parquet(table, start_date, end_date, path):
+    """Grava a tabela em Parquet, um row group por bloco do cursor"""
+    rows_iter = iter_raw_rows(table, start_date, end_date)
+    columns = next(rows_iter)
+    writer = None
+    try:
+        for rows in rows_iter:
+            batch = pa.Table.from_pylist([dict(zip(columns, row)) for row in rows])
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema)
+            writer.write_table(batch.cast(writer.schema))
+        if writer is None:
+            pq.write_table(pa.table({column: [] for column in columns}), path)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def stream_file(path):
+    """Transmite um arquivo temporário em blocos e o remove ao final"""
+    try:
+        with open(path, 'rb') as handle:
+            while True:
+                chunk = handle.read(FILE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
+
+def release_after(chunks, slot):
+    """Transmite os blocos e libera a vaga (ExitStack) ao terminar ou falhar"""
+    try:
+        yield from chunks
+    finally:
+        slot.close()
+
+def parse_export_period(start, end):
+    """Converte as datas da URL (AAAA-MM-DD) em intervalo [início, fim + 1 dia)
+
+    ValueError para datas inválidas ou início depois do fim.
+    """
+    end_day = datetime.fromisoformat(end[:10]) if end else datetime.now()
+    start_day = datetime.fromisoformat(start[:10]) if start else end_day - timedelta(days=7)
+    end_date = end_day.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    if start_day >= end_date:
+        raise ValueError("início depois do fim")
+    return start_day, end_date
+
+def register_raw_export_routes(server):
+    """Registra o endpoint /export/raw no servidor Flask do Dash
+
+    Parâmetros: tables (lista separada por vírgula), start, end (AAAA-MM-DD)
+    e format (csv, xlsx ou parquet). CSV e Parquet aceitam uma tabela por vez.
+    Exige a sessão do login; a vaga de exportação do agendador é ocupada
+    antes de responder (503 com a fila cheia) e liberada ao fim da transmissão.
+    """
+
+    @server.route('/export/raw')
+    def export_raw():
+        if not session.get(LOGIN_SESSION_KEY):
+            return Response("Login necessário", status=401)
+
+        tables = [table for table in request.args.get('tables', '').split(',') if table]
+        export_format = request.args.get('format', 'csv')
+
+        if not tables or any(table not in RAW_EXPORT_TABLES for table in tables):
+            return Response("Tabela inválida", status=400)
+        if export_format not in RAW_EXPORT_FORMATS:
+            return Response("Formato inválido", status=400)
+        if export_format != 'xlsx' and len(tables) > 1:
+            return Response("CSV e Parquet exportam uma tabela por vez", status=400)
+        if export_format == 'parquet' and pa is None:
+            return Response("Exportação Parquet requer o pacote pyarrow", status=501)
+
+        try:
+            start_date, end_date = parse_export_period(request.args.get('start'), request.args.get('end'))
+        except ValueError:
+            return Response("Período inválido (use AAAA-MM-DD)", status=400)
+        period = f"{start_date:%Y%m%d}_{(end_date - timedelta(days=1)):%Y%m%d}"
+        name = tables[0] if len(tables) == 1 else 'dados_brutos'
+        filename = f"{name}_{period}.{export_format}"
+        headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+
+        # Vaga de exportação no agendador: exportações longas não disputam com os gráficos
+        slot = ExitStack()
+        try:
+            slot.enter_context(scheduler.slot('export'))
+        except TimeoutError as e:
+            print(f"Exportação de dados brutos recusada: {e}")
+            return Response("Muitas exportações em andamento; tente novamente em instantes", status=503,
+                            headers={'Retry-After': '60'})
+
+        if export_format == 'csv':
+            response = Response(stream_with_context(release_after(stream_csv(tables[0], start_date, end_date), slot)),
+                                mimetype='text/csv', headers=headers)
+            # Também ao fechar a resposta: o gerador pode nem ter começado
+            response.call_on_close(slot.close)
+            return response
+
+        handle, path = tempfile.mkstemp(suffix=f".{export_format}")
+        os.close(handle)
+        try:
+            with slot:
+                if export_format == 'xlsx':
+                    write_xlsx(tables, start_date, end_date, path)
+                    mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                else:
+                    write_parquet(tables[0], start_date, end_date, path)
+                    mimetype = 'application/octet-stream'
+        except Exception as e:
+            os.remove(path)
+            print(f"Erro na exportação de dados brutos: {e}")
+            return Response("Erro ao exportar dados", status=500)
+
+        return Response(stream_file(path), mimetype=mimetype, headers=headers)
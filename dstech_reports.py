@@ -0,0 +1,676 @@
+"""
+DSTech Dashboard - Módulo de Relatórios
+Geração do relatório executivo e dos arquivos exportados (TXT, Excel, HTML e PDF)
+"""
+
+import base64
+import hashlib
+import io
+import os
+from datetime import datetime, timedelta
+
+import diskcache
+import numpy as np
+import pandas as pd
+
+from dstech_charts import (
+    execute_query, create_efficiency_chart, create_water_consumption_chart,
+    create_chemical_consumption_chart
+)
+from dstech_db import query_class_at_least
+
+# Diretório dos caches em disco (jobs em segundo plano e relatórios gerados)
+CACHE_DIR = os.getenv('DSTECH_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
+
+# Relatórios exportados ficam em cache; períodos que incluem hoje expiram rápido
+REPORT_CACHE = diskcache.Cache(os.path.join(CACHE_DIR, 'reports'))
+OPEN_PERIOD_TTL = 5 * 60
+CLOSED_PERIOD_TTL = 7 * 24 * 60 * 60
+
+# Imagens dos gráficos do PDF, rasterizadas uma vez por (gráfico, período)
+CHART_CACHE_DIR = os.path.join(CACHE_DIR, 'charts')
+
+# Gráficos incluídos no relatório PDF
+REPORT_CHARTS = [
+    ('eficiencia', "Eficiência Operacional", create_efficiency_chart),
+    ('agua', "Consumo de Água por Kg", create_water_consumption_chart),
+    ('quimicos', "Consumo de Químicos por Kg", create_chemical_consumption_chart)
+]
+
+# Agregados diários de produção, consumos e alarmes em uma única consulta.
+# Somas e contagens são aditivas, então qualquer período é obtido somando dias.
+DAILY_AGGREGATES_QUERY = """
+WITH producao AS (
+    SELECT
+        DATE("Time_Stamp") AS dia,
+        SUM("C4") AS kg,
+        COUNT(*) AS ciclos,
+        SUM("C2" * 1000) AS agua_litros,
+        SUM("C3") AS quimicos_kg,
+        SUM("C1") AS tempo_producao,
+        SUM("C0") AS tempo_parado
+    FROM "Rel_Diario"
+    WHERE "Time_Stamp" >= %(start)s AND "Time_Stamp" < %(end)s
+      AND "C4" > 0
+    GROUP BY DATE("Time_Stamp")
+),
+alarmes AS (
+    SELECT
+        DATE("Al_Start_Time") AS dia,
+        COUNT(*) AS alarmes,
+        COUNT(*) FILTER (WHERE "Al_Priority" = 1) AS alarmes_criticos,
+        COUNT(*) FILTER (WHERE "Al_Priority" = 2) AS alarmes_altos,
+        COUNT(*) FILTER (WHERE "Al_Norm_Time" IS NULL) AS alarmes_ativos,
+        COUNT("Al_Norm_Time") AS alarmes_resolvidos,
+        SUM(EXTRACT(EPOCH FROM ("Al_Norm_Time" - "Al_Start_Time")) / 60) AS minutos_resolucao
+    FROM "ALARMHISTORY"
+    WHERE "Al_Start_Time" >= %(start)s AND "Al_Start_Time" < %(end)s
+    GROUP BY DATE("Al_Start_Time")
+)
+SELECT
+    COALESCE(p.dia, a.dia) AS dia,
+    COALESCE(p.kg, 0) AS kg,
+    COALESCE(p.ciclos, 0) AS ciclos,
+    COALESCE(p.agua_litros, 0) AS agua_litros,
+    COALESCE(p.quimicos_kg, 0) AS quimicos_kg,
+    COALESCE(p.tempo_producao, 0) AS tempo_producao,
+    COALESCE(p.tempo_parado, 0) AS tempo_parado,
+    COALESCE(a.alarmes, 0) AS alarmes,
+    COALESCE(a.alarmes_criticos, 0) AS alarmes_criticos,
+    COALESCE(a.alarmes_altos, 0) AS alarmes_altos,
+    COALESCE(a.alarmes_ativos, 0) AS alarmes_ativos,
+    COALESCE(a.alarmes_resolvidos, 0) AS alarmes_resolvidos,
+    COALESCE(a.minutos_resolucao, 0) AS minutos_resolucao
+FROM producao p
+FULL OUTER JOIN alarmes a ON p.dia = a.dia
+ORDER BY dia
+"""
+
+DAILY_AGGREGATE_COLUMNS = [
+    'kg', 'ciclos', 'agua_litros', 'quimicos_kg', 'tempo_producao', 'tempo_parado',
+    'alarmes', 'alarmes_criticos', 'alarmes_altos', 'alarmes_ativos',
+    'alarmes_resolvidos', 'minutos_resolucao'
+]
+
+def day_range(start_date=None, end_date=None, default_days=7):
+    """Normaliza o período para dias inteiros: (primeiro dia, último dia) como date"""
+    def to_day(value):
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return value.date() if isinstance(value, datetime) else value
+
+    end_day = to_day(end_date) or datetime.now().date()
+    start_day = to_day(start_date) or end_day - timedelta(days=default_days)
+    return start_day, end_day
+
+def get_daily_aggregates(start_day, end_day):
+    """Agregados por dia do período [start_day, end_day] (DataFrame indexado por dia)
+
+    Dias sem produção nem alarmes não aparecem no resultado. Roda como
+    'analytics', ou na classe de quem chamou se for mais longa ('export').
+    """
+    with query_class_at_least('analytics'):
+        df = execute_query(DAILY_AGGREGATES_QUERY, {
+            'start': datetime.combine(start_day, datetime.min.time()),
+            'end': datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+        })
+    if df.empty:
+        return pd.DataFrame(columns=DAILY_AGGREGATE_COLUMNS, index=pd.DatetimeIndex([], name='dia'))
+    df['dia'] = pd.to_datetime(df['dia'])
+    return df.set_index('dia')[DAILY_AGGREGATE_COLUMNS].astype(float)
+
+def get_daily_series(start_day, end_day):
+    """Série diária contínua do período como arrays NumPy (dias sem dados = 0)
+
+    Retorna dict com 'dias' (datetime64[D]), 'kg', 'agua_litros', 'quimicos_kg',
+    'alarmes', 'tempo_producao', 'tempo_parado' e 'eficiencia' (% por dia,
+    NaN nos dias sem tempo registrado).
+    """
+    days = np.arange(np.datetime64(start_day, 'D'), np.datetime64(end_day, 'D') + 1)
+    daily = get_daily_aggregates(start_day, end_day).reindex(pd.DatetimeIndex(days), fill_value=0)
+
+    series = {'dias': days}
+    for column in ('kg', 'agua_litros', 'quimicos_kg', 'alarmes', 'tempo_producao', 'tempo_parado'):
+        series[column] = daily[column].to_numpy(dtype=float)
+
+    total_time = series['tempo_producao'] + series['tempo_parado']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        series['eficiencia'] = np.where(total_time > 0, series['tempo_producao'] / total_time * 100, np.nan)
+    return series
+
+def _report_recommendations(efficiency, water_per_kg, critical_alarms, avg_resolution):
+    """Recomendações a partir dos indicadores do período"""
+    recommendations = []
+    if efficiency and efficiency < 85:
+        recommendations.append(f"Eficiência de {efficiency:.1f}% abaixo da meta de 85%: revisar paradas de máquina")
+    if water_per_kg and not 12 <= water_per_kg <= 18:
+        recommendations.append(f"Consumo de água de {water_per_kg:.1f} L/kg fora da faixa ideal de 12-18 L/kg")
+    if critical_alarms:
+        recommendations.append(f"Investigar {critical_alarms} alarme(s) crítico(s) registrados no período")
+    if avg_resolution and avg_resolution > 30:
+        recommendations.append(f"Tempo médio de resolução de {avg_resolution:.0f} min: reforçar resposta a alarmes")
+    if not recommendations:
+        recommendations.append("Indicadores dentro das metas no período; manter rotina de monitoramento")
+    recommendations.append("Revisar consumo de químicos por kg para possível otimização")
+    return recommendations
+
+def generate_executive_report(start_date=None, end_date=None):
+    """Gera o relatório executivo do período a partir dos agregados diários
+
+    O período é alinhado a dias inteiros e o resultado fica em cache: períodos
+    fechados são calculados uma única vez; os que incluem hoje expiram em
+    OPEN_PERIOD_TTL.
+    """
+    start_day, end_day = day_range(start_date, end_date)
+    cache_key = f"executive|{start_day}|{end_day}"
+    cached = REPORT_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    daily = get_daily_aggregates(start_day, end_day)
+    totals = daily.sum()
+    days_diff = (end_day - start_day).days + 1
+
+    production = totals['kg']
+    cycles = int(totals['ciclos'])
+    total_time = totals['tempo_producao'] + totals['tempo_parado']
+    efficiency = totals['tempo_producao'] / total_time * 100 if total_time > 0 else 0
+    water_per_kg = totals['agua_litros'] / production if production > 0 else 0
+    chemicals_per_kg = totals['quimicos_kg'] / production if production > 0 else 0
+    avg_resolution = (totals['minutos_resolucao'] / totals['alarmes_resolvidos']
+                      if totals['alarmes_resolvidos'] > 0 else 0)
+
+    report = {
+        'timestamp': datetime.now().strftime('%d/%m/%Y %H:%M'),
+        'period_days': days_diff,
+        'production_summary': {
+            'period_production': f"{production:,.0f}",
+            'period_cycles': cycles,
+            'daily_avg': f"{production / days_diff:,.0f}",
+            'efficiency': f"{efficiency:.1f}%"
+        },
+        'consumption_summary': {
+            'water_period': f"{totals['agua_litros']:,.0f}",
+            'water_per_kg': f"{water_per_kg:.1f}L/kg",
+            'chemicals_period': f"{totals['quimicos_kg']:,.1f} kg",
+            'chemicals_per_kg': f"{chemicals_per_kg:.3f} kg/kg"
+        },
+        'alarms_summary': {
+            'period_alarms': int(totals['alarmes']),
+            'active_alarms': int(totals['alarmes_ativos']),
+            'critical_high': f"{int(totals['alarmes_criticos'])}/{int(totals['alarmes_altos'])}",
+            'avg_resolution': f"{avg_resolution:.0f} min"
+        },
+        'recommendations': _report_recommendations(
+            efficiency, water_per_kg, int(totals['alarmes_criticos']), avg_resolution
+        )
+    }
+
+    # Resultado vazio pode ser falha de conexão: não fixar no cache
+    if not daily.empty:
+        closed = end_day < datetime.now().date()
+        REPORT_CACHE.set(cache_key, report, expire=CLOSED_PERIOD_TTL if closed else OPEN_PERIOD_TTL)
+    return report
+
+def get_chemical_details():
+    """Obtém detalhes dos químicos utilizados da tabela Rel_Quimico"""
+    query = """
+    SELECT 
+        'Químico Q1 (Detergente Principal)' as tipo_quimico,
+        SUM("Q1") as quantidade_total,
+        COUNT(*) as registros,
+        AVG("Q1") as media_por_registro
+    FROM "Rel_Quimico" 
+    WHERE "Time_Stamp" >= CURRENT_DATE - INTERVAL '7 days'
+      AND "Q1" > 0
+    
+    UNION ALL
+    
+    SELECT 
+        'Químico Q2 (Detergente Secundário)' as tipo_quimico,
+        SUM("Q2") as quantidade_total,
+        COUNT(*) as registros,
+        AVG("Q2") as media_por_registro
+    FROM "Rel_Quimico" 
+    WHERE "Time_Stamp" >= CURRENT_DATE - INTERVAL '7 days'
+      AND "Q2" > 0
+    
+    UNION ALL
+    
+    SELECT 
+        'Químico Q3 (Alvejante)' as tipo_quimico,
+        SUM("Q3") as quantidade_total,
+        COUNT(*) as registros,
+        AVG("Q3") as media_por_registro
+    FROM "Rel_Quimico" 
+    WHERE "Time_Stamp" >= CURRENT_DATE - INTERVAL '7 days'
+      AND "Q3" > 0
+    
+    UNION ALL
+    
+    SELECT 
+        'Químico Q4 (Amaciante)' as tipo_quimico,
+        SUM("Q4") as quantidade_total,
+        COUNT(*) as registros,
+        AVG("Q4") as media_por_registro
+    FROM "Rel_Quimico" 
+    WHERE "Time_Stamp" >= CURRENT_DATE - INTERVAL '7 days'
+      AND "Q4" > 0
+    
+    UNION ALL
+    
+    SELECT 
+        'Químico Q5 (Neutralizante)' as tipo_quimico,
+        SUM("Q5") as quantidade_total,
+        COUNT(*) as registros,
+        AVG("Q5") as media_por_registro
+    FROM "Rel_Quimico" 
+    WHERE "Time_Stamp" >= CURRENT_DATE - INTERVAL '7 days'
+      AND "Q5" > 0
+    
+    ORDER BY quantidade_total DESC
+    """
+    
+    try:
+        df = execute_query(query)
+        if df.empty:
+            return []
+        
+        # Converter para formato esperado pelos relatórios
+        result = []
+        for _, row in df.iterrows():
+            result.append({
+                'tipo_quimico': row['tipo_quimico'],
+                'quantidade_kg': row['quantidade_total'] / 1000,  # Converter para kg se necessário
+                'ciclos_utilizados': row['registros'],
+                'media_por_ciclo': row['media_por_registro'] / 1000 if row['media_por_registro'] else 0
+            })
+        
+        return result
+    except Exception as e:
+        print(f"Erro ao obter detalhes dos químicos: {e}")
+        return []
+
+def resolve_report_period(period_days, start_date=None, end_date=None):
+    """Converte a seleção de período do relatório em (início, fim)"""
+    if period_days == 'custom':
+        # Usar datas do date-picker
+        start_dt = datetime.fromisoformat(start_date) if start_date else datetime.now() - timedelta(days=7)
+        end_dt = datetime.fromisoformat(end_date) if end_date else datetime.now()
+    else:
+        # Usar período selecionado
+        end_dt = datetime.now()
+        start_dt = end_dt - timedelta(days=period_days)
+    return start_dt, end_dt
+
+def _build_txt_report(report, chemical_details, period_days, start_dt, end_dt, timestamp):
+    # Criar conteúdo do relatório em texto
+    report_content = f"""# RELATÓRIO EXECUTIVO - DSTECH LAVANDERIA
+Gerado em: {report['timestamp']}
+Período: {start_dt.strftime('%d/%m/%Y')} a {end_dt.strftime('%d/%m/%Y')}
+
+## RESUMO DE PRODUÇÃO
+- Produção no Período: {report['production_summary']['period_production']} kg ({report['production_summary']['period_cycles']} ciclos)
+- Média Diária: {report['production_summary']['daily_avg']} kg/dia
+- Eficiência Média: {report['production_summary']['efficiency']}
+
+## RESUMO DE CONSUMOS
+- Água no Período: {report['consumption_summary']['water_period']} L ({report['consumption_summary']['water_per_kg']})
+- Químicos no Período: {report['consumption_summary']['chemicals_period']} ({report['consumption_summary']['chemicals_per_kg']})
+
+## DETALHAMENTO DE QUÍMICOS (Últimos 7 dias)
+"""
+    for chem in chemical_details:
+        report_content += f"- {chem['tipo_quimico']}: {chem['quantidade_kg']:.1f} kg ({chem['ciclos_utilizados']} ciclos)\n"
+    
+    report_content += f"""
+
+## RESUMO DE ALARMES
+- Alarmes no Período: {report['alarms_summary']['period_alarms']}
+- Alarmes Ativos: {report['alarms_summary']['active_alarms']}
+- Críticos/Altos: {report['alarms_summary']['critical_high']}
+- Tempo Médio de Resolução: {report['alarms_summary']['avg_resolution']}
+
+## RECOMENDAÇÕES
+"""
+    for i, rec in enumerate(report['recommendations'], 1):
+        report_content += f"{i}. {rec}\n"
+    
+    filename = f"relatorio_executivo_{timestamp}.txt"
+    return dict(content=report_content, filename=filename)
+
+def _build_excel_report(report, chemical_details, period_days, start_dt, end_dt, timestamp):
+    # Criar Excel com múltiplas abas
+    output = io.BytesIO()
+    
+    # Dados de produção
+    prod_data = {
+        'Métrica': ['Produção no Período (kg)', 'Ciclos no Período', 'Média Diária (kg)', 'Eficiência Média'],
+        'Valor': [report['production_summary']['period_production'],
+                 report['production_summary']['period_cycles'],
+                 report['production_summary']['daily_avg'],
+                 report['production_summary']['efficiency']]
+    }
+    
+    # Dados de consumo
+    cons_data = {
+        'Métrica': ['Água no Período (L)', 'Água por Kg', 'Químicos no Período', 'Químicos por Kg'],
+        'Valor': [report['consumption_summary']['water_period'],
+                 report['consumption_summary']['water_per_kg'],
+                 report['consumption_summary']['chemicals_period'],
+                 report['consumption_summary']['chemicals_per_kg']]
+    }
+    
+    # Dados de químicos detalhados
+    if chemical_details:
+        chem_data = {
+            'Tipo de Químico': [chem['tipo_quimico'] for chem in chemical_details],
+            'Quantidade (kg)': [round(chem['quantidade_kg'], 2) for chem in chemical_details],
+            'Ciclos Utilizados': [chem['ciclos_utilizados'] for chem in chemical_details],
+            'Média por Ciclo (kg)': [round(chem['media_por_ciclo'], 3) for chem in chemical_details]
+        }
+    else:
+        chem_data = {'Tipo de Químico': ['Sem dados'], 'Quantidade (kg)': [0], 'Ciclos Utilizados': [0], 'Média por Ciclo (kg)': [0]}
+    
+    # Dados de alarmes
+    alarm_data = {
+        'Métrica': ['Alarmes no Período', 'Alarmes Ativos', 'Críticos/Altos', 'Tempo Médio Resolução'],
+        'Valor': [report['alarms_summary']['period_alarms'],
+                 report['alarms_summary']['active_alarms'],
+                 report['alarms_summary']['critical_high'],
+                 report['alarms_summary']['avg_resolution']]
+    }
+    
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        pd.DataFrame(prod_data).to_excel(writer, sheet_name='Produção', index=False)
+        pd.DataFrame(cons_data).to_excel(writer, sheet_name='Consumos', index=False)
+        pd.DataFrame(chem_data).to_excel(writer, sheet_name='Químicos', index=False)
+        pd.DataFrame(alarm_data).to_excel(writer, sheet_name='Alarmes', index=False)
+        pd.DataFrame({'Recomendações': report['recommendations']}).to_excel(writer, sheet_name='Recomendações', index=False)
+    
+    filename = f"relatorio_executivo_{timestamp}.xlsx"
+    return dict(content=base64.b64encode(output.getvalue()).decode(), filename=filename, base64=True)
+
+def _build_html_report(report, chemical_details, period_days, start_dt, end_dt, timestamp):
+    # Criar HTML com layout profissional para PDF
+    chemicals_html = ""
+    if chemical_details:
+        chemicals_html = "<h2 style='color: #2c3e50; border-bottom: 2px solid #3498db;'>DETALHAMENTO DE QUÍMICOS (Últimos 7 dias)</h2><table style='width: 100%; border-collapse: collapse; margin: 20px 0;'><tr style='background-color: #3498db; color: white;'><th style='padding: 10px; border: 1px solid #ddd;'>Tipo</th><th style='padding: 10px; border: 1px solid #ddd;'>Quantidade (kg)</th><th style='padding: 10px; border: 1px solid #ddd;'>Ciclos</th><th style='padding: 10px; border: 1px solid #ddd;'>Média/Ciclo</th></tr>"
+        for chem in chemical_details:
+            chemicals_html += f"<tr><td style='padding: 8px; border: 1px solid #ddd;'>{chem['tipo_quimico']}</td><td style='padding: 8px; border: 1px solid #ddd; text-align: right;'>{chem['quantidade_kg']:.1f}</td><td style='padding: 8px; border: 1px solid #ddd; text-align: center;'>{chem['ciclos_utilizados']}</td><td style='padding: 8px; border: 1px solid #ddd; text-align: right;'>{chem['media_por_ciclo']:.3f}</td></tr>"
+        chemicals_html += "</table>"
+    
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset='UTF-8'>
+        <title>Relatório Executivo - DSTech</title>
+        <style>
+            body {{ font-family: 'Segoe UI', Arial, sans-serif; margin: 40px; color: #2c3e50; line-height: 1.6; }}
+            .header {{ text-align: center; margin-bottom: 40px; padding: 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; border-radius: 10px; }}
+            .header h1 {{ margin: 0; font-size: 28px; font-weight: bold; }}
+            .header p {{ margin: 5px 0; font-size: 14px; opacity: 0.9; }}
+            .section {{ margin: 30px 0; padding: 20px; background: #f8f9fa; border-radius: 8px; border-left: 4px solid #3498db; }}
+            .section h2 {{ color: #2c3e50; margin-top: 0; border-bottom: 2px solid #3498db; padding-bottom: 10px; }}
+            .metrics {{ display: flex; flex-wrap: wrap; gap: 15px; margin: 20px 0; }}
+            .metric {{ background: white; padding: 15px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); flex: 1; min-width: 200px; }}
+            .metric-value {{ font-size: 24px; font-weight: bold; color: #3498db; }}
+            .metric-label {{ font-size: 12px; color: #7f8c8d; text-transform: uppercase; }}
+            ul {{ list-style-type: none; padding: 0; }}
+            li {{ background: white; margin: 8px 0; padding: 12px; border-radius: 5px; border-left: 3px solid #3498db; }}
+            .recommendations {{ background: #e8f5e8; border-left-color: #27ae60; }}
+            .recommendations li {{ border-left-color: #27ae60; }}
+            table {{ width: 100%; border-collapse: collapse; margin: 20px 0; background: white; }}
+            th {{ background: #3498db; color: white; padding: 12px; text-align: left; }}
+            td {{ padding: 10px; border-bottom: 1px solid #ecf0f1; }}
+            tr:nth-child(even) {{ background: #f8f9fa; }}
+            .footer {{ text-align: center; margin-top: 40px; padding: 20px; background: #34495e; color: white; border-radius: 8px; }}
+        </style>
+    </head>
+    <body>
+        <div class='header'>
+            <h1>🏢 RELATÓRIO EXECUTIVO - DSTECH LAVANDERIA</h1>
+            <p><strong>Gerado em:</strong> {report['timestamp']}</p>
+            <p><strong>Período de Análise:</strong> {start_dt.strftime('%d/%m/%Y')} a {end_dt.strftime('%d/%m/%Y')}</p>
+        </div>
+        
+        <div class='section'>
+            <h2>🏢 RESUMO DE PRODUÇÃO</h2>
+            <div class='metrics'>
+                <div class='metric'>
+                    <div class='metric-value'>{report['production_summary']['period_production']}</div>
+                    <div class='metric-label'>kg Produzidos no Período</div>
+                </div>
+                <div class='metric'>
+                    <div class='metric-value'>{report['production_summary']['period_cycles']}</div>
+                    <div class='metric-label'>Ciclos no Período</div>
+                </div>
+                <div class='metric'>
+                    <div class='metric-value'>{report['production_summary']['daily_avg']}</div>
+                    <div class='metric-label'>Média Diária (kg)</div>
+                </div>
+                <div class='metric'>
+                    <div class='metric-value'>{report['production_summary']['efficiency']}</div>
+                    <div class='metric-label'>Eficiência Média</div>
+                </div>
+            </div>
+        </div>
+        
+        <div class='section'>
+            <h2>💧 RESUMO DE CONSUMOS</h2>
+            <ul>
+                <li><strong>Água no Período:</strong> {report['consumption_summary']['water_period']} L ({report['consumption_summary']['water_per_kg']})</li>
+                <li><strong>Químicos no Período:</strong> {report['consumption_summary']['chemicals_period']} ({report['consumption_summary']['chemicals_per_kg']})</li>
+            </ul>
+        </div>
+        
+        {chemicals_html}
+        
+        <div class='section'>
+            <h2>🚨 RESUMO DE ALARMES</h2>
+            <div class='metrics'>
+                <div class='metric'>
+                    <div class='metric-value' style='color: #e74c3c;'>{report['alarms_summary']['active_alarms']}</div>
+                    <div class='metric-label'>Alarmes Ativos</div>
+                </div>
+                <div class='metric'>
+                    <div class='metric-value'>{report['alarms_summary']['period_alarms']}</div>
+                    <div class='metric-label'>Alarmes no Período</div>
+                </div>
+                <div class='metric'>
+                    <div class='metric-value'>{report['alarms_summary']['critical_high']}</div>
+                    <div class='metric-label'>Críticos/Altos</div>
+                </div>
+                <div class='metric'>
+                    <div class='metric-value'>{report['alarms_summary']['avg_resolution']}</div>
+                    <div class='metric-label'>Tempo Médio Resolução</div>
+                </div>
+            </div>
+        </div>
+        
+        <div class='section recommendations'>
+            <h2>💡 RECOMENDAÇÕES</h2>
+            <ul>
+                """ + '\n'.join([f"<li><strong>{i+1}.</strong> {rec}</li>" for i, rec in enumerate(report['recommendations'])]) + """
+            </ul>
+        </div>
+        
+        <div class='footer'>
+            <p>🔧 DSTech Industrial Dashboard | Relatório gerado automaticamente</p>
+            <p>Para mais informações, acesse o dashboard em tempo real</p>
+        </div>
+    </body>
+    </html>
+    """
+    
+    filename = f"relatorio_executivo_{timestamp}.html"
+    return dict(content=html_content, filename=filename)
+
+def rasterize_chart(name, builder, start_dt, end_dt):
+    """PNG de um gráfico do dashboard, em cache em disco por (gráfico, período)
+
+    Períodos fechados são reaproveitados indefinidamente; períodos que incluem
+    hoje são refeitos após OPEN_PERIOD_TTL. Retorna None se a rasterização
+    falhar (por exemplo, sem o kaleido instalado).
+    """
+    os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+    path = os.path.join(CHART_CACHE_DIR, f"{name}_{start_dt:%Y%m%d}_{end_dt:%Y%m%d}.png")
+    closed = end_dt.date() < datetime.now().date()
+
+    if os.path.exists(path) and (closed or datetime.now().timestamp() - os.path.getmtime(path) < OPEN_PERIOD_TTL):
+        return path
+
+    try:
+        fig = builder(start_dt.strftime('%Y-%m-%d'), end_dt.strftime('%Y-%m-%d 23:59:59'))
+        fig.update_layout(template='plotly_white', width=900, height=450)
+        image = fig.to_image(format='png', width=900, height=450)
+    except Exception as e:
+        print(f"Erro ao rasterizar gráfico {name}: {e}")
+        return None
+
+    # Escrita atômica: outro processo pode estar lendo a mesma imagem
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as handle:
+        handle.write(image)
+    os.replace(temp_path, path)
+    return path
+
+def _pdf_table(rows, col_widths, header_color='#3498db'):
+    """Tabela estilizada do relatório PDF (primeira linha = cabeçalho)"""
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+    table = Table(rows, colWidths=col_widths)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(header_color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dddddd')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
+    ]))
+    return table
+
+def _build_pdf_report(report, chemical_details, period_days, start_dt, end_dt, timestamp):
+    """Relatório executivo em PDF (reportlab) com os gráficos do dashboard"""
+    # reportlab só é carregado quando alguém exporta um PDF
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Image, PageBreak, Paragraph, SimpleDocTemplate, Spacer
+    styles = getSampleStyleSheet()
+    output = io.BytesIO()
+    doc = SimpleDocTemplate(output, pagesize=A4, leftMargin=2 * cm, rightMargin=2 * cm,
+                            topMargin=1.5 * cm, bottomMargin=1.5 * cm,
+                            title="Relatório Executivo - DSTech")
+    width = A4[0] - 4 * cm
+
+    production = report['production_summary']
+    consumption = report['consumption_summary']
+    alarms = report['alarms_summary']
+
+    story = [
+        Paragraph("RELATÓRIO EXECUTIVO - DSTECH LAVANDERIA", styles['Title']),
+        Paragraph(f"<b>Gerado em:</b> {report['timestamp']}", styles['Normal']),
+        Paragraph(f"<b>Período de Análise:</b> {start_dt.strftime('%d/%m/%Y')} a {end_dt.strftime('%d/%m/%Y')}",
+                  styles['Normal']),
+        Spacer(1, 0.6 * cm),
+
+        Paragraph("Resumo de Produção", styles['Heading2']),
+        _pdf_table([
+            ['Métrica', 'Valor'],
+            ['kg Produzidos no Período', production['period_production']],
+            ['Ciclos no Período', production['period_cycles']],
+            ['Média Diária (kg)', production['daily_avg']],
+            ['Eficiência Média', production['efficiency']]
+        ], [width * 0.6, width * 0.4]),
+
+        Paragraph("Resumo de Consumos", styles['Heading2']),
+        _pdf_table([
+            ['Métrica', 'Valor'],
+            ['Água no Período (L)', consumption['water_period']],
+            ['Água por Kg', consumption['water_per_kg']],
+            ['Químicos no Período', consumption['chemicals_period']],
+            ['Químicos por Kg', consumption['chemicals_per_kg']]
+        ], [width * 0.6, width * 0.4]),
+
+        Paragraph("Resumo de Alarmes", styles['Heading2']),
+        _pdf_table([
+            ['Métrica', 'Valor'],
+            ['Alarmes Ativos', alarms['active_alarms']],
+            ['Alarmes no Período', alarms['period_alarms']],
+            ['Críticos/Altos', alarms['critical_high']],
+            ['Tempo Médio Resolução', alarms['avg_resolution']]
+        ], [width * 0.6, width * 0.4], header_color='#e74c3c')
+    ]
+
+    if chemical_details:
+        story += [
+            Paragraph("Detalhamento de Químicos (Últimos 7 dias)", styles['Heading2']),
+            _pdf_table(
+                [['Tipo', 'Quantidade (kg)', 'Ciclos', 'Média/Ciclo']] +
+                [[chem['tipo_quimico'], f"{chem['quantidade_kg']:.1f}", chem['ciclos_utilizados'],
+                  f"{chem['media_por_ciclo']:.3f}"] for chem in chemical_details],
+                [width * 0.4, width * 0.2, width * 0.2, width * 0.2]
+            )
+        ]
+
+    story += [Paragraph("Recomendações", styles['Heading2'])]
+    story += [Paragraph(f"{i}. {rec}", styles['Normal']) for i, rec in enumerate(report['recommendations'], 1)]
+
+    # Gráficos (imagens em cache por período)
+    chart_images = [(title, rasterize_chart(name, builder, start_dt, end_dt))
+                    for name, title, builder in REPORT_CHARTS]
+    chart_images = [(title, path) for title, path in chart_images if path]
+    if chart_images:
+        story.append(PageBreak())
+        for title, path in chart_images:
+            story += [Paragraph(title, styles['Heading2']),
+                      Image(path, width=width, height=width / 2),
+                      Spacer(1, 0.4 * cm)]
+
+    doc.build(story)
+    filename = f"relatorio_executivo_{timestamp}.pdf"
+    return dict(content=base64.b64encode(output.getvalue()).decode(), filename=filename, base64=True)
+
+REPORT_BUILDERS = {
+    'txt': _build_txt_report,
+    'excel': _build_excel_report,
+    'html': _build_html_report,
+    'pdf': _build_pdf_report
+}
+
+def build_report_export(export_format, period_days, start_date=None, end_date=None, set_progress=None):
+    """Gera o arquivo do relatório executivo para o dcc.Download
+
+    Pensado para rodar em callback de segundo plano: `set_progress(valor, texto)`
+    é chamado a cada etapa e o resultado fica em cache em disco por período, de
+    modo que exportações repetidas do mesmo período não refazem o trabalho.
+    """
+    def progress(value, label):
+        if set_progress:
+            set_progress((value, label))
+
+    start_dt, end_dt = resolve_report_period(period_days, start_date, end_date)
+    closed = end_dt.date() < datetime.now().date()
+    cache_key = hashlib.sha1(
+        f"{export_format}|{period_days}|{start_dt.date()}|{end_dt.date()}".encode()
+    ).hexdigest()
+
+    cached = REPORT_CACHE.get(cache_key)
+    if cached is not None:
+        progress(100, "Relatório recuperado do cache")
+        return cached
+
+    progress(10, "Calculando indicadores...")
+    report = generate_executive_report(start_dt, end_dt)
+    progress(40, "Consultando químicos...")
+    chemical_details = get_chemical_details()
+    progress(70, "Gerando arquivo...")
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    result = REPORT_BUILDERS[export_format](report, chemical_details, period_days, start_dt, end_dt, timestamp)
+
+    REPORT_CACHE.set(cache_key, result, expire=CLOSED_PERIOD_TTL if closed else OPEN_PERIOD_TTL)
+    progress(100, "Relatório pronto")
+    return result
@@ -0,0 +1,247 @@
+"""
+DSTech Dashboard - Sketches de Quantis por Dia
+Distribuição de água/kg (P50, P90, P99) por dia e por cliente sem varrer linhas brutas.
+
+Cada dia (e cada cliente no dia) guarda um histograma em escala logarítmica
+(no estilo DDSketch): o quantil estimado tem erro relativo de no máximo
+SKETCH_RELATIVE_ERROR e sketches de dias diferentes se combinam somando as
+contagens. Dias fechados ficam no cache em disco e não são recalculados; o
+dia corrente é refeito no máximo a cada SKETCH_REFRESH_SECONDS.
+
+Os sketches são guardados esparsos: por métrica, o primeiro bucket ocupado e
+as contagens (uint32) até o último ocupado. Os valores de um cliente num dia
+ocupam poucos buckets vizinhos dos ~400 da faixa.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from dstech_charts import execute_query
+from dstech_db import query_class
+from dstech_reports import REPORT_CACHE, CLOSED_PERIOD_TTL
+
+# Erro relativo máximo dos quantis e faixa de valores representada
+SKETCH_RELATIVE_ERROR = 0.02
+SKETCH_MIN_VALUE = 1e-3
+SKETCH_MAX_VALUE = 1e4
+
+SKETCH_REFRESH_SECONDS = int(os.getenv('DSTECH_SKETCH_REFRESH_SECONDS', '60'))
+
+# Métricas com sketch, na ordem do eixo de métricas
+SKETCH_METRICS = ['agua_por_kg']
+
+# Valores por ciclo de Rel_Diario (mesmas fórmulas dos gráficos e KPIs)
+SKETCH_ROWS_QUERY = """
+SELECT
+    DATE("Time_Stamp") AS dia,
+    "C5" AS client_id,
+    ("C2" * 1000) / "C4" AS agua_por_kg
+FROM "Rel_Diario"
+WHERE "Time_Stamp" >= %(start)s AND "Time_Stamp" < %(end)s
+  AND "C4" > 0
+"""
+
+_GAMMA = (1 + SKETCH_RELATIVE_ERROR) / (1 - SKETCH_RELATIVE_ERROR)
+_LOG_GAMMA = np.log(_GAMMA)
+_MIN_INDEX = int(np.floor(np.log(SKETCH_MIN_VALUE) / _LOG_GAMMA))
+NUM_BUCKETS = int(np.ceil(np.log(SKETCH_MAX_VALUE) / _LOG_GAMMA)) - _MIN_INDEX + 1
+
+# Valor representativo de cada bucket (ponto de erro relativo mínimo)
+_BUCKET_VALUES = 2 * _GAMMA ** (np.arange(NUM_BUCKETS) + _MIN_INDEX) / (_GAMMA + 1)
+
+# Prefixo das chaves no cache em disco (muda com o formato dos sketches)
+SKETCH_CACHE_PREFIX = 'sketch-sparse'
+
+def bucket_index(values):
+    """Bucket de cada valor (valores fora da faixa vão para os buckets extremos)"""
+    values = np.clip(np.asarray(values, dtype=float), SKETCH_MIN_VALUE, SKETCH_MAX_VALUE)
+    return np.ceil(np.log(values) / _LOG_GAMMA).astype(int) - _MIN_INDEX
+
+def sketch_quantiles(counts, quantiles=(0.5, 0.9, 0.99)):
+    """Quantis de um sketch (ou soma de sketches); NaN se vazio
+
+    `counts` pode ter dimensões extras à esquerda: o último eixo são os buckets.
+    """
+    counts = np.asarray(counts)
+    cumulative = np.cumsum(counts, axis=-1)
+    total = cumulative[..., -1:]
+    ranks = np.asarray(quantiles) * np.maximum(total - 1, 0)
+    positions = np.stack([
+        (cumulative > ranks[..., [i]]).argmax(axis=-1) for i in range(len(quantiles))
+    ], axis=-1)
+    values = _BUCKET_VALUES[positions]
+    return np.where(total > 0, values, np.nan)
+
+def to_sparse(counts):
+    """Contagens densas (métricas × buckets) → [(primeiro bucket, contagens uint32)] por métrica"""
+    sparse = []
+    for row in counts:
+        occupied = np.flatnonzero(row)
+        if len(occupied) == 0:
+            sparse.append((0, np.zeros(0, dtype=np.uint32)))
+        else:
+            sparse.append((int(occupied[0]), row[occupied[0]:occupied[-1] + 1].astype(np.uint32)))
+    return sparse
+
+def to_dense(sparse_metric):
+    """(primeiro bucket, contagens) de uma métrica → vetor denso de NUM_BUCKETS"""
+    offset, values = sparse_metric
+    counts = np.zeros(NUM_BUCKETS, dtype=np.int64)
+    counts[offset:offset + len(values)] = values
+    return counts
+
+def build_sketches(df):
+    """Sketches por (dia, cliente) a partir das linhas de SKETCH_ROWS_QUERY
+
+    Retorna dict dia → {cliente: sketch esparso (ver to_sparse)}; a chave
+    'all' reúne todos os clientes do dia.
+    """
+    if df.empty:
+        return {}
+    df = df.dropna(subset=SKETCH_METRICS, how='all')
+    days = pd.to_datetime(df['dia']).dt.date.to_numpy()
+    clients = pd.to_numeric(df['client_id'], errors='coerce').fillna(-1).astype(int).to_numpy()
+
+    groups, group_keys = pd.factorize(pd.MultiIndex.from_arrays([days, clients]))
+    counts = np.zeros((len(group_keys), len(SKETCH_METRICS), NUM_BUCKETS), dtype=np.int64)
+    for m, metric in enumerate(SKETCH_METRICS):
+        values = pd.to_numeric(df[metric], errors='coerce').to_numpy()
+        valid = ~np.isnan(values)
+        np.add.at(counts, (groups[valid], m, bucket_index(values[valid])), 1)
+
+    sketches, day_totals = {}, {}
+    for (day, client), group_counts in zip(group_keys, counts):
+        sketches.setdefault(day, {})[client] = to_sparse(group_counts)
+        day_totals[day] = day_totals.get(day, 0) + group_counts
+    for day, total in day_totals.items():
+        sketches[day]['all'] = to_sparse(total)
+    return sketches
+
+class SketchStore:
+    """Sketches diários em memória, com dias fechados persistidos no cache em disco"""
+
+    def __init__(self, query_source=execute_query, cache=REPORT_CACHE,
+                 refresh_seconds=SKETCH_REFRESH_SECONDS):
+        self.query_source = query_source
+        self.cache = cache
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._days = {}
+        self._open_day = None
+        self._today_at = None
+
+    def reset_after_fork(self):
+        """Trava nova no processo filho; os sketches herdados são reaproveitados"""
+        self._lock = threading.Lock()
+
+    def _load(self, start_day, end_day):
+        """Calcula os sketches de [start_day, end_day] com uma consulta
+
+        LookupError quando a consulta falha (DataFrame sem colunas): dias sem
+        ciclos trazem as colunas e nenhuma linha.
+        """
+        with query_class('analytics'):
+            df = self.query_source(SKETCH_ROWS_QUERY, {
+                'start': datetime.combine(start_day, datetime.min.time()),
+                'end': datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+            })
+        if not set(['dia', 'client_id'] + SKETCH_METRICS) <= set(df.columns):
+            raise LookupError(f"ciclos de {start_day} a {end_day} indisponíveis")
+        sketches = build_sketches(df)
+        return {start_day + timedelta(days=i): sketches.get(start_day + timedelta(days=i), {})
+                for i in range((end_day - start_day).days + 1)}
+
+    def _ensure(self, start_day, end_day):
+        """Garante em memória os sketches de todos os dias do período
+
+        O dia corrente fica aberto: refeito a cada SKETCH_REFRESH_SECONDS e, após
+        a meia-noite, recarregado por inteiro e persistido como dia fechado.
+        """
+        today = datetime.now().date()
+        with self._lock:
+            if self._open_day is not None and self._open_day != today:
+                # O dia aberto fechou: o sketch em memória pode não ter os últimos ciclos
+                self._days.pop(self._open_day, None)
+                self._open_day = None
+                self._today_at = None
+
+            missing = [start_day + timedelta(days=i) for i in range((end_day - start_day).days + 1)
+                       if start_day + timedelta(days=i) not in self._days]
+
+            # Dias fechados já calculados por este ou outro processo
+            for day in [day for day in missing if day < today]:
+                cached = self.cache.get(f"{SKETCH_CACHE_PREFIX}|{day}")
+                if cached is not None:
+                    self._days[day] = cached
+            missing = [day for day in missing if day not in self._days]
+
+            # Dia corrente: refazer periodicamente
+            if start_day <= today <= end_day and today not in missing and (
+                    self._today_at is None or time.monotonic() - self._today_at > self.refresh_seconds):
+                missing.append(today)
+
+            if missing:
+                try:
+                    loaded = self._load(min(missing), max(missing))
+                except LookupError as e:
+                    # Sem guardar nada: os dias continuam faltando e são pedidos de novo
+                    print(f"Sketches não carregados: {e}")
+                    return
+                for day in missing:
+                    self._days[day] = loaded[day]
+                    if day < today:
+                        self.cache.set(f"{SKETCH_CACHE_PREFIX}|{day}", loaded[day], expire=CLOSED_PERIOD_TTL)
+                if today in missing:
+                    self._open_day = today
+                    self._today_at = time.monotonic()
+
+    def daily_counts(self, metric, start_date, end_date, client_id=None):
+        """(dias, contagens dia × buckets) da métrica no período"""
+        start_day, end_day = pd.Timestamp(start_date).date(), pd.Timestamp(end_date).date()
+        self._ensure(start_day, end_day)
+        key = 'all' if client_id in (None, 'all', '') else int(float(client_id))
+        m = SKETCH_METRICS.index(metric)
+        days = [start_day + timedelta(days=i) for i in range((end_day - start_day).days + 1)]
+        counts = np.zeros((len(days), NUM_BUCKETS), dtype=np.int64)
+        for i, day in enumerate(days):
+            day_sketches = self._days.get(day, {})
+            if key in day_sketches:
+                counts[i] = to_dense(day_sketches[key][m])
+        return days, counts
+
+    def quantiles(self, metric, start_date, end_date, client_id=None, quantiles=(0.5, 0.9, 0.99)):
+        """Quantis da métrica no período inteiro (sketches diários somados)"""
+        _, counts = self.daily_counts(metric, start_date, end_date, client_id)
+        return dict(zip(quantiles, sketch_quantiles(counts.sum(axis=0), quantiles)))
+
+    def daily_quantiles(self, metric, start_date, end_date, client_id=None, quantiles=(0.5, 0.9, 0.99)):
+        """Quantis da métrica por dia (DataFrame indexado por dia, colunas P50/P90/...)"""
+        days, counts = self.daily_counts(metric, start_date, end_date, client_id)
+        values = sketch_quantiles(counts, quantiles)
+        return pd.DataFrame(values, index=pd.DatetimeIndex(days, name='dia'),
+                            columns=[f"P{round(q * 100)}" for q in quantiles])
+
+    def client_quantiles(self, metric, start_date, end_date, quantiles=(0.5, 0.9, 0.99)):
+        """Quantis da métrica por cliente no período (DataFrame indexado por cliente)"""
+        start_day, end_day = pd.Timestamp(start_date).date(), pd.Timestamp(end_date).date()
+        self._ensure(start_day, end_day)
+        m = SKETCH_METRICS.index(metric)
+        totals = {}
+        for i in range((end_day - start_day).days + 1):
+            for client, sketch in self._days.get(start_day + timedelta(days=i), {}).items():
+                if client != 'all':
+                    totals[client] = totals.get(client, 0) + to_dense(sketch[m])
+        clients = sorted(totals)
+        values = sketch_quantiles(np.array([totals[c] for c in clients]).reshape(len(clients), NUM_BUCKETS),
+                                  quantiles)
+        return pd.DataFrame(values, index=pd.Index(clients, name='client_id'),
+                            columns=[f"P{round(q * 100)}" for q in quantiles])
+
+# Instância compartilhada pelo processo
+sketch_store = SketchStore()
+os.register_at_fork(after_in_child=sketch_store.reset_after_fork)
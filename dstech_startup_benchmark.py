@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+DSTech Dashboard - Benchmark de Inicialização
+Mede, em interpretadores novos, o tempo de importar dstech_app e de criar o
+app (create_app, sem aquecimento), a memória máxima do processo e quais
+módulos pesados foram carregados. Serve para acompanhar o cold start dos
+workers entre versões.
+
+Uso:
+    python dstech_startup_benchmark.py                # 5 execuções
+    python dstech_startup_benchmark.py -n 10 --top 25 # + 25 módulos mais lentos (-X importtime)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Módulos que só devem ser carregados sob demanda
+HEAVY_MODULES = ['plotly.express', 'sqlalchemy', 'psycopg2', 'reportlab.platypus', 'openpyxl']
+
+# Executado em cada interpretador novo
+CHILD_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+import dstech_app
+imported = time.perf_counter()
+dstech_app.create_app(warm=False)
+created = time.perf_counter()
+print(json.dumps({
+    'import_s': imported - started,
+    'create_s': created - imported,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': [name for name in %r if name in sys.modules]
+}))
+""" % (HEAVY_MODULES,)
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def run_child(extra_args=()):
+    """Roda CHILD_SCRIPT em um processo novo a partir do diretório do projeto"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    return subprocess.run([sys.executable, *extra_args, '-c', CHILD_SCRIPT], cwd=PACKAGE_DIR, env=env,
+                          capture_output=True, text=True, check=True)
+
+def parse_result(output):
+    """Última linha JSON da saída (mensagens dos módulos são ignoradas)"""
+    for line in reversed(output.strip().splitlines()):
+        if line.startswith('{'):
+            return json.loads(line)
+    raise ValueError(f"Saída sem resultado: {output[-500:]}")
+
+def slowest_imports(stderr, top):
+    """Módulos com maior tempo cumulativo na saída de -X importtime"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|').split('|')]
+        rows.append((int(cumulative_us), int(self_us), name))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de inicialização do DSTech Dashboard")
+    parser.add_argument('-n', '--runs', type=int, default=5, help="execuções em processos novos")
+    parser.add_argument('--top', type=int, default=0, help="listar os N módulos mais lentos de importar")
+    args = parser.parse_args()
+
+    print(f"⏱️ Inicialização do dashboard ({args.runs} execuções)")
+    results = []
+    for _ in range(args.runs):
+        try:
+            results.append(parse_result(run_child().stdout))
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Erro na execução: {e.stderr[-1000:]}")
+            return 1
+
+    for key, label, unit in [('import_s', 'import dstech_app', 's'), ('create_s', 'create_app()', 's'),
+                             ('max_rss_mb', 'memória máxima', 'MB')]:
+        values = [result[key] for result in results]
+        print(f"  {label:<20} mediana {statistics.median(values):8.3f} {unit}"
+              f"  (mín {min(values):.3f}, máx {max(values):.3f})")
+
+    heavy = sorted(set(name for result in results for name in result['heavy']))
+    print(f"  módulos pesados carregados: {', '.join(heavy) if heavy else 'nenhum'}")
+
+    if args.top:
+        stderr = run_child(['-X', 'importtime']).stderr
+        print(f"\n🐢 {args.top} importações mais lentas (cumulativo)")
+        for cumulative_us, self_us, name in slowest_imports(stderr, args.top):
+            print(f"  {cumulative_us / 1000:8.1f} ms  (próprio {self_us / 1000:6.1f} ms)  {name}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
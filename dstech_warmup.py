@@ -0,0 +1,162 @@
+"""
+DSTech Dashboard - Aquecimento na Inicialização
+Abre as conexões mínimas do pool e pré-calcula dimensões, KPIs, cubo e
+agregados das janelas padrão (24h, 7d, 30d) antes de o processo receber
+usuários.
+
+O aquecimento roda em uma thread em segundo plano; /health/ready responde
+503 até terminar (e 200 depois), o que permite ao balanceador só mandar
+tráfego para processos já aquecidos em reinícios e deploys graduais.
+/health/live responde 200 enquanto o processo estiver de pé.
+
+Com o gunicorn em preload (dstech_wsgi), o mestre executa as etapas uma vez
+antes do fork; cada worker herda os caches prontos e refaz apenas o pool.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Janelas padrão pré-calculadas (rótulo → dias)
+WARMUP_WINDOWS = {'24h': 1, '7d': 7, '30d': 30}
+
+# Intervalo entre tentativas de abrir o pool enquanto o banco não responde (segundos)
+WARMUP_RETRY_SECONDS = int(os.getenv('DSTECH_WARMUP_RETRY_SECONDS', '5'))
+
+def warmup_periods():
+    """(rótulo, início, fim) de cada janela padrão, terminando agora"""
+    now = datetime.now()
+    return [(label, now - timedelta(days=days), now) for label, days in WARMUP_WINDOWS.items()]
+
+def _warm_pool():
+    from dstech_db import prewarm_pool
+    return f"{prewarm_pool()} conexões"
+
+def _warm_dimensions():
+    from dstech_dimensions import dimensions
+    dimensions.refresh()
+    return f"{len(dimensions.names('clientes'))} clientes, {len(dimensions.names('programas'))} programas"
+
+def _warm_kpis():
+    from dstech_kpi_index import kpi_index
+    kpi_index.refresh()
+    for _, start, end in warmup_periods():
+        kpi_index.kpis(start, end)
+
+def _warm_cube():
+    from dstech_cube import production_cube
+    production_cube.refresh()
+
+def _warm_aggregates():
+    from dstech_reports import generate_executive_report
+    for _, start, end in warmup_periods():
+        generate_executive_report(start, end)
+
+def _warm_analytics():
+    from advanced_analytics import get_production_frame
+    from dstech_sketches import sketch_store
+    _, start, end = warmup_periods()[-1]
+    get_production_frame(start, end)
+    sketch_store.quantiles('agua_por_kg', start, end)
+
+class WarmUp:
+    """Etapas de aquecimento executadas em ordem, com estado para a prontidão
+
+    A primeira etapa ('pool') é repetida até o banco responder; falhas nas
+    demais ficam registradas, mas não impedem a prontidão (os dados são
+    calculados no primeiro acesso, como sem aquecimento). Etapas concluídas
+    não são repetidas por uma nova execução.
+    """
+
+    def __init__(self, steps=None, retry_seconds=WARMUP_RETRY_SECONDS):
+        self.steps = list(steps or [
+            ('pool', _warm_pool),
+            ('dimensoes', _warm_dimensions),
+            ('kpis', _warm_kpis),
+            ('cubo', _warm_cube),
+            ('agregados', _warm_aggregates),
+            ('analises', _warm_analytics)
+        ])
+        self.retry_seconds = retry_seconds
+        self.status = {name: 'pendente' for name, _ in self.steps}
+        self.done = set()
+        self.ready = False
+        self.started_at = None
+        self.finished_at = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def add_step(self, name, function):
+        """Acrescenta uma etapa (ex.: figuras montadas pelo app)"""
+        self.steps.append((name, function))
+        self.status[name] = 'pendente'
+
+    def start(self):
+        """Inicia o aquecimento em segundo plano (idempotente)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self.run, name='dstech-warmup', daemon=True)
+            self._thread.start()
+
+    def run(self, retry=True):
+        """Executa as etapas pendentes; sem `retry`, desiste se o pool não abrir"""
+        self.started_at = datetime.now()
+        self.ready = False
+        for index, (name, function) in enumerate(self.steps):
+            if name in self.done:
+                continue
+            while True:
+                started = time.monotonic()
+                try:
+                    detail = function()
+                    self.status[name] = f"ok ({time.monotonic() - started:.1f}s{', ' + detail if detail else ''})"
+                    self.done.add(name)
+                    break
+                except Exception as e:
+                    self.status[name] = f"erro: {e}"
+                    print(f"⚠️ Aquecimento - etapa {name} falhou: {e}")
+                    if index > 0:
+                        break
+                    if not retry:
+                        return False
+                    time.sleep(self.retry_seconds)
+        self.finished_at = datetime.now()
+        self.ready = True
+        print(f"✅ Aquecimento concluído em {(self.finished_at - self.started_at).total_seconds():.1f}s")
+        return True
+
+    def reset_after_fork(self):
+        """No processo filho o pool precisa ser aberto de novo; as demais etapas prontas valem"""
+        self._lock = threading.Lock()
+        self._thread = None
+        self.ready = False
+        if self.steps:
+            first = self.steps[0][0]
+            self.done.discard(first)
+            self.status[first] = 'pendente'
+
+    def report(self):
+        return {
+            'status': 'ready' if self.ready else 'warming',
+            'etapas': dict(self.status),
+            'inicio': self.started_at.isoformat() if self.started_at else None,
+            'fim': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+# Instância compartilhada pelo processo
+warmup = WarmUp()
+os.register_at_fork(after_in_child=warmup.reset_after_fork)
+
+def register_warmup_routes(server, state=warmup):
+    """Registra /health/live e /health/ready no servidor Flask do Dash"""
+    from flask import jsonify
+
+    @server.route('/health/live')
+    def health_live():
+        return jsonify({'status': 'alive'})
+
+    @server.route('/health/ready')
+    def health_ready():
+        return jsonify(state.report()), (200 if state.ready else 503)
@@ -0,0 +1,30 @@
+"""
+DSTech Dashboard - Entrada WSGI para Produção
+Servidor WSGI do dashboard para o gunicorn (o `app.run` de dstech_app é o
+servidor de desenvolvimento do Flask):
+
+    gunicorn -c gunicorn.conf.py dstech_wsgi:server
+
+Com preload (gunicorn.conf.py), o mestre importa este módulo uma vez, aquece
+caches e figuras e fecha as conexões antes de criar os workers. Os workers
+herdam a memória já aquecida (copy-on-write) e cada um abre o próprio pool
+ao iniciar. Pools, travas e threads herdados no fork são recriados pelos
+módulos que os possuem (os.register_at_fork).
+"""
+
+from dstech_app import create_app
+from dstech_db import close_connections
+from dstech_warmup import warmup
+
+app = create_app(warm=False)
+server = app.server
+
+def warm_before_fork():
+    """No mestre: aquece uma vez (sem insistir com o banco fora) e fecha as conexões antes do fork"""
+    if not warmup.run(retry=False):
+        print("⚠️ Banco indisponível no aquecimento do mestre - os workers aquecem ao iniciar")
+    close_connections()
+
+def start_worker():
+    """No worker: abre o pool e completa as etapas que não ficaram prontas no mestre"""
+    warmup.start()
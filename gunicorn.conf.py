@@ -0,0 +1,51 @@
+"""
+DSTech Dashboard - Configuração do Gunicorn
+    gunicorn -c gunicorn.conf.py dstech_wsgi:server
+
+Um worker por núcleo (processos contornam o GIL nos callbacks que montam
+DataFrames e figuras), cada um com threads para as esperas de banco e os
+streams SSE. O app é carregado e aquecido no mestre (preload) e os workers
+compartilham essa memória por copy-on-write.
+
+Cada worker mantém o próprio pool: o PostgreSQL precisa aceitar
+workers × (DSTECH_DB_POOL_SIZE + DSTECH_DB_POOL_OVERFLOW) conexões.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('DASH_PORT', '8051')}"
+
+workers = int(os.getenv('DSTECH_WORKERS', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+# Cada stream SSE aberto (/stream/updates) ocupa uma thread enquanto a aba
+# estiver aberta: as threads são dimensionadas pelas abas esperadas por worker
+# e os streams limitados para sempre sobrarem SSE_RESERVED_THREADS aos callbacks
+threads = int(os.getenv('DSTECH_THREADS', '32'))
+SSE_RESERVED_THREADS = 8
+os.environ.setdefault('DSTECH_SSE_MAX_STREAMS', str(max(threads - SSE_RESERVED_THREADS, 1)))
+
+preload_app = True
+
+# Acima do statement_timeout de 'analytics' (60s); exportações rodam em segundo plano
+timeout = int(os.getenv('DSTECH_WORKER_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 5
+
+# Reciclar workers aos poucos: novos workers saem do mestre já aquecido
+max_requests = int(os.getenv('DSTECH_MAX_REQUESTS', '5000'))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+def when_ready(server):
+    """Mestre pronto, antes dos primeiros workers: aquecer caches e fechar conexões"""
+    if server.cfg.preload_app:
+        import dstech_wsgi
+        dstech_wsgi.warm_before_fork()
+
+def post_fork(server, worker):
+    """Worker recém-criado: pools e travas já foram recriados no fork; abrir o pool"""
+    import dstech_wsgi
+    dstech_wsgi.start_worker()
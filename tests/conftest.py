@@ -0,0 +1,6 @@
+"""Configuração dos testes: cache em disco (diskcache) num diretório temporário"""
+
+import os
+import tempfile
+
+os.environ.setdefault('DSTECH_CACHE_DIR', tempfile.mkdtemp(prefix='dstech-tests-'))
@@ -0,0 +1,37 @@
+"""Testes do frame de produção das análises avançadas (advanced_analytics)"""
+
+from datetime import date
+
+import pandas as pd
+import pytest
+
+import advanced_analytics
+from advanced_analytics import FRAME_COLUMNS, get_production_frame
+
+@pytest.fixture
+def production_rows(monkeypatch):
+    """Resposta do agregado de Rel_Carga trocada pelo teste"""
+    rows = {}
+
+    def fake_execute_query(query, params=None):
+        return rows['df']
+
+    monkeypatch.setattr(advanced_analytics, 'execute_query', fake_execute_query)
+    return rows
+
+def test_clientes_invalidos_ficam_fora_do_frame(production_rows):
+    production_rows['df'] = pd.DataFrame({
+        'dia': [date(2021, 5, 1)] * 4,
+        'client_id': ['3', None, 'sem cadastro', 4.0],
+        'kg': [100.0, 50.0, 20.0, 30.0],
+        'cargas': [2, 1, 1, 1]
+    })
+    frame = get_production_frame('2021-05-01', '2021-05-02')
+    assert list(frame['client_id']) == [3, 4]
+    assert frame['client_id'].dtype.kind == 'i'
+    assert frame['kg'].sum() == 130
+
+def test_consulta_sem_linhas(production_rows):
+    production_rows['df'] = pd.DataFrame()
+    frame = get_production_frame('2021-06-01', '2021-06-02')
+    assert frame.empty and list(frame.columns) == FRAME_COLUMNS
@@ -0,0 +1,84 @@
+"""Testes do cubo de produção em memória (dstech_cube)"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from dstech_cube import CUBE_COLUMNS, ProductionCube
+
+TODAY = date.today()
+
+class FakeDatabase:
+    """Agregado diário de Rel_Carga respondendo como execute_query"""
+
+    def __init__(self, rows):
+        self.rows = pd.DataFrame(rows, columns=CUBE_COLUMNS)
+        self.fail = False
+        self.requests = []
+
+    def __call__(self, query, params=None):
+        start, end = params['start'].date(), params['end'].date()
+        self.requests.append((start, end))
+        if self.fail:
+            return pd.DataFrame()
+        days = pd.to_datetime(self.rows['dia']).dt.date
+        return self.rows[(days >= start) & (days < end)].reset_index(drop=True)
+
+def daily_rows(days, client_id=1, program_id=2, kg=100.0):
+    return [{'dia': TODAY - timedelta(days=i), 'client_id': client_id, 'program_id': program_id,
+             'kg': kg, 'cargas': 1} for i in range(days)]
+
+def total_kg(cube, start, end):
+    kg, _, _, _ = cube.slice(start, end)
+    return kg.sum()
+
+def test_recorte_soma_o_periodo():
+    cube = ProductionCube(query_source=FakeDatabase(daily_rows(30)), initial_days=60)
+    assert total_kg(cube, TODAY - timedelta(days=9), TODAY) == 1000
+    kg, loads, clients, programs = cube.slice(TODAY - timedelta(days=29), TODAY, client_id='1')
+    assert kg.sum() == 3000 and loads.sum() == 30
+    assert list(clients) == [1] and list(programs) == [2]
+
+def test_ids_invalidos_ficam_fora_do_cubo():
+    rows = daily_rows(3) + [{'dia': TODAY, 'client_id': None, 'program_id': 2, 'kg': 50.0, 'cargas': 1},
+                            {'dia': TODAY, 'client_id': 'abc', 'program_id': 2, 'kg': 50.0, 'cargas': 1}]
+    cube = ProductionCube(query_source=FakeDatabase(rows), initial_days=10)
+    assert total_kg(cube, TODAY - timedelta(days=5), TODAY) == 300
+
+def test_montagem_que_falhou_e_repetida():
+    database = FakeDatabase(daily_rows(30))
+    database.fail = True
+    cube = ProductionCube(query_source=database, initial_days=60)
+    assert total_kg(cube, TODAY - timedelta(days=29), TODAY) == 0
+    assert cube._state is None
+
+    database.fail = False
+    assert total_kg(cube, TODAY - timedelta(days=29), TODAY) == 3000
+    assert cube._state['first_day'] == TODAY - timedelta(days=60)
+
+def test_atualizacao_que_falhou_mantem_o_cubo():
+    database = FakeDatabase(daily_rows(30))
+    cube = ProductionCube(query_source=database, initial_days=60)
+    cube.refresh()
+    state = cube._state
+    database.fail = True
+    cube.refresh()
+    assert cube._state is state
+    assert total_kg(cube, TODAY - timedelta(days=29), TODAY) == 3000
+
+def test_dias_antigos_que_falharam_sao_recarregados():
+    database = FakeDatabase(daily_rows(100))
+    cube = ProductionCube(query_source=database, initial_days=30)
+    cube.refresh()
+    first_day = cube._state['first_day']
+
+    database.fail = True
+    start = TODAY - timedelta(days=89)
+    cube.slice(start, TODAY)
+    assert cube._state['first_day'] == first_day
+
+    database.fail = False
+    assert total_kg(cube, start, TODAY) == 9000
+    assert cube._state['first_day'] == start
+    np.testing.assert_array_equal(cube._state['kg'][0, 0, :], 100.0)
@@ -0,0 +1,174 @@
+"""Testes do disjuntor do banco e dos últimos resultados bons (dstech_db)"""
+
+import time
+import types
+
+import pandas as pd
+import pytest
+
+import dstech_db
+from dstech_db import CircuitBreaker, LastGoodResults
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(dstech_db, 'time', types.SimpleNamespace(
+        monotonic=clock.monotonic, time=time.time, sleep=time.sleep))
+    return clock
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+def test_abre_apos_falhas_seguidas(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == 'closed' and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+def test_sucesso_zera_as_falhas(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    assert breaker.failures == 1
+
+def test_meio_aberto_libera_uma_consulta_de_teste(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    open_breaker(breaker)
+    clock.now += 29
+    assert breaker.state == 'open' and not breaker.allow()
+    clock.now += 1
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+    # Enquanto o teste não termina, as demais continuam fora do banco
+    assert not breaker.allow()
+
+def test_teste_bem_sucedido_fecha(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow() and breaker.allow()
+
+def test_teste_com_falha_reabre(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+def test_teste_que_nao_chegou_ao_banco_libera_outro(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+
+def frame(rows):
+    return pd.DataFrame({'valor': range(rows)})
+
+def test_ultimos_resultados_limitados_por_quantidade():
+    results = LastGoodResults(max_entries=2, max_bytes=10**9)
+    for key in 'abc':
+        results.set(key, frame(10))
+    assert results.get('a') is None
+    assert results.get('c')[0].equals(frame(10))
+    assert len(results) == 2
+
+def test_ultimos_resultados_limitados_por_bytes():
+    size = int(frame(100).memory_usage(index=True, deep=True).sum())
+    results = LastGoodResults(max_entries=100, max_bytes=size * 3)
+    for key in range(5):
+        results.set(key, frame(100))
+    assert len(results) == 3
+    assert results.total_bytes == size * 3
+    assert results.get(0) is None and results.get(4) is not None
+
+def test_resultado_maior_que_o_limite_nao_e_guardado():
+    results = LastGoodResults(max_entries=100, max_bytes=1000)
+    results.set('pequeno', frame(10))
+    results.set('grande', frame(10000))
+    assert results.get('grande') is None
+    assert results.get('pequeno') is not None
+
+def test_substituir_resultado_atualiza_o_total():
+    results = LastGoodResults(max_entries=100, max_bytes=10**9)
+    results.set('a', frame(1000))
+    results.set('a', frame(10))
+    assert len(results) == 1
+    assert results.total_bytes == int(frame(10).memory_usage(index=True, deep=True).sum())
+
+@pytest.fixture
+def database_down(monkeypatch):
+    """Disjuntor aberto: execute_query serve o último resultado bom sem ir ao banco"""
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=3600)
+    breaker.record_failure()
+    monkeypatch.setattr(dstech_db, 'breaker', breaker)
+    monkeypatch.setattr(dstech_db, '_revalidator', types.SimpleNamespace(submit=lambda *args: None))
+    monkeypatch.setattr(dstech_db, '_revalidating', set())
+    monkeypatch.setattr(dstech_db, 'last_good', LastGoodResults())
+
+def run_callback(body, tab_id='aba-1', ran=None):
+    """Executa `body` como callback decorado; retorna os ganchos executados"""
+    ran = [] if ran is None else ran
+
+    @dstech_db.cancel_superseded
+    def callback_function():
+        dstech_db.after_fresh_result(lambda: ran.append('registrado'))
+        return body()
+
+    try:
+        callback_function(tab_id)
+    except dstech_db.PreventUpdate:
+        pass
+    return ran
+
+def test_gancho_roda_com_resultado_atual():
+    assert run_callback(lambda: 'figura') == ['registrado']
+
+def test_gancho_nao_roda_com_consulta_falhando(database_down):
+    assert run_callback(lambda: dstech_db.execute_query("SELECT 1")) == []
+
+def test_gancho_nao_roda_se_o_callback_falhar():
+    def failing():
+        raise RuntimeError("erro ao montar a figura")
+
+    ran = []
+    with pytest.raises(RuntimeError):
+        run_callback(failing, ran=ran)
+    assert ran == []
+
+def test_gancho_nao_roda_em_execucao_substituida():
+    def superseded():
+        # Pedido mais novo da mesma aba e callback durante a execução
+        dstech_db.generations.begin(('aba-2', 'callback_function'))
+        return 'figura'
+
+    assert run_callback(superseded, tab_id='aba-2') == []
+
+def test_fora_de_callback_roda_na_hora():
+    ran = []
+    dstech_db.after_fresh_result(lambda: ran.append('registrado'))
+    assert ran == ['registrado']
@@ -0,0 +1,152 @@
+"""Testes do índice de KPIs por somas acumuladas (dstech_kpi_index)"""
+
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dstech_kpi_index import KPI_METRICS, KpiIndex
+
+TODAY = date.today()
+
+class FakeDatabase:
+    """Agregado diário de um histórico fixo, respondendo como execute_query"""
+
+    def __init__(self, daily):
+        self.daily = daily  # dia → vetor de métricas
+        self.fail = False
+        self.calls = 0
+
+    def __call__(self, query, params=None):
+        self.calls += 1
+        time.sleep(0.01)
+        if self.fail:
+            return pd.DataFrame()
+        if 'alarmes_ativos' in query:
+            return pd.DataFrame({'alarmes_ativos': [2]})
+        start, end = params['start'].date(), params['end'].date()
+        rows = [dict(zip(KPI_METRICS, values), dia=day) for day, values in sorted(self.daily.items())
+                if start <= day < end]
+        return pd.DataFrame(rows, columns=['dia'] + KPI_METRICS)
+
+def random_history(days=60, seed=11):
+    rng = np.random.default_rng(seed)
+    # Dias sem produção ficam fora do histórico (lacunas nos arrays acumulados)
+    return {TODAY - timedelta(days=i): rng.uniform(1, 100, len(KPI_METRICS))
+            for i in range(days + 1) if i % 7 != 3}
+
+def brute_force(daily, start, end):
+    total = np.zeros(len(KPI_METRICS))
+    for day, values in daily.items():
+        if start <= day <= end:
+            total += values
+    return total
+
+def totals_array(index, start, end):
+    totals = index.totals(start, end)
+    return np.array([totals[metric] for metric in KPI_METRICS])
+
+def test_totais_de_qualquer_periodo_iguais_a_soma_direta():
+    daily = random_history()
+    index = KpiIndex(query_source=FakeDatabase(daily))
+    rng = np.random.default_rng(2)
+    for _ in range(50):
+        start = TODAY - timedelta(days=int(rng.integers(0, 70)))
+        end = start + timedelta(days=int(rng.integers(0, 30)))
+        np.testing.assert_allclose(totals_array(index, start, end), brute_force(daily, start, end))
+
+def test_periodos_fora_do_historico():
+    daily = random_history(days=10)
+    index = KpiIndex(query_source=FakeDatabase(daily))
+    long_ago = TODAY - timedelta(days=400)
+    assert not totals_array(index, long_ago, long_ago + timedelta(days=30)).any()
+    np.testing.assert_allclose(totals_array(index, long_ago, TODAY + timedelta(days=5)),
+                               brute_force(daily, long_ago, TODAY))
+
+def test_aceita_datas_em_texto_e_datetime():
+    daily = random_history(days=10)
+    index = KpiIndex(query_source=FakeDatabase(daily))
+    start = TODAY - timedelta(days=5)
+    expected = brute_force(daily, start, TODAY)
+    np.testing.assert_allclose(totals_array(index, start.isoformat(), f"{TODAY.isoformat()}T23:59:59"), expected)
+    np.testing.assert_allclose(totals_array(index, datetime.combine(start, datetime.min.time()), TODAY), expected)
+
+def test_virada_do_dia_acrescenta_dias_fechados():
+    daily = random_history(days=10)
+    database = FakeDatabase(daily)
+    index = KpiIndex(query_source=database)
+    index.refresh()
+    # Simula uma carga feita ontem: hoje ainda não fechado no índice
+    index._state['open_day'] = TODAY - timedelta(days=1)
+    index._state['cumulative'] = index._state['cumulative'][:-1]
+    index.refresh(force=True)
+    assert len(index._state['cumulative']) - 1 == (TODAY - index._state['first_day']).days
+    start = TODAY - timedelta(days=10)
+    np.testing.assert_allclose(totals_array(index, start, TODAY), brute_force(daily, start, TODAY))
+
+def test_erro_no_banco_mantem_o_indice():
+    database = FakeDatabase(random_history(days=10))
+    index = KpiIndex(query_source=database)
+    index.refresh()
+    state = index._state
+    state['open_day'] = TODAY - timedelta(days=1)
+    state['cumulative'] = state['cumulative'][:-1]
+    database.fail = True
+    index.refresh(force=True)
+    # Nenhum dia fechado entrou com zeros: o índice é o mesmo de antes
+    assert index._state is state
+    assert len(index._state['cumulative']) == len(state['cumulative'])
+
+def test_primeira_carga_sem_banco_nao_fica_valendo():
+    database = FakeDatabase(random_history(days=10))
+    database.fail = True
+    index = KpiIndex(query_source=database)
+    with pytest.raises(LookupError):
+        index.totals(TODAY - timedelta(days=7), TODAY)
+    assert index._state is None and index._refreshed_at is None
+
+    # Próxima chamada tenta de novo
+    database.fail = False
+    np.testing.assert_allclose(totals_array(index, TODAY - timedelta(days=7), TODAY),
+                               brute_force(database.daily, TODAY - timedelta(days=7), TODAY))
+
+def test_linhas_atrasadas_do_ultimo_dia_fechado_entram_na_virada():
+    daily = random_history(days=10)
+    database = FakeDatabase(daily)
+    index = KpiIndex(query_source=database)
+    index.refresh()
+    yesterday = TODAY - timedelta(days=1)
+    # Carga feita ontem, com anteontem fechado sem as últimas linhas
+    index._state['open_day'] = yesterday
+    index._state['cumulative'] = index._state['cumulative'][:-1]
+    day_before = TODAY - timedelta(days=2)
+    daily[day_before] = daily.get(day_before, np.zeros(len(KPI_METRICS))) + 5.0
+    index.refresh(force=True)
+    np.testing.assert_allclose(totals_array(index, day_before, day_before), brute_force(daily, day_before, day_before))
+    np.testing.assert_allclose(totals_array(index, TODAY - timedelta(days=10), TODAY),
+                               brute_force(daily, TODAY - timedelta(days=10), TODAY))
+
+def test_threads_simultaneas_recarregam_uma_vez():
+    database = FakeDatabase(random_history(days=10))
+    index = KpiIndex(query_source=database)
+    threads = [threading.Thread(target=index.totals, args=(TODAY, TODAY)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Uma carga: dias fechados, parcial de hoje e alarmes ativos
+    assert database.calls == 3
+
+def test_kpis_calculados_dos_totais():
+    daily = {TODAY: np.array([200.0, 4, 1000.0, 10.0, 50.0, 10.0, 3.0, 4])}
+    index = KpiIndex(query_source=FakeDatabase(daily))
+    kpis = index.kpis(TODAY, TODAY)
+    assert kpis['quilos_lavados_hoje_raw'] == 200
+    assert kpis['ciclos_hoje'] == 4
+    assert kpis['litros_por_kg_hoje'] == pytest.approx(5.0)
+    assert kpis['kg_quimicos_por_kg_hoje'] == pytest.approx(0.05)
+    assert kpis['eficiencia_media'] == pytest.approx(75.0)
+    assert kpis['alarmes_ativos'] == 2
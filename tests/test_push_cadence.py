@@ -0,0 +1,108 @@
+"""Testes da cadência adaptativa de verificação do DataChangeNotifier (dstech_push)"""
+
+import types
+
+import pytest
+
+import dstech_push
+from dstech_push import POLL_BACKOFF, DataChangeNotifier
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(dstech_push, 'time', types.SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+class Watermarks:
+    """Fonte de marcas d'água controlada pelo teste"""
+
+    def __init__(self, tables):
+        self.marks = {table: 0 for table in tables}
+        self.requested = []
+
+    def __call__(self, tables):
+        self.requested.append(list(tables))
+        return {table: str(self.marks[table]) for table in tables}
+
+TABLES = {'Rel_Diario': None, 'clientes': None}
+
+def make_notifier(source, **kwargs):
+    options = dict(poll_seconds=15, tables=TABLES, min_seconds=5, max_seconds=600)
+    options.update(kwargs)
+    return DataChangeNotifier(watermark_source=source, **options)
+
+def test_primeira_leitura_nao_publica(clock):
+    source = Watermarks(TABLES)
+    notifier = make_notifier(source)
+    assert notifier.check_watermarks() == []
+    assert notifier.version == 0
+    assert source.requested == [list(TABLES)]
+
+def test_so_verifica_tabelas_vencidas(clock):
+    source = Watermarks(TABLES)
+    notifier = make_notifier(source)
+    notifier.check_watermarks()
+    assert notifier.due_tables() == []
+    assert notifier.seconds_until_due() == pytest.approx(15 * POLL_BACKOFF)
+
+    clock.now += 15 * POLL_BACKOFF
+    assert sorted(notifier.due_tables()) == sorted(TABLES)
+
+def test_sem_novidade_recua_ate_o_maximo(clock):
+    notifier = make_notifier(Watermarks(TABLES))
+    expected = 15.0
+    for _ in range(20):
+        notifier.check_watermarks(TABLES)
+        expected = min(expected * POLL_BACKOFF, 600)
+        assert notifier.check_intervals['Rel_Diario'] == pytest.approx(expected)
+        clock.now += expected
+    assert notifier.check_intervals['Rel_Diario'] == 600
+
+def test_chegadas_frequentes_encurtam_o_intervalo(clock):
+    source = Watermarks(TABLES)
+    notifier = make_notifier(source)
+    notifier.check_watermarks(TABLES)
+    for _ in range(30):
+        clock.now += 20
+        source.marks['Rel_Diario'] += 1
+        assert notifier.check_watermarks(TABLES) == ['Rel_Diario']
+    # Metade do intervalo médio entre chegadas (20s)
+    assert notifier.arrival_intervals['Rel_Diario'] == pytest.approx(20)
+    assert notifier.check_intervals['Rel_Diario'] == pytest.approx(10)
+    assert notifier.next_check['Rel_Diario'] == pytest.approx(clock.now + 10)
+    # A tabela parada continua recuando
+    assert notifier.check_intervals['clientes'] == 600
+
+def test_intervalo_respeita_o_minimo(clock):
+    source = Watermarks(TABLES)
+    notifier = make_notifier(source)
+    notifier.check_watermarks(TABLES)
+    for _ in range(5):
+        clock.now += 2
+        source.marks['Rel_Diario'] += 1
+        notifier.check_watermarks(['Rel_Diario'])
+    assert notifier.check_intervals['Rel_Diario'] == 5
+
+def test_publica_versoes_por_tabela(clock):
+    source = Watermarks(TABLES)
+    notifier = make_notifier(source)
+    notifier.check_watermarks(TABLES)
+    source.marks['clientes'] += 1
+    notifier.check_watermarks(TABLES)
+    assert notifier.version == 1
+    assert notifier.changes_since(0) == ['clientes']
+    assert notifier.changes_since(1) == []
+    assert notifier.wait_for_change(0, timeout=0) == (1, ['clientes'])
+    assert notifier.wait_for_change(1, timeout=0) is None
+
+def test_fonte_sem_resposta_nao_altera_a_cadencia(clock):
+    notifier = make_notifier(lambda tables: {})
+    assert notifier.check_watermarks(TABLES) == []
+    assert notifier.check_intervals == {table: 15.0 for table in TABLES}
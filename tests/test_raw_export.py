@@ -0,0 +1,63 @@
+"""Testes do período e das validações do endpoint /export/raw (dstech_raw_export)"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from dstech_raw_export import LOGIN_SESSION_KEY, parse_export_period, register_raw_export_routes
+
+def test_periodo_inclui_o_dia_final_inteiro():
+    assert parse_export_period('2024-03-01', '2024-03-31') == (datetime(2024, 3, 1), datetime(2024, 4, 1))
+
+def test_aceita_datas_com_horario():
+    start, end = parse_export_period('2024-03-01T10:30:00', '2024-03-05T08:00:00')
+    assert (start, end) == (datetime(2024, 3, 1), datetime(2024, 3, 6))
+
+def test_um_unico_dia():
+    assert parse_export_period('2024-03-01', '2024-03-01') == (datetime(2024, 3, 1), datetime(2024, 3, 2))
+
+def test_sem_datas_ultimos_sete_dias():
+    start, end = parse_export_period(None, None)
+    tomorrow = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    assert end == tomorrow
+    assert end - start <= timedelta(days=8) and end - start > timedelta(days=7)
+
+def test_sem_inicio_sete_dias_antes_do_fim():
+    assert parse_export_period('', '2024-03-10') == (datetime(2024, 3, 3), datetime(2024, 3, 11))
+
+@pytest.mark.parametrize('start, end', [
+    ('2024-03-10', '2024-03-01'),
+    ('2024-13-01', '2024-03-01'),
+    ('ontem', '2024-03-01'),
+    ('2024-03-01', '2024-02-30'),
+])
+def test_periodo_invalido(start, end):
+    with pytest.raises(ValueError):
+        parse_export_period(start, end)
+
+@pytest.fixture
+def client():
+    server = Flask(__name__)
+    server.secret_key = 'testes'
+    register_raw_export_routes(server)
+    return server.test_client()
+
+def login(client):
+    with client.session_transaction() as session:
+        session[LOGIN_SESSION_KEY] = 'admin'
+
+def test_exige_login(client):
+    assert client.get('/export/raw?tables=Rel_Diario').status_code == 401
+
+@pytest.mark.parametrize('query', [
+    'tables=',
+    'tables=usuarios',
+    'tables=Rel_Diario&format=pdf',
+    'tables=Rel_Diario,Rel_Carga&format=csv',
+    'tables=Rel_Diario&start=2024-03-10&end=2024-03-01',
+    'tables=Rel_Diario&start=ontem',
+])
+def test_parametros_invalidos(client, query):
+    login(client)
+    assert client.get(f'/export/raw?{query}').status_code == 400
@@ -0,0 +1,157 @@
+"""Testes dos sketches de quantis: erro relativo, combinação de dias e formato esparso"""
+
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dstech_sketches
+from dstech_sketches import (NUM_BUCKETS, SKETCH_CACHE_PREFIX, SKETCH_MAX_VALUE, SKETCH_MIN_VALUE,
+                             SKETCH_RELATIVE_ERROR, SketchStore, bucket_index, build_sketches,
+                             sketch_quantiles, to_dense, to_sparse)
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+class MemoryCache(dict):
+    """Cache com a interface usada do diskcache (get/set com expire)"""
+
+    def set(self, key, value, expire=None):
+        self[key] = value
+
+def sketch_of(values):
+    return np.bincount(bucket_index(values), minlength=NUM_BUCKETS)
+
+def exact_quantiles(values, quantiles=QUANTILES):
+    """Quantil por posição, a mesma definição de sketch_quantiles"""
+    values = np.sort(values)
+    return [values[int(q * (len(values) - 1))] for q in quantiles]
+
+def cycle_rows(rng, days, n):
+    return pd.DataFrame({
+        'dia': [days[i % len(days)] for i in range(n)],
+        'client_id': rng.integers(1, 4, n).astype(float),
+        'agua_por_kg': rng.lognormal(2.0, 0.4, n)
+    })
+
+@pytest.mark.parametrize('sigma', [0.1, 1.0, 2.0])
+def test_erro_relativo_dentro_do_limite(sigma):
+    values = np.random.default_rng(7).lognormal(1.0, sigma, 5000)
+    values = values[(values >= 1e-3) & (values <= 1e4)]
+    estimated = sketch_quantiles(sketch_of(values), QUANTILES)
+    for estimate, exact in zip(estimated, exact_quantiles(values)):
+        assert abs(estimate - exact) <= SKETCH_RELATIVE_ERROR * exact * (1 + 1e-9)
+
+def test_soma_de_sketches_igual_ao_sketch_da_uniao():
+    rng = np.random.default_rng(1)
+    first, second = rng.lognormal(2, 0.5, 300), rng.lognormal(3, 0.5, 700)
+    combined = sketch_of(first) + sketch_of(second)
+    np.testing.assert_array_equal(combined, sketch_of(np.concatenate([first, second])))
+    np.testing.assert_allclose(sketch_quantiles(combined), sketch_quantiles(sketch_of(np.concatenate([first, second]))))
+
+def test_sketch_vazio_retorna_nan():
+    assert np.isnan(sketch_quantiles(np.zeros(NUM_BUCKETS, dtype=np.int64))).all()
+
+def test_valores_fora_da_faixa_vao_para_os_extremos():
+    lowest, highest = bucket_index([SKETCH_MIN_VALUE, SKETCH_MAX_VALUE])
+    assert bucket_index([0.0, 1e-9]).tolist() == [lowest, lowest]
+    assert bucket_index([1e9]).tolist() == [highest]
+    assert 0 <= lowest and highest < NUM_BUCKETS
+
+def test_esparso_ida_e_volta():
+    counts = np.zeros((2, NUM_BUCKETS), dtype=np.int64)
+    counts[0, [10, 12, 40]] = [3, 1, 7]
+    sparse = to_sparse(counts)
+    assert sparse[0][0] == 10 and len(sparse[0][1]) == 31 and sparse[0][1].dtype == np.uint32
+    assert len(sparse[1][1]) == 0
+    np.testing.assert_array_equal(np.stack([to_dense(metric) for metric in sparse]), counts)
+
+def test_build_sketches_por_dia_e_cliente():
+    days = [date(2024, 3, 1), date(2024, 3, 2)]
+    df = cycle_rows(np.random.default_rng(3), days, 600)
+    sketches = build_sketches(df)
+    assert set(sketches) == set(days)
+    for day in days:
+        day_df = df[df['dia'] == day]
+        total = to_dense(sketches[day]['all'][0])
+        assert total.sum() == len(day_df)
+        clients = [to_dense(sketch[0]) for client, sketch in sketches[day].items() if client != 'all']
+        np.testing.assert_array_equal(np.sum(clients, axis=0), total)
+
+def test_store_combina_dias_e_filtra_cliente():
+    days = [date(2024, 3, 1), date(2024, 3, 2), date(2024, 3, 3)]
+    df = cycle_rows(np.random.default_rng(5), days, 3000)
+    cache = MemoryCache()
+    store = SketchStore(query_source=lambda query, params: df, cache=cache)
+
+    period = store.quantiles('agua_por_kg', '2024-03-01', '2024-03-03')
+    for q, exact in zip(QUANTILES, exact_quantiles(df['agua_por_kg'].to_numpy())):
+        assert period[q] == pytest.approx(exact, rel=SKETCH_RELATIVE_ERROR)
+
+    client = df[df['client_id'] == 2]['agua_por_kg'].to_numpy()
+    by_client = store.quantiles('agua_por_kg', '2024-03-01', '2024-03-03', client_id='2')
+    for q, exact in zip(QUANTILES, exact_quantiles(client)):
+        assert by_client[q] == pytest.approx(exact, rel=SKETCH_RELATIVE_ERROR)
+
+    # Quantis de todos os clientes num único DataFrame
+    per_client = store.client_quantiles('agua_por_kg', '2024-03-01', '2024-03-03')
+    assert list(per_client.index) == [1, 2, 3]
+    assert per_client.loc[2, 'P50'] == pytest.approx(by_client[0.5])
+
+    # Dias fechados persistidos no cache, já no formato esparso
+    assert len(cache) == len(days)
+
+def test_store_sem_linhas_nao_guarda_dias_vazios():
+    store = SketchStore(query_source=lambda query, params: pd.DataFrame(), cache=MemoryCache())
+    result = store.quantiles('agua_por_kg', '2024-03-01', '2024-03-02')
+    assert all(np.isnan(value) for value in result.values())
+    assert store._days == {}
+
+class Calendar:
+    """datetime com `now()` controlado pelo teste"""
+
+    def __init__(self, monkeypatch, today):
+        self.today = today
+        calendar = self
+
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return cls.combine(calendar.today, datetime.min.time()) + timedelta(hours=12)
+
+        monkeypatch.setattr(dstech_sketches, 'datetime', FrozenDatetime)
+
+class CountingSource:
+    def __init__(self, df):
+        self.df = df
+        self.calls = 0
+
+    def __call__(self, query, params):
+        self.calls += 1
+        days = pd.to_datetime(self.df['dia']).dt.date
+        return self.df[(days >= params['start'].date()) & (days < params['end'].date())]
+
+def test_dia_aberto_e_recarregado_e_persistido_apos_a_meia_noite(monkeypatch):
+    day = date(2024, 3, 1)
+    calendar = Calendar(monkeypatch, day)
+    df = cycle_rows(np.random.default_rng(9), [day], 100)
+    source = CountingSource(df)
+    cache = MemoryCache()
+    store = SketchStore(query_source=source, cache=cache, refresh_seconds=3600)
+    assert store.daily_counts('agua_por_kg', day, day)[1].sum() == 100
+    assert cache == {}
+
+    # Ciclos que chegam antes da meia-noite, depois da última atualização
+    source.df = pd.concat([df, cycle_rows(np.random.default_rng(10), [day], 20)])
+    calendar.today = day + timedelta(days=1)
+    assert store.daily_counts('agua_por_kg', day, day)[1].sum() == 120
+    assert to_dense(cache[f"{SKETCH_CACHE_PREFIX}|{day}"]['all'][0]).sum() == 120
+
+def test_dia_corrente_sem_ciclos_nao_reconsulta_a_cada_chamada(monkeypatch):
+    day = date(2024, 3, 1)
+    Calendar(monkeypatch, day)
+    source = CountingSource(cycle_rows(np.random.default_rng(4), [day - timedelta(days=1)], 10))
+    store = SketchStore(query_source=source, cache=MemoryCache(), refresh_seconds=3600)
+    for _ in range(3):
+        store.quantiles('agua_por_kg', day, day)
+    assert source.calls == 1
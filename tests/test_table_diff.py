@@ -0,0 +1,47 @@
+"""Testes de diff_table_rows (atualização parcial da tabela de alarmes ativos)"""
+
+from dash import no_update
+
+from dstech_charts import diff_table_rows
+
+def apply_patch(rows, patch):
+    """Aplica as operações do Patch como o navegador faria"""
+    rows = [dict(row) for row in rows]
+    for operation in patch.to_plotly_json()['operations']:
+        params = operation['params']
+        if operation['operation'] == 'Remove':
+            rows.remove(params['value'])
+        elif operation['operation'] == 'Insert':
+            rows.insert(params['index'], params['value'])
+        elif operation['operation'] == 'Assign':
+            index, key = operation['location']
+            rows[index][key] = params['value']
+        else:
+            raise AssertionError(f"operação inesperada: {operation}")
+    return rows
+
+def test_sem_mudancas_nao_atualiza():
+    rows = [{'id': 1, 'alarme': 'A'}, {'id': 2, 'alarme': 'B'}]
+    assert diff_table_rows(rows, [dict(row) for row in rows]) is no_update
+
+def test_envia_apenas_celulas_alteradas():
+    old = [{'id': 1, 'alarme': 'A', 'duracao': '5 min'}, {'id': 2, 'alarme': 'B', 'duracao': '1 min'}]
+    new = [{'id': 1, 'alarme': 'A', 'duracao': '6 min'}, {'id': 2, 'alarme': 'B', 'duracao': '1 min'}]
+    patch = diff_table_rows(old, new)
+    operations = patch.to_plotly_json()['operations']
+    assert [op['location'] for op in operations] == [[0, 'duracao']]
+    assert apply_patch(old, patch) == new
+
+def test_remove_e_insere_linhas():
+    old = [{'id': 1, 'alarme': 'A'}, {'id': 2, 'alarme': 'B'}, {'id': 3, 'alarme': 'C'}]
+    new = [{'id': 0, 'alarme': 'Z'}, {'id': 1, 'alarme': 'A'}, {'id': 3, 'alarme': 'C2'}, {'id': 4, 'alarme': 'D'}]
+    assert apply_patch(old, diff_table_rows(old, new)) == new
+
+def test_tabela_vazia_recebe_todas_as_linhas():
+    new = [{'id': 1, 'alarme': 'A'}, {'id': 2, 'alarme': 'B'}]
+    assert apply_patch([], diff_table_rows(None, new)) == new
+
+def test_reordenacao_envia_tabela_inteira():
+    old = [{'id': 1, 'alarme': 'A'}, {'id': 2, 'alarme': 'B'}]
+    new = [{'id': 2, 'alarme': 'B'}, {'id': 1, 'alarme': 'A'}]
+    assert diff_table_rows(old, new) == new